@@ -0,0 +1,156 @@
+import os
+import asyncio
+import random
+import time
+
+import httpx
+
+AGORA_REGION_URLS = {
+    "us": "https://api.agora.io",
+    "eu": "https://api-eu.agora.io",
+    "ap": "https://api-ap.agora.io",
+    "cn": "https://api-cn.agora.io",
+}
+
+AGORA_MAX_CONNECTIONS = int(os.getenv("AGORA_MAX_CONNECTIONS", "20"))
+AGORA_MAX_RETRIES = int(os.getenv("AGORA_MAX_RETRIES", "2"))
+AGORA_RETRY_BACKOFF_SECONDS = float(os.getenv("AGORA_RETRY_BACKOFF_SECONDS", "0.2"))
+AGORA_BREAKER_FAILURES = int(os.getenv("AGORA_BREAKER_FAILURES", "5"))
+AGORA_BREAKER_RESET_SECONDS = float(os.getenv("AGORA_BREAKER_RESET_SECONDS", "30"))
+
+# Starting a bot makes Agora join the channel, so it gets a longer read
+# timeout than stopping one. Connecting should always be quick.
+ENDPOINT_TIMEOUTS = {
+    "start": httpx.Timeout(15.0, connect=3.0),
+    "stop": httpx.Timeout(5.0, connect=3.0),
+}
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def base_url_for(region: str) -> str:
+    return AGORA_REGION_URLS.get(region, AGORA_REGION_URLS["ap"])
+
+
+class CircuitOpenError(Exception):
+    """Agora has been failing; calls are refused until the breaker resets."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures and
+    refuses calls for `reset_seconds`, then lets one trial call through.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_in_flight):
+            raise CircuitOpenError("Agora API circuit breaker is open")
+        if state == "half-open":
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class AgoraClient:
+    """
+    Agora REST client shared for the application's lifetime.
+
+    One pooled HTTP/2 connection per region is kept alive across calls
+    instead of a fresh TCP+TLS handshake for every session start and stop.
+    Transient failures (network errors, 429 and 5xx) are retried with
+    jittered exponential backoff, and a circuit breaker fails fast while
+    Agora keeps failing so requests don't pile up on a slow region.
+    """
+
+    def __init__(self, base_url: str, customer_id: str, customer_secret: str, transport=None):
+        self.base_url = base_url
+        self.auth = (customer_id, customer_secret)
+        self.breaker = CircuitBreaker(AGORA_BREAKER_FAILURES, AGORA_BREAKER_RESET_SECONDS)
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "rejected_by_breaker": 0}
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=self.auth,
+                http2=self._transport is None,
+                transport=self._transport,
+                timeout=DEFAULT_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=AGORA_MAX_CONNECTIONS,
+                    max_keepalive_connections=AGORA_MAX_CONNECTIONS,
+                    keepalive_expiry=60.0,
+                ),
+                headers={"Content-Type": "application/json"},
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def post(self, endpoint: str, path: str, payload: dict) -> httpx.Response:
+        """
+        POST with retries. Returns the final response, including non-transient
+        error responses; raises httpx.HTTPError if every attempt failed at the
+        transport level, or CircuitOpenError without calling Agora at all.
+        """
+        if self._client is None:
+            await self.start()
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._stats["rejected_by_breaker"] += 1
+            raise
+
+        timeout = ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+        for attempt in range(AGORA_MAX_RETRIES + 1):
+            self._stats["requests"] += 1
+            try:
+                response = await self._client.post(path, json=payload, timeout=timeout)
+                if response.status_code not in TRANSIENT_STATUS_CODES:
+                    self.breaker.record_success()
+                    return response
+                error = None
+            except httpx.TransportError as e:
+                response, error = None, e
+
+            if attempt == AGORA_MAX_RETRIES:
+                self._stats["failures"] += 1
+                self.breaker.record_failure()
+                if error is not None:
+                    raise error
+                return response
+            self._stats["retries"] += 1
+            delay = AGORA_RETRY_BACKOFF_SECONDS * 2 ** attempt
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+
+    def stats(self) -> dict:
+        return {**self._stats, "circuit": self.breaker.state}
@@ -0,0 +1,91 @@
+import os
+import time
+
+from agora_token_builder import RtcTokenBuilder, RtmTokenBuilder
+
+from app.cache import TTLCache
+
+# Minted Agora tokens are reused until AGORA_TOKEN_REFRESH_SECONDS before
+# they expire, so a client reconnecting or a bot restarting on the same
+# channel doesn't pay for another HMAC signature and always gets a token
+# with at least that much life left.
+AGORA_TOKEN_TTL = int(os.getenv("AGORA_TOKEN_TTL", "3600"))
+AGORA_TOKEN_REFRESH_SECONDS = int(os.getenv("AGORA_TOKEN_REFRESH_SECONDS", "300"))
+AGORA_TOKEN_CACHE_SIZE = int(os.getenv("AGORA_TOKEN_CACHE_SIZE", "10000"))
+
+ROLE_PUBLISHER = 1
+ROLE_SUBSCRIBER = 2
+ROLE_RTM_USER = 1
+
+
+class TokenService:
+    """
+    RTC and RTM token minting with a cache keyed on (kind, channel, uid, role).
+
+    Each entry lives for the token's TTL minus the refresh margin; once that
+    passes the next request mints a fresh token instead of returning one
+    that is about to expire.
+    """
+
+    def __init__(self, app_id: str, certificate: str, ttl_seconds: int = AGORA_TOKEN_TTL,
+                 refresh_seconds: int = AGORA_TOKEN_REFRESH_SECONDS,
+                 max_entries: int = AGORA_TOKEN_CACHE_SIZE):
+        self.app_id = app_id
+        self.certificate = certificate
+        self.ttl_seconds = ttl_seconds
+        # Never let the margin swallow the whole TTL.
+        self.refresh_seconds = min(refresh_seconds, ttl_seconds // 2)
+        self._cache = TTLCache(max_entries, ttl_seconds - self.refresh_seconds) if max_entries > 0 else None
+        self._stats = {"minted": 0, "cache_hits": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.app_id and self.certificate)
+
+    def rtc_token(self, channel: str, uid: int, role: int = ROLE_PUBLISHER) -> tuple:
+        """(token, expires_at) for joining `channel` as `uid`; ("", 0) without a certificate."""
+        return self._cached(("rtc", channel, uid, role), lambda expires_at: RtcTokenBuilder.buildTokenWithUid(
+            self.app_id, self.certificate, channel, uid, role, expires_at,
+        ))
+
+    def rtm_token(self, uid: str) -> tuple:
+        """(token, expires_at) for logging in to RTM as `uid`; ("", 0) without a certificate."""
+        return self._cached(("rtm", "", uid, ROLE_RTM_USER), lambda expires_at: RtmTokenBuilder.buildToken(
+            self.app_id, self.certificate, uid, ROLE_RTM_USER, expires_at,
+        ))
+
+    def pair(self, channel: str, rtc_uid: int, rtm_uid: str, role: int = ROLE_PUBLISHER) -> dict:
+        """RTC and RTM tokens for one participant."""
+        rtc_token, rtc_expires_at = self.rtc_token(channel, rtc_uid, role)
+        rtm_token, rtm_expires_at = self.rtm_token(rtm_uid)
+        return {
+            "channel": channel,
+            "uid": rtm_uid,
+            "rtcUid": rtc_uid,
+            "rtcToken": rtc_token,
+            "rtmToken": rtm_token,
+            "expiresAt": min(rtc_expires_at, rtm_expires_at),
+        }
+
+    def _cached(self, key: tuple, build) -> tuple:
+        if not self.enabled:
+            return "", 0
+        if self._cache is not None:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._stats["cache_hits"] += 1
+                return entry
+        expires_at = int(time.time()) + self.ttl_seconds
+        entry = (build(expires_at), expires_at)
+        self._stats["minted"] += 1
+        if self._cache is not None:
+            self._cache.set(key, entry)
+        return entry
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "cached": len(self._cache) if self._cache is not None else 0,
+            "ttl_seconds": self.ttl_seconds,
+            "refresh_seconds": self.refresh_seconds,
+        }
@@ -0,0 +1,405 @@
+import os
+import io
+import mimetypes
+import shutil
+import subprocess
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from app import audio_upload, long_audio, metrics
+
+# Uploads are normalised before transcription: the container is identified
+# from its magic bytes (browsers often send webm or ogg with a missing or
+# wrong type), PCM is downmixed to mono and brought down to at most
+# STT_TARGET_RATE Hz, and silence longer than STT_TRIM_PAD_SECONDS is cut from
+# both ends. The result is a 16-bit WAV, or, with STT_AUDIO_CODEC=opus|flac
+# and ffmpeg on the PATH, a compressed file. Gemini bills audio by duration,
+# so trimming saves tokens while downmixing and resampling save upload bytes.
+# Without ffmpeg only WAV is decoded; other containers are sent as they are
+# with their sniffed type. A WAV that is already 16-bit mono at or below the
+# target rate is passed through without being decoded, silence included.
+# Clips spooled to disk are worked on in temp files, a block at a time, so a
+# long recording never sits in the worker's memory.
+STT_AUDIO_PREP = os.getenv("STT_AUDIO_PREP", "true").lower() == "true"
+STT_TARGET_RATE = int(os.getenv("STT_TARGET_RATE", "16000"))
+STT_TRIM_SILENCE_DBFS = float(os.getenv("STT_TRIM_SILENCE_DBFS", "-45"))
+STT_TRIM_PAD_SECONDS = float(os.getenv("STT_TRIM_PAD_SECONDS", "0.25"))
+STT_AUDIO_CODEC = os.getenv("STT_AUDIO_CODEC", "wav").lower()
+STT_FFMPEG = os.getenv("STT_FFMPEG", "ffmpeg")
+
+FRAME_SECONDS = 0.02
+BLOCK_SECONDS = 10.0
+FFMPEG_TIMEOUT_SECONDS = 60
+ENCODERS = {
+    "opus": (["-c:a", "libopus", "-b:a", "24k", "-f", "ogg"], "audio/ogg"),
+    "flac": (["-c:a", "flac", "-f", "flac"], "audio/flac"),
+}
+
+# Containers Gemini accepts; anything else is converted even if that makes it bigger.
+MODEL_AUDIO_TYPES = {"audio/wav", "audio/mp3", "audio/aiff", "audio/aac", "audio/ogg", "audio/flac"}
+
+_SAMPLE_TYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+_ffmpeg_path = shutil.which(STT_FFMPEG)
+
+_stats = {
+    "clips": 0,
+    "normalised": 0,
+    "passthrough": 0,
+    "failed": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "seconds_in": 0.0,
+    "seconds_out": 0.0,
+    "prep_ms_total": 0.0,
+}
+
+
+def sniff_container(head: bytes) -> tuple:
+    """(container, mime type) from the first bytes of a file, or (None, None)."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav", "audio/wav"
+    if head[:4] == b"OggS":
+        return "ogg", "audio/ogg"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm", "audio/webm"
+    if head[:4] == b"fLaC":
+        return "flac", "audio/flac"
+    if head[4:8] == b"ftyp":
+        return "mp4", "audio/mp4"
+    if head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff", "audio/aiff"
+    if head[:3] == b"ID3":
+        return "mp3", "audio/mp3"
+    if len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # MPEG audio frame sync; ADTS AAC shares it with the layer bits at 00.
+        return ("aac", "audio/aac") if head[1] & 0x06 == 0 else ("mp3", "audio/mp3")
+    return None, None
+
+
+def _to_float(raw: bytes, dtype, channels: int) -> np.ndarray:
+    """Interleaved PCM bytes to mono float32 in [-1, 1)."""
+    samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+    if dtype is np.uint8:
+        samples = (samples - 128.0) / 128.0
+    else:
+        samples /= float(-np.iinfo(dtype).min)
+    if channels > 1:
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def _to_int16(samples: np.ndarray) -> np.ndarray:
+    return np.clip(np.round(samples * 32767.0), -32768, 32767).astype(np.int16)
+
+
+def _buffer(count: int, on_disk: bool) -> np.ndarray:
+    """An int16 array of `count` samples, in memory or mapped onto an anonymous temp file."""
+    if not on_disk or not count:
+        return np.empty(count, dtype=np.int16)
+    with tempfile.TemporaryFile(prefix="echo-prep-") as spool:
+        # The mapping keeps its own handle, so the file lives as long as the array.
+        return np.memmap(spool, dtype=np.int16, mode="w+", shape=(count,))
+
+
+def output_codec() -> str:
+    """The codec normalised clips are written in: STT_AUDIO_CODEC if it can be used, else wav."""
+    return STT_AUDIO_CODEC if STT_AUDIO_CODEC in ENCODERS and _ffmpeg_path else "wav"
+
+
+def already_normalised(wav) -> bool:
+    """Whether a WAV's header says it is already in the format normalise writes."""
+    return (
+        output_codec() == "wav"
+        and wav.getsampwidth() == 2
+        and wav.getnchannels() == 1
+        and wav.getframerate() <= STT_TARGET_RATE
+    )
+
+
+def decode_wav(wav, target_rate: int = STT_TARGET_RATE, on_disk: bool = False) -> tuple:
+    """
+    Mono int16 samples of a PCM WAV at min(its rate, `target_rate`), and that
+    rate. Read block by block: each block is downmixed and decimated by the
+    whole-number part of the rate ratio (a box filter, which doubles as the
+    anti-alias filter) before the next is read, so only the reduced signal
+    is ever held in full, and with `on_disk` not even that: it goes to a
+    temp file. Any fractional ratio left, e.g. 22.05 kHz -> 16 kHz, is
+    closed by linear interpolation.
+    """
+    dtype = _SAMPLE_TYPES.get(wav.getsampwidth())
+    if dtype is None:
+        raise ValueError(f"Unsupported WAV sample width: {wav.getsampwidth()} bytes")
+    rate, channels = wav.getframerate(), wav.getnchannels()
+    factor = max(rate // target_rate, 1)
+    block_frames = factor * max(int(BLOCK_SECONDS * rate) // factor, 1)
+
+    decimated = _buffer(wav.getnframes() // factor, on_disk)
+    filled = 0
+    wav.rewind()
+    while filled < len(decimated) and (raw := wav.readframes(block_frames)):
+        samples = _to_float(raw, dtype, channels)
+        if factor > 1:
+            samples = samples[:len(samples) // factor * factor].reshape(-1, factor).mean(axis=1)
+        samples = samples[:len(decimated) - filled]
+        decimated[filled:filled + len(samples)] = _to_int16(samples)
+        filled += len(samples)
+    decimated = decimated[:filled]
+    rate = rate / factor
+    if rate <= target_rate:
+        return decimated, int(round(rate))
+    return interpolate(decimated, rate, target_rate, on_disk), target_rate
+
+
+def interpolate(samples: np.ndarray, rate: float, target_rate: int, on_disk: bool = False) -> np.ndarray:
+    """Linear resampling of int16 samples, computed one block of output at a time."""
+    count = int(len(samples) * target_rate / rate)
+    out = _buffer(count, on_disk)
+    block = int(BLOCK_SECONDS * target_rate)
+    for start in range(0, count, block):
+        positions = np.arange(start, min(start + block, count)) * (rate / target_rate)
+        lo = int(positions[0])
+        hi = min(int(positions[-1]) + 2, len(samples))
+        window = samples[lo:hi].astype(np.float32)
+        out[start:start + len(positions)] = np.round(
+            np.interp(positions - lo, np.arange(len(window)), window)
+        ).astype(np.int16)
+    return out
+
+
+def voiced_bounds(samples: np.ndarray, rate: int, silence_dbfs: float = STT_TRIM_SILENCE_DBFS,
+                  pad_seconds: float = STT_TRIM_PAD_SECONDS) -> tuple:
+    """
+    Sample range from the first to the last frame louder than `silence_dbfs`,
+    widened by `pad_seconds` each side. A clip with no such frame is kept whole.
+    """
+    frame_len = max(int(rate * FRAME_SECONDS), 1)
+    frames = len(samples) // frame_len
+    if not frames:
+        return 0, len(samples)
+    threshold = 32768.0 * 10 ** (silence_dbfs / 20)
+    block = int(BLOCK_SECONDS / FRAME_SECONDS)
+    loud = np.zeros(frames, dtype=bool)
+    for start in range(0, frames, block):
+        end = min(start + block, frames)
+        chunk = samples[start * frame_len:end * frame_len].astype(np.float32).reshape(-1, frame_len)
+        loud[start:end] = np.sqrt(np.mean(chunk * chunk, axis=1)) > threshold
+    voiced = np.flatnonzero(loud)
+    if not len(voiced):
+        return 0, len(samples)
+    pad = int(pad_seconds * rate)
+    return max(voiced[0] * frame_len - pad, 0), min((voiced[-1] + 1) * frame_len + pad, len(samples))
+
+
+def write_wav(out, samples: np.ndarray, rate: int):
+    """Write mono int16 samples to a file object as a WAV, one block at a time."""
+    block = int(BLOCK_SECONDS * rate)
+    with wave.open(out, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        for start in range(0, len(samples), block):
+            writer.writeframes(np.ascontiguousarray(samples[start:start + block]).tobytes())
+
+
+def wav_bytes(samples: np.ndarray, rate: int) -> bytes:
+    out = io.BytesIO()
+    write_wav(out, samples, rate)
+    return out.getvalue()
+
+
+def _ffmpeg(args: list, stdin: bytes | None = None) -> bytes:
+    result = subprocess.run(
+        [_ffmpeg_path, "-hide_banner", "-loglevel", "error", *args],
+        input=stdin if stdin is not None else b"", capture_output=True, timeout=FFMPEG_TIMEOUT_SECONDS,
+    )
+    if result.returncode:
+        raise ValueError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()[:200]}")
+    return result.stdout
+
+
+def decode_with_ffmpeg(source: str, target_rate: int = STT_TARGET_RATE, on_disk: bool = False) -> tuple:
+    """
+    Any container ffmpeg can read, as mono int16 samples at `target_rate`;
+    with `on_disk` they are decoded to a temp file and mapped rather than read.
+    """
+    args = ["-i", source, "-f", "s16le", "-ac", "1", "-ar", str(target_rate)]
+    if not on_disk:
+        return np.frombuffer(_ffmpeg([*args, "pipe:1"]), dtype=np.int16), target_rate
+    with tempfile.NamedTemporaryFile(prefix="echo-prep-", suffix=".pcm") as pcm:
+        _ffmpeg(["-y", *args, pcm.name])
+        if not os.path.getsize(pcm.name):
+            return np.zeros(0, dtype=np.int16), target_rate
+        return np.memmap(pcm.name, dtype=np.int16, mode="r"), target_rate
+
+
+def encode(samples: np.ndarray, rate: int, codec: str = STT_AUDIO_CODEC) -> tuple:
+    """(bytes, mime type) of mono int16 samples in `codec`, falling back to WAV."""
+    if codec in ENCODERS and _ffmpeg_path:
+        args, mime_type = ENCODERS[codec]
+        data = _ffmpeg(["-f", "s16le", "-ar", str(rate), "-ac", "1", "-i", "pipe:0", *args, "pipe:1"],
+                       stdin=samples.tobytes())
+        return data, mime_type
+    return wav_bytes(samples, rate), "audio/wav"
+
+
+def encode_file(samples: np.ndarray, rate: int, codec: str = STT_AUDIO_CODEC) -> tuple:
+    """Like encode, but written block by block to a temp file: (path, mime type)."""
+    with tempfile.NamedTemporaryFile(prefix="echo-stt-", suffix=".wav", delete=False) as spool:
+        write_wav(spool, samples, rate)
+    if not (codec in ENCODERS and _ffmpeg_path):
+        return spool.name, "audio/wav"
+    args, mime_type = ENCODERS[codec]
+    out = tempfile.NamedTemporaryFile(prefix="echo-stt-", suffix=mimetypes.guess_extension(mime_type) or "",
+                                      delete=False)
+    out.close()
+    try:
+        _ffmpeg(["-y", "-i", spool.name, *args, out.name])
+    except BaseException:
+        os.unlink(out.name)
+        raise
+    finally:
+        os.unlink(spool.name)
+    return out.name, mime_type
+
+
+def _read_head(audio: audio_upload.SpooledAudio, size: int = 16) -> bytes:
+    if audio.data is not None:
+        return audio.data[:size]
+    with open(audio.path, "rb") as f:
+        return f.read(size)
+
+
+def normalise(audio: audio_upload.SpooledAudio) -> dict:
+    """
+    Replace a spooled clip's contents with the normalised audio, in place,
+    and return a report of what changed: container, bytes and seconds before
+    and after, and the time it took. Blocking; call it from a worker thread.
+    The original is kept whenever it can't be decoded, or when the model
+    accepts it and the result would not be smaller.
+    """
+    start = time.perf_counter()
+    container, sniffed = sniff_container(_read_head(audio))
+    report = {
+        "container": container or "unknown",
+        "mime_type_in": audio.mime_type,
+        "bytes_in": audio.size,
+        "action": "passthrough",
+    }
+    if sniffed:
+        audio.mime_type = sniffed
+
+    on_disk = audio.path is not None
+    samples = rate = None
+    if container == "wav":
+        wav = long_audio.open_wav(audio.data, audio.path)
+        if wav:
+            try:
+                report["seconds_in"] = round(long_audio.duration_seconds(wav), 3)
+                if wav.getsampwidth() in _SAMPLE_TYPES and not already_normalised(wav):
+                    samples, rate = decode_wav(wav, on_disk=on_disk)
+            finally:
+                wav.close()
+    elif container and _ffmpeg_path:
+        source = audio.path
+        spool = None
+        if source is None:
+            spool = tempfile.NamedTemporaryFile(prefix="echo-prep-", delete=False)
+            spool.write(audio.data)
+            spool.close()
+            source = spool.name
+        try:
+            samples, rate = decode_with_ffmpeg(source, on_disk=on_disk)
+        finally:
+            if spool:
+                os.unlink(spool.name)
+        report["seconds_in"] = round(len(samples) / rate, 3)
+
+    if samples is not None and len(samples):
+        lo, hi = voiced_bounds(samples, rate)
+        if on_disk:
+            path, mime_type = encode_file(samples[lo:hi], rate)
+            replace = os.path.getsize(path) < audio.size or audio.mime_type not in MODEL_AUDIO_TYPES
+            if replace:
+                _replace_file(audio, path, mime_type)
+            else:
+                os.unlink(path)
+        else:
+            data, mime_type = encode(samples[lo:hi], rate)
+            replace = len(data) < audio.size or audio.mime_type not in MODEL_AUDIO_TYPES
+            if replace:
+                _replace(audio, data, mime_type)
+        if replace:
+            report.update(
+                action="normalised",
+                sample_rate=rate,
+                seconds_out=round((hi - lo) / rate, 3),
+                trimmed_seconds=round((len(samples) - (hi - lo)) / rate, 3),
+            )
+
+    report["mime_type_out"] = audio.mime_type
+    report["bytes_out"] = audio.size
+    report["prep_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    _record(report)
+    return report
+
+
+def _replace(audio: audio_upload.SpooledAudio, data: bytes, mime_type: str):
+    """Swap in the normalised bytes, in memory if they fit inline, else in a new temp file."""
+    audio.cleanup()
+    audio.data = None
+    audio.mime_type = mime_type
+    audio.size = len(data)
+    if len(data) <= audio_upload.STT_INLINE_MAX_BYTES:
+        audio.data = data
+        return
+    suffix = mimetypes.guess_extension(mime_type) or ""
+    with tempfile.NamedTemporaryFile(prefix="echo-stt-", suffix=suffix, delete=False) as spool:
+        spool.write(data)
+    audio.path = spool.name
+
+
+def _replace_file(audio: audio_upload.SpooledAudio, path: str, mime_type: str):
+    """Swap in a normalised temp file, read into memory instead if it fits inline."""
+    audio.cleanup()
+    audio.data = None
+    audio.mime_type = mime_type
+    audio.size = os.path.getsize(path)
+    audio.path = path
+    if audio.size <= audio_upload.STT_INLINE_MAX_BYTES:
+        with open(path, "rb") as f:
+            audio.data = f.read()
+        audio.cleanup()
+
+
+def _record(report: dict):
+    _stats["clips"] += 1
+    _stats[report["action"]] += 1
+    _stats["bytes_in"] += report["bytes_in"]
+    _stats["bytes_out"] += report["bytes_out"]
+    _stats["seconds_in"] += report.get("seconds_in", 0.0)
+    _stats["seconds_out"] += report.get("seconds_out", report.get("seconds_in", 0.0))
+    _stats["prep_ms_total"] += report["prep_ms"]
+    metrics.STT_PREP_LATENCY.observe(report["prep_ms"] / 1000)
+    metrics.STT_MODEL_AUDIO_BYTES.observe(report["bytes_out"])
+
+
+def record_failure():
+    _stats["clips"] += 1
+    _stats["failed"] += 1
+
+
+def stats() -> dict:
+    """Audio normalisation totals for /health."""
+    clips = _stats["clips"]
+    return {
+        **{key: round(value, 3) if isinstance(value, float) else value for key, value in _stats.items()},
+        "enabled": STT_AUDIO_PREP,
+        "codec": output_codec(),
+        "ffmpeg": bool(_ffmpeg_path),
+        "target_rate": STT_TARGET_RATE,
+        "byte_ratio": round(_stats["bytes_out"] / _stats["bytes_in"], 3) if _stats["bytes_in"] else None,
+        "mean_prep_ms": round(_stats["prep_ms_total"] / clips, 1) if clips else None,
+    }
@@ -0,0 +1,216 @@
+import os
+import asyncio
+import mimetypes
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from app import gemini, model_client
+
+# Uploads above STT_MAX_UPLOAD_BYTES are rejected. Clips up to
+# STT_INLINE_MAX_BYTES are sent inline with the request; anything larger is
+# spooled to disk and sent through the Gemini Files API, which keeps the
+# worker's memory flat no matter how long the recording is.
+STT_MAX_UPLOAD_BYTES = int(os.getenv("STT_MAX_UPLOAD_BYTES", str(50 * 2**20)))
+STT_INLINE_MAX_BYTES = int(os.getenv("STT_INLINE_MAX_BYTES", str(8 * 2**20)))
+STT_UPLOAD_CHUNK_BYTES = int(os.getenv("STT_UPLOAD_CHUNK_BYTES", str(2**20)))
+# Room in a multipart body for boundaries and form fields besides the clip.
+MULTIPART_OVERHEAD_BYTES = 64 * 2**10
+FILES_API_POLL_SECONDS = 0.5
+FILES_API_TIMEOUT_SECONDS = 60
+
+_stats = {
+    "uploads": 0,
+    "bytes": 0,
+    "rejected_too_large": 0,
+    "files_api_uploads": 0,
+    "max_peak_buffer_bytes": 0,
+}
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeds STT_MAX_UPLOAD_BYTES."""
+
+
+@dataclass
+class SpooledAudio:
+    """
+    An uploaded clip held either in memory (`data`) or in a temp file (`path`),
+    with the most bytes this request ever buffered in Python and, once
+    audio_prep has run, its report.
+    """
+    mime_type: str
+    size: int
+    data: bytes | None = None
+    path: str | None = None
+    peak_buffer_bytes: int = 0
+    prep: dict | None = None
+
+    def cleanup(self):
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except OSError as e:
+                print(f"Failed to remove spooled upload {self.path}: {e}")
+            self.path = None
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    Route class for upload endpoints that refuses a body larger than
+    STT_MAX_UPLOAD_BYTES before Starlette parses it: at once when the
+    Content-Length says so, otherwise as soon as that many bytes have been
+    received. spool_upload still enforces the exact limit on the clip itself.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        limit = STT_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+
+        async def limited(request: Request):
+            length = request.headers.get("content-length", "")
+            if length.isdigit() and int(length) > limit:
+                _stats["rejected_too_large"] += 1
+                raise HTTPException(status_code=413, detail=f"Upload exceeds the {STT_MAX_UPLOAD_BYTES} byte limit")
+
+            received = 0
+            receive = request.receive
+
+            async def counting_receive():
+                nonlocal received
+                message = await receive()
+                received += len(message.get("body", b""))
+                if received > limit:
+                    _stats["rejected_too_large"] += 1
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds the {STT_MAX_UPLOAD_BYTES} byte limit")
+                return message
+
+            return await handler(Request(request.scope, counting_receive))
+
+        return limited
+
+
+def resolve_mime_type(file: UploadFile, default: str = "audio/wav") -> str:
+    """Trust the declared audio/video type, otherwise guess from the filename."""
+    mime_type = file.content_type
+    if not mime_type or not (mime_type.startswith("audio/") or mime_type.startswith("video/")):
+        mime_type, _ = mimetypes.guess_type(file.filename or "")
+    return mime_type or default
+
+
+async def spool_upload(file: UploadFile, max_bytes: int = STT_MAX_UPLOAD_BYTES) -> SpooledAudio:
+    """
+    Read an upload without holding more than one chunk at a time unless the
+    clip is small enough to go inline. Raises UploadTooLarge past `max_bytes`.
+    """
+    mime_type = resolve_mime_type(file)
+    if file.size is not None and file.size > max_bytes:
+        _stats["rejected_too_large"] += 1
+        raise UploadTooLarge(f"Upload is {file.size} bytes, limit is {max_bytes}")
+
+    if file.size is not None and file.size <= STT_INLINE_MAX_BYTES:
+        data = await file.read()
+        return _record(SpooledAudio(mime_type, len(data), data=data, peak_buffer_bytes=len(data)))
+
+    # Unknown or large size: copy to our own temp file chunk by chunk.
+    suffix = mimetypes.guess_extension(mime_type) or ""
+    spool = tempfile.NamedTemporaryFile(prefix="echo-stt-", suffix=suffix, delete=False)
+    audio = SpooledAudio(mime_type, 0, path=spool.name)
+    try:
+        while chunk := await file.read(STT_UPLOAD_CHUNK_BYTES):
+            audio.size += len(chunk)
+            audio.peak_buffer_bytes = max(audio.peak_buffer_bytes, len(chunk))
+            if audio.size > max_bytes:
+                _stats["rejected_too_large"] += 1
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+            await run_in_threadpool(spool.write, chunk)
+        spool.close()
+    except BaseException:
+        spool.close()
+        audio.cleanup()
+        raise
+
+    if audio.size <= STT_INLINE_MAX_BYTES:
+        with open(audio.path, "rb") as f:
+            audio.data = await run_in_threadpool(f.read)
+        audio.peak_buffer_bytes = max(audio.peak_buffer_bytes, audio.size)
+        audio.cleanup()
+    return _record(audio)
+
+
+async def spool_file(path: str, max_bytes: int = STT_MAX_UPLOAD_BYTES) -> SpooledAudio:
+    """
+    A recording already on disk as SpooledAudio: read into memory when it is
+    small enough to go inline, otherwise copied to a temp file so that
+    cleanup() never touches the original.
+    """
+    size = os.path.getsize(path)
+    if size > max_bytes:
+        _stats["rejected_too_large"] += 1
+        raise UploadTooLarge(f"{path} is {size} bytes, limit is {max_bytes}")
+    mime_type, _ = mimetypes.guess_type(path)
+    mime_type = mime_type or "audio/wav"
+
+    if size <= STT_INLINE_MAX_BYTES:
+        with open(path, "rb") as f:
+            data = await run_in_threadpool(f.read)
+        return _record(SpooledAudio(mime_type, len(data), data=data, peak_buffer_bytes=len(data)))
+
+    spool = tempfile.NamedTemporaryFile(prefix="echo-stt-", suffix=os.path.splitext(path)[1], delete=False)
+    spool.close()
+    audio = SpooledAudio(mime_type, size, path=spool.name)
+    try:
+        await run_in_threadpool(shutil.copyfile, path, spool.name)
+    except BaseException:
+        audio.cleanup()
+        raise
+    return _record(audio)
+
+
+def _record(audio: SpooledAudio) -> SpooledAudio:
+    _stats["uploads"] += 1
+    _stats["bytes"] += audio.size
+    _stats["max_peak_buffer_bytes"] = max(_stats["max_peak_buffer_bytes"], audio.peak_buffer_bytes)
+    return audio
+
+
+async def audio_part(audio: SpooledAudio):
+    """
+    Prompt part for Gemini: an inline blob for small clips, otherwise a file
+    uploaded through the Files API (streamed from disk by the SDK).
+    """
+    if audio.data is not None:
+        return {"mime_type": audio.mime_type, "data": audio.data}
+
+    _stats["files_api_uploads"] += 1
+    genai = gemini.genai()
+    uploaded = await model_client.run(genai.upload_file, audio.path, mime_type=audio.mime_type)
+    deadline = time.monotonic() + FILES_API_TIMEOUT_SECONDS
+    while uploaded.state.name == "PROCESSING":
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Gemini is still processing {uploaded.name}")
+        await asyncio.sleep(FILES_API_POLL_SECONDS)
+        uploaded = await model_client.run(genai.get_file, uploaded.name)
+    if uploaded.state.name != "ACTIVE":
+        raise ValueError(f"Gemini could not process {uploaded.name}: {uploaded.state.name}")
+    return uploaded
+
+
+async def release_part(part):
+    """Delete a Files API upload once the model is done with it."""
+    name = getattr(part, "name", None)
+    if name:
+        try:
+            await model_client.run(gemini.genai().delete_file, name)
+        except Exception as e:
+            print(f"Failed to delete uploaded file {name}: {e}")
+
+
+def stats() -> dict:
+    """Upload sizes and buffering for /speech-to-text, reported by /health."""
+    return {**_stats, "max_upload_bytes": STT_MAX_UPLOAD_BYTES, "inline_max_bytes": STT_INLINE_MAX_BYTES}
@@ -0,0 +1,363 @@
+import os
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.scheduler import ModelOverloaded
+
+# Offline batch jobs: a JSONL file of items (onboarding requests, archived
+# recordings) worked through in the background by the worker that accepted
+# it, at most BATCH_CONCURRENCY items at a time per worker across all jobs.
+# Model calls go through the same caches and scheduler as interactive
+# traffic at BATCH priority, so they only get the capacity users leave over.
+# Each result is appended to the job's output.jsonl as soon as it finishes;
+# that file is also the checkpoint: a resumed job skips every index already
+# in it. Job state lives in SQLite so every gunicorn worker can report on any
+# job, and a job whose worker stops reporting for BATCH_LEASE_SECONDS is
+# picked up again by another worker.
+BATCH_DIR = os.getenv("BATCH_DIR", "/tmp/echo_batch")
+BATCH_DB_PATH = os.getenv("BATCH_DB_PATH", "") or os.path.join(BATCH_DIR, "jobs.db")
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+BATCH_MAX_INPUT_BYTES = int(os.getenv("BATCH_MAX_INPUT_BYTES", str(16 * 2**20)))
+BATCH_ITEM_RETRIES = int(os.getenv("BATCH_ITEM_RETRIES", "3"))
+BATCH_LEASE_SECONDS = float(os.getenv("BATCH_LEASE_SECONDS", "60"))
+BATCH_AUTO_RESUME = os.getenv("BATCH_AUTO_RESUME", "true").lower() == "true"
+
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+FAILED = "failed"
+RESUMABLE = (INTERRUPTED, FAILED, CANCELLED)
+
+COLUMNS = (
+    "id", "status", "total", "succeeded", "failed", "created_at", "started_at", "finished_at",
+    "heartbeat_at", "owner", "run_started_at", "run_processed_at_start", "error",
+)
+
+
+class JobNotFound(KeyError):
+    """No batch job with this id."""
+
+
+class JobStore:
+    """Batch job rows in a SQLite file shared by every worker."""
+
+    def __init__(self, path: str = BATCH_DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS batch_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, total INTEGER NOT NULL, "
+            "succeeded INTEGER NOT NULL DEFAULT 0, failed INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL, "
+            "owner TEXT, run_started_at REAL, run_processed_at_start INTEGER NOT NULL DEFAULT 0, error TEXT)"
+        )
+
+    def create(self, job_id: str, total: int) -> dict:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO batch_jobs (id, status, total, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, total, time.time()),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM batch_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            raise JobNotFound(job_id)
+        return dict(zip(COLUMNS, row))
+
+    def list(self, limit: int = 100) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM batch_jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE batch_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def claim(self, job_id: str, owner: str, statuses: tuple) -> bool:
+        """
+        Atomically take a job for `owner` if it is in one of `statuses` or is
+        running under a worker that stopped reporting. At most one caller wins.
+        """
+        now = time.time()
+        marks = ", ".join("?" for _ in statuses)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE batch_jobs SET status = ?, owner = ?, heartbeat_at = ?, "
+                f"started_at = COALESCE(started_at, ?), finished_at = NULL, error = NULL "
+                f"WHERE id = ? AND (status IN ({marks}) OR (status = ? AND heartbeat_at < ?))",
+                (RUNNING, owner, now, now, job_id, *statuses, RUNNING, now - BATCH_LEASE_SECONDS),
+            )
+        return cursor.rowcount == 1
+
+    def orphaned(self) -> list:
+        """Ids of jobs left interrupted by a shutdown or whose worker stopped reporting."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM batch_jobs WHERE status = ? OR (status = ? AND heartbeat_at < ?) "
+                "ORDER BY created_at",
+                (INTERRUPTED, RUNNING, time.time() - BATCH_LEASE_SECONDS),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+
+def job_dir(job_id: str) -> str:
+    return os.path.join(BATCH_DIR, job_id)
+
+
+def input_path(job_id: str) -> str:
+    return os.path.join(job_dir(job_id), "input.jsonl")
+
+
+def output_path(job_id: str) -> str:
+    return os.path.join(job_dir(job_id), "output.jsonl")
+
+
+def complete_length(path: str, block_bytes: int = 2**16) -> int:
+    """Bytes of an output file up to its last newline, leaving out a line still being written."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(end - block_bytes, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def read_prefix(path: str, length: int, chunk_bytes: int = 2**16):
+    """Yield the first `length` bytes of a file, a chunk at a time."""
+    if not length:
+        return
+    with open(path, "rb") as f:
+        while length > 0 and (chunk := f.read(min(chunk_bytes, length))):
+            length -= len(chunk)
+            yield chunk
+
+
+def read_checkpoint(path: str) -> tuple:
+    """
+    (indexes already written, succeeded, failed) from an output file. A
+    partial last line, left by a crash mid-write, is cut off so appending
+    resumes on a clean line.
+    """
+    done: set = set()
+    succeeded = failed = 0
+    if not os.path.exists(path):
+        return done, succeeded, failed
+    with open(path, "rb+") as f:
+        good = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            good += len(line)
+            if record["index"] not in done:
+                done.add(record["index"])
+                if record["status"] == "ok":
+                    succeeded += 1
+                else:
+                    failed += 1
+        f.truncate(good)
+    return done, succeeded, failed
+
+
+def progress(job: dict) -> dict:
+    """A job row plus percent done, throughput of the current run and an ETA."""
+    processed = job["succeeded"] + job["failed"]
+    report = {**job, "processed": processed}
+    report["percent"] = round(100 * processed / job["total"], 1) if job["total"] else 100.0
+    report["items_per_minute"] = None
+    report["eta_seconds"] = None
+    if job["run_started_at"]:
+        end = job["finished_at"] if job["status"] != RUNNING and job["finished_at"] else time.time()
+        elapsed = end - job["run_started_at"]
+        run_processed = processed - job["run_processed_at_start"]
+        if elapsed > 0 and run_processed > 0:
+            rate = run_processed / elapsed
+            report["items_per_minute"] = round(rate * 60, 1)
+            if job["status"] == RUNNING:
+                report["eta_seconds"] = round((job["total"] - processed) / rate, 1)
+    return report
+
+
+class BatchRunner:
+    """Runs this worker's batch jobs; `handlers` maps an item's kind to `async (item) -> result`."""
+
+    def __init__(self, store: JobStore, handlers: dict, concurrency: int = BATCH_CONCURRENCY):
+        self.store = store
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._budget: asyncio.Semaphore | None = None
+        self._tasks: dict = {}
+        self._in_flight = 0
+        self._stats = {"items": 0, "errors": 0, "retries": 0, "resumed": 0}
+
+    def submit(self, items: list) -> dict:
+        """Write a validated job's items to disk, record it and start it."""
+        job_id = uuid.uuid4().hex
+        os.makedirs(job_dir(job_id), exist_ok=True)
+        with open(input_path(job_id), "w") as f:
+            for item in items:
+                f.write(json.dumps(item) + "\n")
+        self.store.create(job_id, len(items))
+        self.start(job_id, (QUEUED,))
+        return self.store.get(job_id)
+
+    def start(self, job_id: str, statuses: tuple = RESUMABLE) -> bool:
+        """Run the job here if it can be claimed; False if it is finished or running elsewhere."""
+        if job_id in self._tasks or not self.store.claim(job_id, self.owner, statuses):
+            return False
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return True
+
+    def cancel(self, job_id: str) -> dict:
+        """Stop a job. A job running in another worker stops at that worker's next progress report."""
+        job = self.store.get(job_id)
+        if job["status"] in (QUEUED, RUNNING, INTERRUPTED):
+            self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+            task = self._tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+        return self.store.get(job_id)
+
+    def resume_orphaned(self) -> list:
+        """Claim and restart jobs that no worker is running any more."""
+        resumed = [job_id for job_id in self.store.orphaned() if self.start(job_id)]
+        self._stats["resumed"] += len(resumed)
+        for job_id in resumed:
+            print(f"Resuming batch job {job_id}")
+        return resumed
+
+    async def run_reaper(self):
+        """Periodically pick up jobs orphaned by a worker that died without shutting down."""
+        while True:
+            await asyncio.sleep(BATCH_LEASE_SECONDS)
+            try:
+                self.resume_orphaned()
+            except Exception as e:
+                print(f"Batch reaper error: {e}")
+
+    async def shutdown(self):
+        """Stop this worker's jobs; they are left interrupted for another worker to resume."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _run(self, job_id: str):
+        if self._budget is None:
+            self._budget = asyncio.Semaphore(self.concurrency)
+        done, succeeded, failed = read_checkpoint(output_path(job_id))
+        counts = {"succeeded": succeeded, "failed": failed}
+        self.store.update(job_id, run_started_at=time.time(), run_processed_at_start=succeeded + failed, **counts)
+        reporter = asyncio.create_task(self._report(job_id, counts))
+        pending: set = set()
+        try:
+            with open(input_path(job_id)) as items, open(output_path(job_id), "a") as out:
+                for index, line in enumerate(items):
+                    if index in done:
+                        continue
+                    await self._budget.acquire()
+                    task = asyncio.create_task(self._item(index, json.loads(line), out, counts))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                    # Released even if the task is cancelled before it starts.
+                    task.add_done_callback(lambda _: self._budget.release())
+                if pending:
+                    await asyncio.gather(*pending)
+            reporter.cancel()
+            self.store.update(job_id, status=COMPLETED, finished_at=time.time(), heartbeat_at=time.time(), **counts)
+            print(f"Batch job {job_id} completed: {counts['succeeded']} ok, {counts['failed']} failed")
+        except asyncio.CancelledError:
+            reporter.cancel()
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            job = self.store.get(job_id)
+            if job["owner"] == self.owner:
+                status = CANCELLED if job["status"] == CANCELLED else INTERRUPTED
+                self.store.update(job_id, status=status, finished_at=time.time(), **counts)
+            raise
+        except Exception as e:
+            reporter.cancel()
+            print(f"Batch job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, finished_at=time.time(), error=str(e), **counts)
+
+    async def _report(self, job_id: str, counts: dict):
+        """Publish progress and renew the lease; stop if the job was cancelled from another worker."""
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL_SECONDS)
+            job = self.store.get(job_id)
+            if job["status"] != RUNNING or job["owner"] != self.owner:
+                task = self._tasks.get(job_id)
+                if task is not None:
+                    task.cancel()
+                return
+            self.store.update(job_id, heartbeat_at=time.time(), **counts)
+
+    async def _item(self, index: int, item: dict, out, counts: dict):
+        self._in_flight += 1
+        start = time.perf_counter()
+        record = {"index": index, "id": item.get("id"), "kind": item["kind"]}
+        try:
+            record.update(status="ok", result=await self._attempt(item))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            record.update(status="error", error=str(e) or type(e).__name__)
+        finally:
+            self._in_flight -= 1
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        counts["succeeded" if record["status"] == "ok" else "failed"] += 1
+        self._stats["items"] += 1
+
+    async def _attempt(self, item: dict):
+        """Run one item, backing off and retrying when the scheduler sheds it."""
+        for attempt in range(BATCH_ITEM_RETRIES + 1):
+            try:
+                return await self.handlers[item["kind"]](item)
+            except ModelOverloaded as e:
+                if attempt == BATCH_ITEM_RETRIES:
+                    raise
+                self._stats["retries"] += 1
+                await asyncio.sleep(e.retry_after * 2 ** attempt)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "running_jobs": len(self._tasks),
+            "items_in_flight": self._in_flight,
+            "concurrency": self.concurrency,
+        }
@@ -0,0 +1,100 @@
+import os
+import asyncio
+import uuid
+from collections import deque
+
+# Pre-warmed Agora bots. For every configured (language, voice) pair the
+# pool keeps AGORA_BOT_POOL_SIZE channels with a bot already running, so
+# /session/start can hand one out instantly and top the pool up afterwards.
+# Idle bots are billed, so the pool is off (size 0) unless configured.
+AGORA_BOT_POOL_SIZE = int(os.getenv("AGORA_BOT_POOL_SIZE", "0"))
+AGORA_BOT_POOL_KEYS = os.getenv("AGORA_BOT_POOL_KEYS", "en-US:female")
+
+DEFAULT_LANGUAGE = "en-US"
+DEFAULT_VOICE = "female"
+
+
+def pool_key(language: str | None, voice: str | None) -> tuple:
+    return (language or DEFAULT_LANGUAGE, voice or DEFAULT_VOICE)
+
+
+def parse_pool_keys(spec: str) -> list:
+    """'en-US:female,es-ES:male' -> [('en-US', 'female'), ('es-ES', 'male')]"""
+    keys = []
+    for item in spec.split(","):
+        language, _, voice = item.strip().partition(":")
+        if language:
+            keys.append(pool_key(language, voice or None))
+    return keys
+
+
+class BotPool:
+    """
+    Channels with a bot already started, grouped by (language, voice).
+
+    `start_bot(channel, language, voice)` and `stop_bot(channel)` are the
+    same coroutines /session/start and /session/stop use.
+    """
+
+    def __init__(self, size: int, keys: list, start_bot, stop_bot):
+        self.size = size
+        self.keys = set(keys)
+        self._start_bot = start_bot
+        self._stop_bot = stop_bot
+        self._ready = {key: deque() for key in self.keys}
+        self._warming = {key: 0 for key in self.keys}
+        self._tasks: set = set()
+        self._stats = {"hits": 0, "misses": 0, "warm_failures": 0}
+
+    def warm(self):
+        """Fill every configured pool in the background."""
+        for key in self.keys:
+            self._refill(key)
+
+    def acquire(self, language: str | None, voice: str | None):
+        """Take a warm (channel, bot_result) for this language/voice, or None."""
+        key = pool_key(language, voice)
+        if key not in self.keys or self.size <= 0:
+            return None
+        ready = self._ready[key]
+        entry = ready.popleft() if ready else None
+        self._stats["hits" if entry else "misses"] += 1
+        self._refill(key)
+        return entry
+
+    def _refill(self, key: tuple):
+        while len(self._ready[key]) + self._warming[key] < self.size:
+            self._warming[key] += 1
+            task = asyncio.create_task(self._prewarm(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _prewarm(self, key: tuple):
+        channel = str(uuid.uuid4())
+        try:
+            result = await self._start_bot(channel, *key)
+        except Exception as e:
+            result = {"status": "error", "message": str(e)}
+        finally:
+            self._warming[key] -= 1
+        if result.get("status") == "started":
+            self._ready[key].append((channel, result))
+        else:
+            self._stats["warm_failures"] += 1
+            print(f"Failed to pre-warm bot for {key}: {result.get('message')}")
+
+    async def drain(self):
+        """Cancel pending warm-ups and stop every idle pooled bot."""
+        for task in self._tasks:
+            task.cancel()
+        channels = [channel for ready in self._ready.values() for channel, _ in ready]
+        for ready in self._ready.values():
+            ready.clear()
+        await asyncio.gather(*(self._stop_bot(channel) for channel in channels), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "size": self.size,
+            "ready": {f"{lang}:{voice}": len(ready) for (lang, voice), ready in self._ready.items()},
+        }
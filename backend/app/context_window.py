@@ -0,0 +1,179 @@
+import os
+import asyncio
+
+from app import model_client
+from app.model_registry import model_registry
+from app.scheduler import BATCH
+from app.sessions import ChatSession, format_turn, session_store
+
+# History limits applied to every chat prompt unless the persona's session
+# overrides them. The budget covers summary plus verbatim turns; the system
+# prompt (sent as the model's system instruction) and the new user message
+# always go in untouched.
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "4000"))
+CHAT_VERBATIM_TURNS = int(os.getenv("CHAT_VERBATIM_TURNS", "8"))
+
+_summary_tasks: dict = {}
+
+_stats = {
+    "requests": 0,
+    "prompt_tokens": 0,
+    "prompt_tokens_saved": 0,
+    "summaries_built": 0,
+    "summary_errors": 0,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token); good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def _window_start(history: list, budget: int, verbatim_turns: int, start: int = 0) -> int:
+    """Index of the oldest message that still fits in the verbatim window."""
+    used = 0
+    index = len(history)
+    min_index = max(start, len(history) - 2 * verbatim_turns)
+    while index > min_index:
+        tokens = estimate_tokens(history[index - 1]["content"])
+        if used + tokens > budget:
+            break
+        used += tokens
+        index -= 1
+    return index
+
+
+def _record(prompt_tokens: int, full_tokens: int) -> int:
+    saved = max(full_tokens - prompt_tokens, 0)
+    _stats["requests"] += 1
+    _stats["prompt_tokens"] += prompt_tokens
+    _stats["prompt_tokens_saved"] += saved
+    return saved
+
+
+def build_windowed_prompt(system_prompt: str, history: list, user_message: str) -> str:
+    """
+    Prompt for a stateless request: the newest turns that fit the default
+    budget are kept verbatim and older ones are dropped. `system_prompt` is
+    only counted here; callers pass it as the model's system instruction.
+    """
+    start = _window_start(history, CHAT_HISTORY_TOKEN_BUDGET, CHAT_VERBATIM_TURNS)
+    lines = [format_turn(m["role"], m["content"]) + "\n" for m in history[start:]]
+    prompt = f"{''.join(lines)}User: {user_message}\nAI:"
+
+    sent = estimate_tokens(system_prompt) + estimate_tokens(prompt)
+    dropped = sum(estimate_tokens(m["content"]) for m in history[:start])
+    _record(sent, sent + dropped)
+    return prompt
+
+
+def build_session_prompt(session: ChatSession, user_message: str) -> str:
+    """
+    Prompt for a session turn: rolling summary and the verbatim tail of the
+    conversation from the session's cached prefix. The session's system
+    prompt goes to the model as its system instruction.
+
+    If the summary is still being built and the verbatim part has outgrown
+    the budget, the oldest verbatim turns are trimmed for this request only.
+    """
+    budget = session.token_budget or CHAT_HISTORY_TOKEN_BUDGET
+    verbatim_turns = session.verbatim_turns or CHAT_VERBATIM_TURNS
+    prompt = session.build_prompt(user_message)
+    prompt_tokens = estimate_tokens(prompt)
+    instruction_tokens = estimate_tokens(session.system_prompt)
+    message_tokens = estimate_tokens(user_message)
+
+    if prompt_tokens - message_tokens > budget:
+        summary_tokens = estimate_tokens(session.summary) if session.summary else 0
+        start = _window_start(
+            session.history, max(budget - summary_tokens, 0), verbatim_turns, session.summarized_count
+        )
+        trimmed = ChatSession(
+            session_id=session.session_id,
+            system_prompt=session.system_prompt,
+            history=session.history,
+            summary=session.summary,
+            summarized_count=start,
+        )
+        prompt = trimmed.build_prompt(user_message)
+        prompt_tokens = estimate_tokens(prompt)
+
+    prompt_tokens += instruction_tokens
+    full_tokens = instruction_tokens + message_tokens + sum(estimate_tokens(m["content"]) for m in session.history)
+    saved = _record(prompt_tokens, full_tokens)
+    if saved:
+        print(f"Chat prompt for session {session.session_id}: ~{prompt_tokens} tokens, ~{saved} saved")
+    return prompt
+
+
+def schedule_summary(session: ChatSession):
+    """
+    Fold turns that have left the verbatim window into the session's rolling
+    summary. Runs in the background so the reply is never delayed by it; at
+    most one summary per session is in progress at a time.
+    """
+    budget = session.token_budget or CHAT_HISTORY_TOKEN_BUDGET
+    verbatim_turns = session.verbatim_turns or CHAT_VERBATIM_TURNS
+    summary_budget = budget // 4
+    fold_to = _window_start(
+        session.history, budget - summary_budget, verbatim_turns, session.summarized_count
+    )
+    if fold_to <= session.summarized_count or session.session_id in _summary_tasks:
+        return
+    # Fold in batches of half a window so a long session costs one summary
+    # call every few turns, unless the verbatim part is already over budget.
+    verbatim_tokens = estimate_tokens(session.prompt_prefix)
+    if fold_to - session.summarized_count < max(verbatim_turns, 2) and verbatim_tokens <= budget:
+        return
+
+    task = asyncio.create_task(_summarise(session.session_id, fold_to, summary_budget))
+    _summary_tasks[session.session_id] = task
+    task.add_done_callback(lambda _: _summary_tasks.pop(session.session_id, None))
+
+
+async def _summarise(session_id: str, fold_to: int, summary_budget: int):
+    session = session_store.get(session_id)
+    if session is None or fold_to <= session.summarized_count:
+        return
+
+    turns = "\n".join(
+        format_turn(m["role"], m["content"])
+        for m in session.history[session.summarized_count:fold_to]
+    )
+    prompt = f"""
+        You maintain a running summary of a language-practice conversation between
+        a learner (User) and a tutor (AI). Keep the facts the tutor needs to continue
+        naturally: topics covered, the learner's recurring mistakes, vocabulary already
+        introduced, and anything the learner shared about themselves.
+        Answer with the updated summary only, in at most {summary_budget * 3 // 4} words.
+
+        Current summary:
+        {session.summary or "(none)"}
+
+        New turns to fold in:
+        {turns}
+    """
+    try:
+        model = model_registry.for_endpoint("summary")
+        response = await model_client.generate_content(model, prompt, priority=BATCH)
+        summary = response.text.strip() if response and response.text else ""
+    except Exception as e:
+        print(f"Error summarising session {session_id}: {e}")
+        _stats["summary_errors"] += 1
+        return
+    if not summary:
+        return
+
+    # Folded into the stored session: other turns may have been stored while the model was working.
+    if session_store.fold(session_id, summary, fold_to):
+        _stats["summaries_built"] += 1
+
+
+def stats() -> dict:
+    """Prompt size and savings from history windowing, reported by /health."""
+    requests = _stats["requests"]
+    return {
+        **_stats,
+        "avg_prompt_tokens_saved": round(_stats["prompt_tokens_saved"] / requests, 1) if requests else 0,
+        "summaries_in_progress": len(_summary_tasks),
+    }
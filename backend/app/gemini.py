@@ -0,0 +1,44 @@
+import os
+import asyncio
+import threading
+
+# google.generativeai pulls in grpc, protobuf and the generated API types:
+# about half of a worker's import time and a good share of its memory. It is
+# imported and configured on first use instead of at import time, and the
+# lifespan warms it in the background once the worker is already serving,
+# so a cold start doesn't wait for it and deployments without model
+# endpoints never load it.
+GEMINI_WARM_ON_START = os.getenv("GEMINI_WARM_ON_START", "true").lower() == "true"
+
+_module = None
+_lock = threading.Lock()
+
+
+def genai():
+    """The configured google.generativeai module, imported on first use."""
+    global _module
+    if _module is None:
+        with _lock:
+            if _module is None:
+                import google.generativeai as module
+
+                api_key = os.getenv("GOOGLE_API_KEY")
+                if not api_key:
+                    print("could not get api key")
+                else:
+                    try:
+                        module.configure(api_key=api_key)
+                        print("Gemini API configured successfully")
+                    except Exception as e:
+                        print(f"ERROR: {e}")
+                _module = module
+    return _module
+
+
+def loaded() -> bool:
+    return _module is not None
+
+
+async def warm():
+    """Import and configure the SDK off the event loop."""
+    await asyncio.to_thread(genai)
@@ -0,0 +1,150 @@
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+from app.track_cache import TRACK_CACHE_TTL_SECONDS
+
+# Near-duplicate matching of onboarding goals. Off unless enabled, because a
+# match hands a user a track that was generated for somebody else's wording.
+# Entries expire with the tracks they point to, so a near-duplicate never
+# keeps serving a track the exact-key cache has already dropped.
+GOAL_INDEX_ENABLED = os.getenv("GOAL_INDEX_ENABLED", "false").lower() == "true"
+GOAL_INDEX_THRESHOLD = float(os.getenv("GOAL_INDEX_THRESHOLD", "0.8"))
+GOAL_INDEX_DIM = int(os.getenv("GOAL_INDEX_DIM", "256"))
+GOAL_INDEX_MAX_ENTRIES = int(os.getenv("GOAL_INDEX_MAX_ENTRIES", "20000"))
+GOAL_INDEX_TTL_SECONDS = float(os.getenv("GOAL_INDEX_TTL_SECONDS", str(TRACK_CACHE_TTL_SECONDS)))
+
+_WORD = re.compile(r"[^\W_]+")
+_STOPWORDS = frozenset(
+    "a an and as at be for from i in is it my of on or the to who with want wants "
+    "need needs needing learn learning someone person".split()
+)
+_SUFFIXES = ("ing", "ed", "es", "s")
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[: -len(suffix)]
+    return word
+
+
+def _features(text: str):
+    """Stemmed content words, plus their character trigrams at lower weight."""
+    for word in _WORD.findall(text.casefold()):
+        if word in _STOPWORDS:
+            continue
+        word = _stem(word)
+        yield word, 1.0
+        padded = f"^{word}$"
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3], 0.25
+
+
+def embed(text: str, dim: int = GOAL_INDEX_DIM) -> np.ndarray:
+    """L2-normalised signed feature-hashing vector of a goal."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature, weight in _features(text):
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += weight if h & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class GoalIndex:
+    """
+    Brute-force cosine index over goal vectors stored in one NumPy matrix.
+
+    Rows are appended in place (the matrix doubles when full) and, once
+    `max_entries` is reached, the oldest rows are overwritten. Rows older
+    than `ttl_seconds` are skipped by search until they are overwritten.
+    """
+
+    def __init__(self, dim: int = GOAL_INDEX_DIM, max_entries: int = GOAL_INDEX_MAX_ENTRIES,
+                 ttl_seconds: float = GOAL_INDEX_TTL_SECONDS):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._vectors = np.zeros((min(1024, max_entries), dim), dtype=np.float32)
+        self._expires = np.zeros(len(self._vectors), dtype=np.float64)
+        self._payloads: list = []
+        self._next = 0
+
+    def __len__(self):
+        """Entries that have not expired."""
+        return int(np.count_nonzero(self._expires[:len(self._payloads)] >= time.monotonic()))
+
+    def add(self, text: str, payload):
+        row = self._next
+        if row == len(self._payloads):
+            if row == len(self._vectors):
+                grown = np.zeros((min(2 * row, self.max_entries), self.dim), dtype=np.float32)
+                grown[:row] = self._vectors
+                self._vectors = grown
+                self._expires = np.resize(self._expires, len(grown))
+            self._payloads.append(payload)
+        else:
+            self._payloads[row] = payload
+        self._vectors[row] = embed(text, self.dim)
+        self._expires[row] = time.monotonic() + self.ttl_seconds
+        self._next = (row + 1) % self.max_entries
+
+    def search(self, text: str, k: int = 1) -> list:
+        """Top-k (score, payload) pairs of unexpired entries by cosine similarity, best first."""
+        n = len(self._payloads)
+        if n == 0:
+            return []
+        scores = self._vectors[:n] @ embed(text, self.dim)
+        scores[self._expires[:n] < time.monotonic()] = -np.inf
+        k = min(k, n)
+        top = np.argpartition(scores, -k)[-k:] if k < n else np.arange(n)
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(float(scores[i]), self._payloads[i]) for i in top if scores[i] > -np.inf]
+
+
+class GoalMatcher:
+    """Per-language goal indexes with a similarity threshold for cache reuse."""
+
+    def __init__(self, threshold: float = GOAL_INDEX_THRESHOLD):
+        self.threshold = threshold
+        self._indexes: dict = {}
+        self._stats = {"lookups": 0, "matches": 0, "lookup_seconds": 0.0}
+
+    def add(self, language: str, goal: str, track: dict):
+        key = " ".join(language.casefold().split())
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = GoalIndex()
+        index.add(goal, track)
+
+    def match(self, language: str, goal: str) -> dict | None:
+        """The stored track for the most similar goal, if it passes the threshold."""
+        index = self._indexes.get(" ".join(language.casefold().split()))
+        if index is None:
+            return None
+        start = time.perf_counter()
+        results = index.search(goal, k=1)
+        self._stats["lookups"] += 1
+        self._stats["lookup_seconds"] += time.perf_counter() - start
+        if results and results[0][0] >= self.threshold:
+            self._stats["matches"] += 1
+            print(f"Goal {goal!r} matched a cached track (similarity {results[0][0]:.2f})")
+            return results[0][1]
+        return None
+
+    def stats(self) -> dict:
+        lookups = self._stats["lookups"]
+        return {
+            "enabled": GOAL_INDEX_ENABLED,
+            "threshold": self.threshold,
+            "entries": sum(len(index) for index in self._indexes.values()),
+            "lookups": lookups,
+            "matches": self._stats["matches"],
+            "avg_lookup_ms": round(1000 * self._stats["lookup_seconds"] / lookups, 3) if lookups else 0,
+        }
+
+
+goal_matcher = GoalMatcher()
@@ -0,0 +1,183 @@
+import os
+import io
+import asyncio
+import re
+import time
+import wave
+from dataclasses import dataclass
+
+import numpy as np
+
+from app import model_client
+from app.scheduler import INTERACTIVE
+
+# Long-audio mode: WAV/PCM uploads longer than STT_LONG_AUDIO_SECONDS (or any
+# upload when explicitly requested) are cut into ~STT_SEGMENT_SECONDS pieces
+# and transcribed concurrently. Cuts prefer a quiet moment near the target;
+# when none is found the cut is a fixed window with STT_SEGMENT_OVERLAP_SECONDS
+# of overlap, de-duplicated when the pieces are stitched back together.
+STT_LONG_AUDIO_SECONDS = float(os.getenv("STT_LONG_AUDIO_SECONDS", "60"))
+STT_SEGMENT_SECONDS = float(os.getenv("STT_SEGMENT_SECONDS", "30"))
+STT_SEGMENT_OVERLAP_SECONDS = float(os.getenv("STT_SEGMENT_OVERLAP_SECONDS", "1.5"))
+STT_SEGMENT_CONCURRENCY = int(os.getenv("STT_SEGMENT_CONCURRENCY", "4"))
+
+SILENCE_SEARCH_SECONDS = 5.0
+ENERGY_FRAME_SECONDS = 0.02
+# A frame counts as silence below this fraction of the clip's median energy.
+SILENCE_RATIO = 0.1
+MAX_STITCH_WORDS = 25
+
+_SAMPLE_TYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+_WORD = re.compile(r"[^\W_]+")
+
+TRANSCRIBE_PROMPT = "Please transcribe the following audio file accurately. Return only the transcription text."
+
+
+@dataclass
+class Segment:
+    """Frame range of one piece of a long recording."""
+    start: int
+    end: int
+    overlap: int = 0
+
+
+def open_wav(data: bytes | None = None, path: str | None = None):
+    """Open an uploaded clip as a PCM WAV, or return None if it isn't one."""
+    try:
+        return wave.open(io.BytesIO(data) if data is not None else path, "rb")
+    except (wave.Error, EOFError):
+        return None
+
+
+def duration_seconds(wav) -> float:
+    return wav.getnframes() / wav.getframerate()
+
+
+def frame_energies(wav, block_seconds: float = 10.0) -> np.ndarray | None:
+    """RMS energy per ENERGY_FRAME_SECONDS, read block by block from the WAV."""
+    dtype = _SAMPLE_TYPES.get(wav.getsampwidth())
+    if dtype is None:
+        return None
+    channels = wav.getnchannels()
+    frame_len = max(int(wav.getframerate() * ENERGY_FRAME_SECONDS), 1)
+    block_frames = frame_len * max(int(block_seconds / ENERGY_FRAME_SECONDS), 1)
+
+    energies = []
+    wav.rewind()
+    while True:
+        raw = wav.readframes(block_frames)
+        if not raw:
+            break
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+        if dtype is np.uint8:
+            samples -= 128.0
+        samples = samples.reshape(-1, channels).mean(axis=1)
+        usable = len(samples) // frame_len * frame_len
+        if usable:
+            frames = samples[:usable].reshape(-1, frame_len)
+            energies.append(np.sqrt(np.mean(frames * frames, axis=1)))
+    wav.rewind()
+    return np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+
+
+def plan_segments(wav) -> list:
+    """Cut points for a recording: quiet moments near each target, else fixed windows."""
+    rate = wav.getframerate()
+    total = wav.getnframes()
+    target = int(STT_SEGMENT_SECONDS * rate)
+    overlap = int(STT_SEGMENT_OVERLAP_SECONDS * rate)
+    if total <= target + overlap:
+        return [Segment(0, total)]
+
+    energies = frame_energies(wav)
+    frame_len = max(int(rate * ENERGY_FRAME_SECONDS), 1)
+    search = int(SILENCE_SEARCH_SECONDS / ENERGY_FRAME_SECONDS)
+    threshold = float(np.median(energies)) * SILENCE_RATIO if energies is not None and len(energies) else 0.0
+
+    segments = []
+    start = 0
+    while total - start > target + overlap:
+        cut = start + target
+        seg_overlap = overlap
+        if energies is not None and len(energies):
+            center = cut // frame_len
+            lo, hi = max(center - search, start // frame_len + 1), min(center + search, len(energies))
+            if hi > lo:
+                quietest = lo + int(np.argmin(energies[lo:hi]))
+                if energies[quietest] <= threshold:
+                    cut = quietest * frame_len + frame_len // 2
+                    seg_overlap = 0
+        segments.append(Segment(start, cut, seg_overlap))
+        start = max(cut - seg_overlap, start + 1)
+    segments.append(Segment(start, total))
+    return segments
+
+
+def segment_wav_bytes(wav, segment: Segment) -> bytes:
+    """A standalone WAV file holding just `segment` of the recording."""
+    wav.setpos(segment.start)
+    pcm = wav.readframes(segment.end - segment.start)
+    out = io.BytesIO()
+    with wave.open(out, "wb") as writer:
+        writer.setnchannels(wav.getnchannels())
+        writer.setsampwidth(wav.getsampwidth())
+        writer.setframerate(wav.getframerate())
+        writer.writeframes(pcm)
+    return out.getvalue()
+
+
+def stitch(texts: list, overlapped: list | None = None) -> str:
+    """
+    Join segment transcripts. Where `overlapped[i]` says segment i shares
+    audio with the one before it, words repeated across the seam are dropped.
+    """
+    words: list = []
+    for i, text in enumerate(texts):
+        incoming = text.split()
+        if words and incoming and (overlapped is None or overlapped[i]):
+            tail = [w.casefold() for w in words[-MAX_STITCH_WORDS:]]
+            head = [w.casefold() for w in incoming[:MAX_STITCH_WORDS]]
+            tail = ["".join(_WORD.findall(w)) for w in tail]
+            head = ["".join(_WORD.findall(w)) for w in head]
+            for k in range(min(len(tail), len(head)), 0, -1):
+                if tail[-k:] == head[:k]:
+                    incoming = incoming[k:]
+                    break
+        words.extend(incoming)
+    return " ".join(words)
+
+
+async def transcribe_segments(model, wav, segments: list, concurrency: int = STT_SEGMENT_CONCURRENCY,
+                              priority: int = INTERACTIVE):
+    """
+    Transcribe each segment with at most `concurrency` model calls in flight.
+    Returns the stitched text and one timing record per segment; a failed
+    segment is reported in its record instead of failing the whole clip.
+    """
+    rate = wav.getframerate()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def transcribe_one(index: int, segment: Segment):
+        async with semaphore:
+            # setpos/readframes happen without an await in between, so the
+            # shared reader is never interleaved between tasks.
+            blob = {"mime_type": "audio/wav", "data": segment_wav_bytes(wav, segment)}
+            start = time.perf_counter()
+            timing = {
+                "index": index,
+                "start_seconds": round(segment.start / rate, 3),
+                "end_seconds": round(segment.end / rate, 3),
+            }
+            try:
+                response = await model_client.generate_content(model, [TRANSCRIBE_PROMPT, blob], priority=priority)
+                text = response.text.strip() if response and response.text else ""
+            except Exception as e:
+                print(f"Error transcribing segment {index}: {e}")
+                text = ""
+                timing["error"] = str(e)
+            timing["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            return text, timing
+
+    results = await asyncio.gather(*(transcribe_one(i, s) for i, s in enumerate(segments)))
+    overlapped = [False] + [segment.overlap > 0 for segment in segments[:-1]]
+    return stitch([text for text, _ in results], overlapped), [timing for _, timing in results]
@@ -0,0 +1,123 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Prometheus metrics served at /metrics. Under gunicorn every worker writes
+# its samples to PROMETHEUS_MULTIPROC_DIR (set by gunicorn.conf.py before
+# the workers start) and /metrics merges all of them, so a scrape sees the
+# whole container no matter which worker answers it. Without the variable
+# (uvicorn --reload in development) the process's own registry is served.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+UPLOAD_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2)
+
+HTTP_LATENCY = Histogram(
+    "echo_http_request_duration_seconds", "Time to the last byte of the response, by route.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "echo_http_requests_in_flight", "HTTP requests being handled.", multiprocess_mode="livesum",
+)
+MODEL_TTFT = Histogram(
+    "echo_model_time_to_first_token_seconds", "Time from a streamed model call starting to its first chunk.",
+    ["model"], buckets=LATENCY_BUCKETS,
+)
+MODEL_LATENCY = Histogram(
+    "echo_model_call_duration_seconds", "Total time of a model call, excluding scheduler queueing.",
+    ["model", "call"], buckets=LATENCY_BUCKETS,
+)
+MODEL_IN_FLIGHT = Gauge(
+    "echo_model_calls_in_flight", "Model calls running.", multiprocess_mode="livesum",
+)
+MODEL_TOKENS = Histogram(
+    "echo_model_tokens", "Tokens per model call, by kind (prompt, cached, response).",
+    ["model", "kind"], buckets=TOKEN_BUCKETS,
+)
+STT_UPLOAD_BYTES = Histogram(
+    "echo_stt_upload_bytes", "Size of audio uploaded for transcription.", buckets=UPLOAD_BUCKETS,
+)
+STT_MODEL_AUDIO_BYTES = Histogram(
+    "echo_stt_model_audio_bytes", "Size of audio sent to the model after normalisation.", buckets=UPLOAD_BUCKETS,
+)
+STT_PREP_LATENCY = Histogram(
+    "echo_stt_prep_duration_seconds", "Time spent normalising an uploaded clip.", buckets=LATENCY_BUCKETS,
+)
+ERRORS = Counter(
+    "echo_errors_total", "Errors by where they were caught and exception type.", ["where", "type"],
+)
+
+
+def model_name(model) -> str:
+    name = getattr(model, "model_name", None) or "unknown"
+    return name.removeprefix("models/")
+
+
+def record_error(where: str, error: BaseException):
+    ERRORS.labels(where, type(error).__name__).inc()
+
+
+def record_model_call(model: str, call: str, seconds: float, usage: dict, first_chunk_seconds: float | None = None):
+    """Latency and token counts of one finished model call."""
+    MODEL_LATENCY.labels(model, call).observe(seconds)
+    if first_chunk_seconds is not None:
+        MODEL_TTFT.labels(model).observe(first_chunk_seconds)
+    if usage:
+        MODEL_TOKENS.labels(model, "prompt").observe(usage.get("prompt_token_count") or 0)
+        MODEL_TOKENS.labels(model, "cached").observe(usage.get("cached_content_token_count") or 0)
+        MODEL_TOKENS.labels(model, "response").observe(usage.get("candidates_token_count") or 0)
+
+
+def render() -> tuple:
+    """(body, content type) for a /metrics scrape."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware timing every HTTP request to its last body byte,
+    so streamed responses are measured to the end of the stream. Routes are
+    labelled by their path template; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            record_error("http", e)
+            raise
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status["code"]),
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,194 @@
+import os
+import asyncio
+import functools
+import hashlib
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+
+from app import metrics
+from app.scheduler import INTERACTIVE, scheduler
+
+# The google-generativeai client is synchronous, so every model call is pushed
+# onto a bounded thread pool instead of running on the event loop. The pool
+# size caps how many Gemini requests a single worker keeps in flight.
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=GEMINI_MAX_CONCURRENCY,
+    thread_name_prefix="gemini",
+)
+
+_in_flight = 0
+
+
+async def run(func, *args, **kwargs):
+    """Run any blocking Gemini SDK call (file uploads, lookups) on the shared executor."""
+    global _in_flight
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    _in_flight += 1
+    try:
+        return await loop.run_in_executor(_executor, call)
+    finally:
+        _in_flight -= 1
+
+
+async def generate_content(model, contents, priority: int = INTERACTIVE,
+                           deadline_seconds: float | None = None, coalesce: bool = False, **kwargs):
+    """
+    Run `model.generate_content` on the shared executor without blocking the
+    event loop, once the scheduler admits it at `priority`. With `coalesce`,
+    identical concurrent requests share one Gemini call.
+    """
+    key = _request_key(model, contents, kwargs) if coalesce else None
+    try:
+        return await scheduler.call(
+            lambda: _timed_call(model, contents, kwargs),
+            priority=priority,
+            deadline_seconds=deadline_seconds,
+            coalesce_key=key,
+        )
+    except Exception as e:
+        metrics.record_error("model", e)
+        raise
+
+
+async def _timed_call(model, contents, kwargs: dict):
+    """One attempt at a unary call, timed from the moment the scheduler runs it."""
+    start = time.perf_counter()
+    metrics.MODEL_IN_FLIGHT.inc()
+    try:
+        response = await run(model.generate_content, contents, **kwargs)
+    finally:
+        metrics.MODEL_IN_FLIGHT.dec()
+    metrics.record_model_call(metrics.model_name(model), "unary", time.perf_counter() - start,
+                              usage_metadata(response))
+    return response
+
+
+def _request_key(model, contents, kwargs: dict) -> str:
+    digest = hashlib.sha256(repr((getattr(model, "model_name", None), contents, sorted(kwargs.items()))).encode())
+    return digest.hexdigest()
+
+
+async def stream_content(model, contents, priority: int = INTERACTIVE,
+                         deadline_seconds: float | None = None, **kwargs):
+    """
+    Async iterator over `model.generate_content(..., stream=True)` chunks.
+
+    The stream waits for scheduler admission like any other call. A
+    rate-limit error before the first chunk is retried the way unary calls
+    are; once chunks have been yielded a retry would repeat them, so later
+    errors are raised.
+
+    The blocking stream is drained on the shared executor and handed to the
+    event loop chunk by chunk. If the consumer stops early (client went away,
+    task cancelled) the worker stops reading and cancels the upstream call
+    instead of letting the generation run to completion.
+    """
+    deadline = scheduler.deadline(priority, deadline_seconds)
+    for attempt in itertools.count():
+        yielded = False
+        try:
+            await scheduler.admit(priority, deadline - asyncio.get_running_loop().time())
+            async with aclosing(_stream_attempt(model, contents, kwargs)) as chunks:
+                async for chunk in chunks:
+                    yielded = True
+                    yield chunk
+            return
+        except Exception as e:
+            delay = None if yielded else scheduler.retry_delay(e, attempt, deadline)
+            if delay is None:
+                metrics.record_error("model", e)
+                raise
+        await asyncio.sleep(delay)
+
+
+async def _stream_attempt(model, contents, kwargs: dict):
+    """One admitted attempt at a streaming call; see stream_content."""
+    global _in_flight
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    stream = {}
+
+    def pump():
+        try:
+            stream["response"] = model.generate_content(contents, stream=True, **kwargs)
+            for chunk in stream["response"]:
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        except Exception as e:
+            if not stop.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            if not stop.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    _in_flight += 1
+    metrics.MODEL_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    first_chunk = None
+    usage = {}
+    worker = loop.run_in_executor(_executor, pump)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            usage = usage_metadata(item) or usage
+            yield item
+    finally:
+        stop.set()
+        _in_flight -= 1
+        metrics.MODEL_IN_FLIGHT.dec()
+        metrics.record_model_call(metrics.model_name(model), "stream", time.perf_counter() - start,
+                                  usage, first_chunk)
+        if not worker.done():
+            # The consumer gave up mid-stream: cancel the upstream call so the
+            # worker thread unblocks instead of draining the whole generation.
+            _cancel_stream(stream.get("response"))
+            worker.add_done_callback(lambda f: f.exception())
+
+
+def _cancel_stream(response):
+    """Best-effort cancellation of the gRPC stream behind a streaming response."""
+    iterator = getattr(response, "_iterator", None)
+    cancel = getattr(iterator, "cancel", None)
+    if cancel:
+        try:
+            cancel()
+        except Exception as e:
+            print(f"Failed to cancel model stream: {e}")
+
+
+def usage_metadata(response) -> dict:
+    """Token counts reported by Gemini for a response or final stream chunk."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return {}
+    return {
+        "prompt_token_count": usage.prompt_token_count,
+        "cached_content_token_count": getattr(usage, "cached_content_token_count", 0),
+        "candidates_token_count": usage.candidates_token_count,
+        "total_token_count": usage.total_token_count,
+    }
+
+
+def stats() -> dict:
+    """Current load on the model client, reported by /health."""
+    return {
+        "max_concurrency": GEMINI_MAX_CONCURRENCY,
+        "in_flight": _in_flight,
+        "scheduler": scheduler.stats(),
+    }
@@ -0,0 +1,76 @@
+import os
+import json
+
+from app import gemini
+from app.cache import TTLCache
+
+# Which Gemini model each endpoint uses. Chat and speech-to-text default to
+# the faster flash tier; onboarding writes whole personas and stays on pro.
+GEMINI_MODEL_ONBOARDING = os.getenv("GEMINI_MODEL_ONBOARDING", "gemini-1.5-pro")
+GEMINI_MODEL_CHAT = os.getenv("GEMINI_MODEL_CHAT", "gemini-1.5-flash")
+GEMINI_MODEL_STT = os.getenv("GEMINI_MODEL_STT", "gemini-1.5-flash")
+GEMINI_MODEL_SUMMARY = os.getenv("GEMINI_MODEL_SUMMARY", "gemini-1.5-flash")
+MODEL_REGISTRY_MAX_ENTRIES = int(os.getenv("MODEL_REGISTRY_MAX_ENTRIES", "512"))
+MODEL_REGISTRY_TTL_SECONDS = float(os.getenv("MODEL_REGISTRY_TTL_SECONDS", "3600"))
+
+ENDPOINT_MODELS = {
+    "onboarding": GEMINI_MODEL_ONBOARDING,
+    "chat": GEMINI_MODEL_CHAT,
+    "stt": GEMINI_MODEL_STT,
+    "summary": GEMINI_MODEL_SUMMARY,
+}
+
+
+def model_key(model_name: str, system_instruction: str | None, generation_config: dict | None) -> tuple:
+    # The instruction string itself is the key: str caches its hash, so a
+    # lookup for a long persona costs no more than for a short one.
+    config = json.dumps(generation_config, sort_keys=True) if generation_config else None
+    return model_name, system_instruction or None, config
+
+
+class ModelRegistry:
+    """
+    Configured GenerativeModel objects, built once per (model name, system
+    instruction, generation config) and reused across requests. Personas
+    that stop chatting age out after MODEL_REGISTRY_TTL_SECONDS.
+    """
+
+    def __init__(self, max_entries: int = MODEL_REGISTRY_MAX_ENTRIES,
+                 ttl_seconds: float = MODEL_REGISTRY_TTL_SECONDS, factory=None):
+        self._models = TTLCache(max_entries, ttl_seconds)
+        self._factory = factory
+        self._stats = {"hits": 0, "created": 0}
+
+    def get(self, model_name: str, system_instruction: str | None = None,
+            generation_config: dict | None = None):
+        key = model_key(model_name, system_instruction, generation_config)
+        model = self._models.get(key)
+        if model is not None:
+            self._stats["hits"] += 1
+            return model
+        kwargs = {}
+        if system_instruction:
+            kwargs["system_instruction"] = system_instruction
+        if generation_config:
+            kwargs["generation_config"] = generation_config
+        factory = self._factory or gemini.genai().GenerativeModel
+        model = factory(model_name, **kwargs)
+        self._models.set(key, model)
+        self._stats["created"] += 1
+        return model
+
+    def for_endpoint(self, endpoint: str, system_instruction: str | None = None,
+                     generation_config: dict | None = None):
+        """The model configured for `endpoint` (onboarding, chat, stt, summary)."""
+        return self.get(ENDPOINT_MODELS[endpoint], system_instruction, generation_config)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "cached": len(self._models),
+            "evictions": self._models.evictions,
+            "endpoints": ENDPOINT_MODELS,
+        }
+
+
+model_registry = ModelRegistry()
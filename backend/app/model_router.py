@@ -0,0 +1,113 @@
+import os
+import re
+from collections import deque
+from dataclasses import dataclass, field
+
+from app.model_registry import GEMINI_MODEL_CHAT
+
+# Chat turns go to the fast tier unless they look like they need the pro
+# model: a long learner message, an advanced persona, or an explicit request
+# to correct or explain grammar. CHAT_ROUTER_ENABLED=false sends every turn
+# to GEMINI_MODEL_CHAT as before.
+CHAT_ROUTER_ENABLED = os.getenv("CHAT_ROUTER_ENABLED", "true").lower() == "true"
+GEMINI_MODEL_CHAT_FAST = os.getenv("GEMINI_MODEL_CHAT_FAST", "gemini-1.5-flash")
+GEMINI_MODEL_CHAT_PRO = os.getenv("GEMINI_MODEL_CHAT_PRO", "gemini-1.5-pro")
+CHAT_ESCALATE_MIN_WORDS = int(os.getenv("CHAT_ESCALATE_MIN_WORDS", "40"))
+CHAT_ESCALATE_LEVELS = {
+    level.strip().lower()
+    for level in os.getenv("CHAT_ESCALATE_LEVELS", "b2,c1,c2,advanced,upper-intermediate,fluent").split(",")
+    if level.strip()
+}
+
+FAST = "fast"
+PRO = "pro"
+
+# Asking the tutor to correct or explain, in the languages Echo is used with most.
+_CORRECTION_REQUEST = re.compile(
+    r"\b(correct(ion)?s?|grammar|explain|is (this|that|it) (right|correct)|did i say|"
+    r"what'?s the difference|corrig\w*|gram[aá]tica|explica\w*|est[aá] bien|"
+    r"grammaire|expliqu\w*|c'est correct|korrigier\w*|grammatik|erkl[aä]r\w*|"
+    r"corregg\w*|grammatica|spiega\w*)\b",
+    re.IGNORECASE,
+)
+_LEVEL_NAME = r"[abc][12]|advanced|upper[- ]intermediate|fluent|beginner|elementary|intermediate"
+# A level word only counts when it is stated as the learner's level: a
+# "Level: B2" style field, or the word qualifying "level", "learner(s)" or
+# "student(s)". Elsewhere ("wants to become fluent", "advanced beginner")
+# it says nothing about how hard the conversation should be.
+_LEVEL = re.compile(
+    rf"\b(?:level|proficiency|cefr)\s*[:=-]?\s*({_LEVEL_NAME})\b"
+    rf"|\b({_LEVEL_NAME})[\s-]+(?:level|learners?|students?)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Route:
+    """Which chat tier a turn goes to, and why."""
+    tier: str
+    model_name: str
+    reasons: list = field(default_factory=list)
+
+
+def persona_level(system_prompt: str) -> str | None:
+    """The first escalating level a persona states, else the first level it states, else None."""
+    levels = [(field or phrase).lower().replace(" ", "-") for field, phrase in _LEVEL.findall(system_prompt or "")]
+    escalating = [level for level in levels if level in CHAT_ESCALATE_LEVELS]
+    return (escalating or levels or [None])[0]
+
+
+class ChatRouter:
+    """Routes chat turns between the fast and pro tiers and tracks latency per tier."""
+
+    def __init__(self, enabled: bool = CHAT_ROUTER_ENABLED, fast_model: str = GEMINI_MODEL_CHAT_FAST,
+                 pro_model: str = GEMINI_MODEL_CHAT_PRO, min_words: int = CHAT_ESCALATE_MIN_WORDS):
+        self.enabled = enabled
+        self.models = {FAST: fast_model, PRO: pro_model}
+        self.min_words = min_words
+        self._latencies_ms = {FAST: deque(maxlen=1000), PRO: deque(maxlen=1000)}
+        self._counts = {FAST: 0, PRO: 0}
+        self._reasons: dict = {}
+
+    def route(self, system_prompt: str, user_message: str) -> Route:
+        if not self.enabled:
+            return Route(FAST, GEMINI_MODEL_CHAT)
+        reasons = []
+        if len(user_message.split()) >= self.min_words:
+            reasons.append("long_message")
+        if persona_level(system_prompt) in CHAT_ESCALATE_LEVELS:
+            reasons.append("advanced_persona")
+        if _CORRECTION_REQUEST.search(user_message):
+            reasons.append("correction_request")
+        tier = PRO if reasons else FAST
+        self._counts[tier] += 1
+        for reason in reasons:
+            self._reasons[reason] = self._reasons.get(reason, 0) + 1
+        return Route(tier, self.models[tier], reasons)
+
+    def persona_model(self, system_prompt: str) -> str:
+        """The model a persona's ordinary turns go to, without counting a routed turn."""
+        if not self.enabled:
+            return GEMINI_MODEL_CHAT
+        return self.models[PRO if persona_level(system_prompt) in CHAT_ESCALATE_LEVELS else FAST]
+
+    def record(self, route: Route, latency_ms: float):
+        """Log a routed turn once its reply is complete."""
+        self._latencies_ms[route.tier].append(latency_ms)
+        print(f"chat route: {route.tier} ({route.model_name}) {latency_ms:.0f} ms"
+              + (f" - {', '.join(route.reasons)}" if route.reasons else ""))
+
+    def stats(self) -> dict:
+        tiers = {}
+        for tier, samples in self._latencies_ms.items():
+            ordered = sorted(samples)
+            tiers[tier] = {
+                "model": self.models[tier],
+                "turns": self._counts[tier],
+                "latency_ms_p50": round(ordered[len(ordered) // 2], 1) if ordered else None,
+                "latency_ms_p95": round(ordered[int(len(ordered) * 0.95)], 1) if ordered else None,
+            }
+        return {"enabled": self.enabled, "tiers": tiers, "escalation_reasons": self._reasons}
+
+
+chat_router = ChatRouter()
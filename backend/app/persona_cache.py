@@ -0,0 +1,168 @@
+import os
+import asyncio
+import datetime
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+
+from app import gemini, model_client
+from app.cache import TTLCache
+from app.context_window import estimate_tokens
+from app.model_registry import model_registry
+
+# A track's persona (its generated system_prompt) is the same for every turn
+# of every conversation on that track, so it is registered once and each
+# chat turn references the registered prefix instead of resending it.
+#
+# PERSONA_CACHE_BACKEND=gemini uses Gemini explicit context caching. Gemini
+# only caches prompts of GEMINI_CACHE_MIN_TOKENS or more (32k for 1.5
+# models), so shorter personas, and every persona with the default "local"
+# backend, are held as a per-track model with the persona as its system
+# instruction; Gemini's implicit prefix caching then applies where available
+# and the cached token counts it reports are passed through.
+PERSONA_CACHE_BACKEND = os.getenv("PERSONA_CACHE_BACKEND", "local")
+PERSONA_CACHE_TTL_SECONDS = int(os.getenv("PERSONA_CACHE_TTL_SECONDS", "3600"))
+PERSONA_CACHE_REFRESH_SECONDS = int(os.getenv("PERSONA_CACHE_REFRESH_SECONDS", "300"))
+PERSONA_CACHE_MAX_ENTRIES = int(os.getenv("PERSONA_CACHE_MAX_ENTRIES", "1000"))
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "32768"))
+# Explicit caches need a pinned model version, e.g. gemini-1.5-flash-002.
+GEMINI_CACHE_MODEL_VERSION = os.getenv("GEMINI_CACHE_MODEL_VERSION", "002")
+
+_VERSIONED = re.compile(r"-\d{3}$")
+
+
+def persona_key(model_name: str, system_prompt: str) -> str:
+    return hashlib.sha256(f"{model_name}\n{system_prompt}".encode()).hexdigest()
+
+
+def cache_model_name(model_name: str) -> str:
+    return model_name if _VERSIONED.search(model_name) else f"{model_name}-{GEMINI_CACHE_MODEL_VERSION}"
+
+
+@dataclass
+class PersonaHandle:
+    """A persona registered for reuse: the model to call and, for Gemini caches, the cache to keep alive."""
+    key: str
+    model_name: str
+    backend: str
+    persona_tokens: int
+    model: object
+    cache: object = None
+    expires_at: float = 0.0
+
+
+class PersonaCache:
+    """Per-track persona handles, created once and refreshed before their TTL runs out."""
+
+    def __init__(self, backend: str = PERSONA_CACHE_BACKEND, ttl_seconds: int = PERSONA_CACHE_TTL_SECONDS,
+                 refresh_seconds: int = PERSONA_CACHE_REFRESH_SECONDS,
+                 max_entries: int = PERSONA_CACHE_MAX_ENTRIES, min_cache_tokens: int = GEMINI_CACHE_MIN_TOKENS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.refresh_seconds = min(refresh_seconds, ttl_seconds // 2)
+        self.min_cache_tokens = min_cache_tokens
+        self._handles = TTLCache(max_entries, ttl_seconds)
+        self._pending: dict = {}
+        self._tasks: set = set()
+        self._stats = {
+            "handles_created": 0, "gemini_caches": 0, "cache_errors": 0, "refreshes": 0,
+            "turns": 0, "input_tokens": 0, "cached_input_tokens": 0,
+        }
+
+    async def model_for(self, model_name: str, system_prompt: str) -> tuple:
+        """(model, handle) for a chat turn with this persona on `model_name`."""
+        key = persona_key(model_name, system_prompt)
+        handle = self._handles.get(key)
+        if handle is None:
+            # One creation per persona, however many turns arrive at once.
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._create(key, model_name, system_prompt))
+                self._pending[key] = pending
+                pending.add_done_callback(lambda _: self._pending.pop(key, None))
+            handle = await asyncio.shield(pending)
+        elif handle.cache is not None and handle.expires_at - time.time() < self.refresh_seconds:
+            self._spawn(self._refresh(handle))
+        return handle.model, handle
+
+    def register(self, model_name: str, system_prompt: str):
+        """Create the persona's handle in the background, e.g. as soon as a track is generated."""
+        self._spawn(self.model_for(model_name, system_prompt))
+
+    async def _create(self, key: str, model_name: str, system_prompt: str) -> PersonaHandle:
+        tokens = estimate_tokens(system_prompt)
+        handle = None
+        if self.backend == "gemini" and tokens >= self.min_cache_tokens:
+            handle = await self._create_gemini_cache(key, model_name, system_prompt, tokens)
+        if handle is None:
+            model = model_registry.get(model_name, system_instruction=system_prompt)
+            handle = PersonaHandle(key, model_name, "local", tokens, model)
+        self._handles.set(key, handle)
+        self._stats["handles_created"] += 1
+        return handle
+
+    async def _create_gemini_cache(self, key: str, model_name: str, system_prompt: str, tokens: int):
+        try:
+            cache = await model_client.run(
+                gemini.genai().caching.CachedContent.create,
+                model=cache_model_name(model_name),
+                display_name=f"echo-persona-{key[:16]}",
+                system_instruction=system_prompt,
+                ttl=datetime.timedelta(seconds=self.ttl_seconds),
+            )
+        except Exception as e:
+            # Fall back to the local handle; the turn still works, just uncached.
+            print(f"Could not create Gemini context cache for persona {key[:16]}: {e}")
+            self._stats["cache_errors"] += 1
+            return None
+        self._stats["gemini_caches"] += 1
+        model = gemini.genai().GenerativeModel.from_cached_content(cache)
+        return PersonaHandle(key, model_name, "gemini", tokens, model, cache, time.time() + self.ttl_seconds)
+
+    async def _refresh(self, handle: PersonaHandle):
+        if handle.expires_at - time.time() >= self.refresh_seconds:
+            return  # another turn already refreshed it
+        handle.expires_at = time.time() + self.ttl_seconds
+        try:
+            await model_client.run(handle.cache.update, ttl=datetime.timedelta(seconds=self.ttl_seconds))
+            self._handles.set(handle.key, handle)
+            self._stats["refreshes"] += 1
+        except Exception as e:
+            print(f"Could not refresh Gemini context cache {handle.cache.name}: {e}")
+            self._stats["cache_errors"] += 1
+            self._handles.delete(handle.key)
+
+    def turn_usage(self, handle: PersonaHandle, usage: dict, prompt: str = "") -> dict:
+        """
+        Cached vs uncached input tokens for one turn, from Gemini's usage
+        metadata when present, otherwise estimated.
+        """
+        input_tokens = usage.get("prompt_token_count") or handle.persona_tokens + estimate_tokens(prompt)
+        cached = usage.get("cached_content_token_count") or 0
+        self._stats["turns"] += 1
+        self._stats["input_tokens"] += input_tokens
+        self._stats["cached_input_tokens"] += cached
+        return {
+            "persona_cache": handle.backend,
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached,
+            "uncached_input_tokens": input_tokens - cached,
+        }
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> dict:
+        total = self._stats["input_tokens"]
+        return {
+            **self._stats,
+            "backend": self.backend,
+            "handles": len(self._handles),
+            "cached_input_ratio": round(self._stats["cached_input_tokens"] / total, 3) if total else 0.0,
+        }
+
+
+persona_cache = PersonaCache()
@@ -0,0 +1,205 @@
+import os
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError, model_validator
+from starlette.concurrency import run_in_threadpool
+
+from app import audio_upload, batch_jobs
+from app.batch_jobs import BatchRunner, JobNotFound, JobStore
+from app.routers.onboarding import match_or_fetch_learning_track
+from app.routers.stt import normalise_audio, transcribe_audio
+from app.scheduler import BATCH
+from app.track_cache import track_cache
+
+# Batch jobs: bulk track generation and re-transcription of archived
+# recordings, run in the background at BATCH priority (see app/batch_jobs.py).
+router = APIRouter(tags=["batch"])
+USES_GEMINI = True
+
+# Audio items name files under this directory; empty disables them.
+BATCH_AUDIO_ROOT = os.getenv("BATCH_AUDIO_ROOT", "")
+
+
+class BatchItem(BaseModel):
+    """One line of a batch job's JSONL input."""
+    kind: Literal["track", "transcribe"]
+    id: Optional[str] = None
+    language: Optional[str] = None
+    goal: Optional[str] = None
+    audio: Optional[str] = None
+    long_audio_mode: bool = False
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.kind == "track" and not (self.language and self.goal):
+            raise ValueError("track items need language and goal")
+        if self.kind == "transcribe":
+            if not self.audio:
+                raise ValueError("transcribe items need audio")
+            audio_path(self.audio)
+        return self
+
+
+class BatchJob(BaseModel):
+    """Status and progress of a batch job."""
+    id: str
+    status: str
+    total: int
+    processed: int
+    succeeded: int
+    failed: int
+    percent: float
+    items_per_minute: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+
+def audio_path(reference: str) -> str:
+    """The file an audio item refers to, which must be inside BATCH_AUDIO_ROOT."""
+    if not BATCH_AUDIO_ROOT:
+        raise ValueError("transcribe items are disabled: BATCH_AUDIO_ROOT is not set")
+    root = os.path.realpath(BATCH_AUDIO_ROOT)
+    path = os.path.realpath(os.path.join(root, reference))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"{reference} is outside BATCH_AUDIO_ROOT")
+    return path
+
+
+async def run_track_item(item: dict) -> dict:
+    # Same cache and goal index as /onboarding/generate-track, so the tracks
+    # generated here are served from cache when users ask for them.
+    return await track_cache.get_or_generate(
+        item["language"], item["goal"],
+        lambda language, goal: match_or_fetch_learning_track(language, goal, priority=BATCH),
+    )
+
+
+async def run_transcribe_item(item: dict) -> dict:
+    audio = await audio_upload.spool_file(audio_path(item["audio"]))
+    try:
+        await normalise_audio(audio)
+        response = await transcribe_audio(audio, item.get("long_audio_mode", False), priority=BATCH)
+        return response.model_dump(exclude_none=True)
+    finally:
+        audio.cleanup()
+
+
+runner = BatchRunner(JobStore(), {"track": run_track_item, "transcribe": run_transcribe_item})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    reaper = None
+    if batch_jobs.BATCH_AUTO_RESUME:
+        runner.resume_orphaned()
+        reaper = asyncio.create_task(runner.run_reaper())
+    yield
+    if reaper is not None:
+        reaper.cancel()
+    await runner.shutdown()
+
+
+def parse_items(raw: bytes) -> list:
+    """Validated items of a JSONL upload; raises HTTPException(400) naming the bad line."""
+    items = []
+    for number, line in enumerate(raw.decode("utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            items.append(BatchItem.model_validate(json.loads(line)).model_dump(exclude_none=True))
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Line {number}: {e}")
+        except ValidationError as e:
+            reasons = "; ".join(error["msg"] for error in e.errors())
+            raise HTTPException(status_code=400, detail=f"Line {number}: {reasons}")
+        if len(items) > batch_jobs.BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"More than {batch_jobs.BATCH_MAX_ITEMS} items")
+    if not items:
+        raise HTTPException(status_code=400, detail="No items in the file")
+    return items
+
+
+def get_job(job_id: str) -> dict:
+    try:
+        return runner.store.get(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail="Unknown batch job")
+
+
+@router.post("/batch/jobs", response_model=BatchJob, status_code=202)
+async def create_batch_job(file: UploadFile = File(...)):
+    """
+    Start a batch job from a JSONL file, one item per line:
+
+        {"kind": "track", "language": "Spanish", "goal": "Ordering food", "id": "es-food"}
+        {"kind": "transcribe", "audio": "2024/ana-0413.wav", "long_audio_mode": false}
+
+    Results are appended to /batch/jobs/{id}/results as each item finishes,
+    one JSON object per line with the item's index, id, status and result
+    or error. Follow progress on /batch/jobs/{id}.
+    """
+    raw = await file.read(batch_jobs.BATCH_MAX_INPUT_BYTES + 1)
+    if len(raw) > batch_jobs.BATCH_MAX_INPUT_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch input is limited to {batch_jobs.BATCH_MAX_INPUT_BYTES} bytes")
+    try:
+        items = parse_items(raw)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Batch input must be UTF-8 JSONL")
+    job = runner.submit(items)
+    print(f"Batch job {job['id']} started with {len(items)} items")
+    return batch_jobs.progress(job)
+
+
+@router.get("/batch/jobs", response_model=List[BatchJob])
+def list_batch_jobs(limit: int = 100):
+    return [batch_jobs.progress(job) for job in runner.store.list(limit)]
+
+
+@router.get("/batch/jobs/{job_id}", response_model=BatchJob)
+def batch_job_status(job_id: str):
+    return batch_jobs.progress(get_job(job_id))
+
+
+@router.get("/batch/jobs/{job_id}/results")
+async def batch_job_results(job_id: str):
+    """
+    The results written so far, as JSONL in completion order. The length is
+    fixed when the request arrives, so lines the job appends meanwhile are
+    left for the next call rather than cut off mid-line.
+    """
+    get_job(job_id)
+    path = batch_jobs.output_path(job_id)
+    length = await run_in_threadpool(batch_jobs.complete_length, path)
+    return StreamingResponse(
+        batch_jobs.read_prefix(path, length),
+        media_type="application/x-ndjson",
+        headers={"Content-Length": str(length), "Content-Disposition": f'attachment; filename="{job_id}.jsonl"'},
+    )
+
+
+@router.post("/batch/jobs/{job_id}/cancel", response_model=BatchJob)
+async def cancel_batch_job(job_id: str):
+    get_job(job_id)
+    return batch_jobs.progress(runner.cancel(job_id))
+
+
+@router.post("/batch/jobs/{job_id}/resume", response_model=BatchJob)
+async def resume_batch_job(job_id: str):
+    """Continue an interrupted, failed or cancelled job from its checkpoint."""
+    job = get_job(job_id)
+    if not runner.start(job_id):
+        detail = "Job is already running" if job["status"] == batch_jobs.RUNNING else f"Job is {job['status']}"
+        raise HTTPException(status_code=409, detail=detail)
+    return batch_jobs.progress(runner.store.get(job_id))
+
+
+def stats() -> dict:
+    return {"batch": runner.stats()}
@@ -0,0 +1,238 @@
+import math
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app import context_window, metrics, model_client
+from app.model_router import chat_router
+from app.persona_cache import persona_cache
+from app.routers.common import ClientDisconnected, chat_model, elapsed_ms, get_session, sse_event, stream_model_text, turn_usage
+from app.scheduler import ModelOverloaded
+from app.sessions import session_store
+from app.topic_openers import opener_cache
+
+# Chat: text turns, streamed turns, server-side conversations and topic openers.
+router = APIRouter(tags=["chat"])
+USES_GEMINI = True
+
+
+class ChatMessage(BaseModel):
+    """A single chat message."""
+    role: str = Field(..., example="human")
+    content: str = Field(..., example="Hello, who are you?")
+
+
+class ChatRequest(BaseModel):
+    """
+    Data model for a chat request.
+
+    Either send `system_prompt` and the full `history`, or a `session_id`
+    from /chat/session and only the new `user_message`.
+    """
+    system_prompt: Optional[str] = Field(None, example="You are a helpful assistant.")
+    history: List[ChatMessage] = Field(default_factory=list)
+    user_message: str = Field(..., example="What's the weather like?")
+    session_id: Optional[str] = Field(None, example="3f2b9c0e5d8a4c1f9e7b6a5d4c3b2a10")
+
+
+class ChatResponse(BaseModel):
+    """Data model for a chat response."""
+    ai_message: str = Field(..., example="The weather is sunny today.")
+    session_id: Optional[str] = None
+    usage: Optional[dict] = Field(None, description="Input tokens for this turn, cached vs uncached")
+
+
+class OpenerRequest(BaseModel):
+    """Data model for the tutor's opening line on a topic."""
+    system_prompt: str = Field(..., example="You are Dr. Mateo, a senior doctor...")
+    topic: str = Field(..., example="Greeting a patient")
+
+
+class OpenerResponse(BaseModel):
+    """Data model for a topic opener."""
+    ai_message: str = Field(..., example="Good morning! What brings you in today?")
+    prefetched: bool = Field(..., description="Served from the track's prefetched openers")
+
+
+class ChatSessionRequest(BaseModel):
+    """Data model for starting a server-side conversation."""
+    system_prompt: str = Field(..., example="You are a helpful assistant.")
+    history: List[ChatMessage] = Field(default_factory=list)
+    token_budget: Optional[int] = Field(None, example=4000, description="History token budget for this persona")
+    verbatim_turns: Optional[int] = Field(None, example=8, description="Recent turns always kept word for word")
+
+
+class ChatSessionResponse(BaseModel):
+    """Data model for a newly created conversation."""
+    session_id: str = Field(..., example="3f2b9c0e5d8a4c1f9e7b6a5d4c3b2a10")
+
+def build_chat_prompt(system_prompt: str, history: List[ChatMessage], user_message: str) -> str:
+    """
+    Build a formatted chat prompt from system prompt, history, and new message.
+    Only the most recent turns that fit the history token budget are included.
+    """
+    messages = [msg.model_dump() for msg in history]
+    return context_window.build_windowed_prompt(system_prompt, messages, user_message)
+
+
+async def resolve_chat_prompt(request: ChatRequest):
+    """
+    Return (model, route, persona), the prompt for a chat turn, and its
+    server-side session if it has one.
+    """
+    if request.session_id:
+        session = get_session(request.session_id)
+        prompt = context_window.build_session_prompt(session, request.user_message)
+        return await chat_model(session.system_prompt, request.user_message), prompt, session
+
+    if not request.system_prompt:
+        raise HTTPException(status_code=400, detail="system_prompt or session_id is required")
+    prompt = build_chat_prompt(request.system_prompt, request.history, request.user_message)
+    return await chat_model(request.system_prompt, request.user_message), prompt, None
+
+
+@router.post("/chat/opener", response_model=OpenerResponse)
+async def chat_opener(request: OpenerRequest):
+    """
+    The tutor's opening line for a topic of the track, from the prefetched
+    openers when available.
+    """
+    try:
+        text, prefetched = await opener_cache.opener(request.system_prompt, request.topic)
+    except ModelOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    except Exception as e:
+        print(f"Error in chat opener: {e}")
+        metrics.record_error("chat_opener", e)
+        raise HTTPException(status_code=500, detail=f"Error generating opener: {str(e)}")
+    return OpenerResponse(ai_message=text, prefetched=prefetched)
+
+
+@router.delete("/chat/openers/{track_id}")
+async def discard_openers(track_id: str):
+    """
+    Releases the `track_id` handle /onboarding/generate-track returned. The
+    track's openers are forgotten and their prefetch cancelled once no other
+    client holds them.
+    """
+    discarded = opener_cache.discard(track_id)
+    return {"status": "deleted" if discarded else "not_found", "track_id": track_id}
+
+
+@router.post("/chat/session", response_model=ChatSessionResponse)
+async def create_chat_session(request: ChatSessionRequest):
+    """
+    Starts a server-side conversation. Later /chat/text and /chat/stream
+    calls pass the returned session_id and only the new message.
+    """
+    history = [message.model_dump() for message in request.history]
+    session = session_store.create(
+        request.system_prompt,
+        history,
+        token_budget=request.token_budget,
+        verbatim_turns=request.verbatim_turns,
+    )
+    context_window.schedule_summary(session)
+    return ChatSessionResponse(session_id=session.session_id)
+
+
+@router.delete("/chat/session/{session_id}")
+async def delete_chat_session(session_id: str):
+    """Forgets a server-side conversation."""
+    session_store.delete(session_id)
+    return {"status": "deleted", "session_id": session_id}
+
+
+@router.post("/chat/text", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """
+    Holds a text-based conversation with the AI.
+    """
+    try:
+        if not request.user_message:
+            raise HTTPException(status_code=400, detail="User message is required")
+        
+        (model, route, persona), prompt, session = await resolve_chat_prompt(request)
+
+        started = time.perf_counter()
+        response = await model_client.generate_content(model, prompt)
+        chat_router.record(route, elapsed_ms(started))
+        ai_text = response.text.strip() if response and response.text else "[No response generated]"
+        if session:
+            context_window.schedule_summary(session_store.record_turn(session, request.user_message, ai_text))
+        usage = turn_usage(persona, model_client.usage_metadata(response), prompt)
+        return ChatResponse(ai_message=ai_text, session_id=request.session_id, usage=usage)
+
+    except HTTPException:
+        raise
+
+    except ModelOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+    except Exception as e:
+        print(f"Error in chat endpoint: {e}")
+        metrics.record_error("chat_text", e)
+        return ChatResponse(ai_message=f"I'm sorry, I encountered an error: {str(e)}")
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Streams the AI reply as server-sent events.
+
+    Each `data:` frame carries a `delta` with the next piece of text. The
+    stream ends with an `event: done` frame holding the full `ai_message` and
+    the usage metadata, or an `event: error` frame if generation failed.
+    """
+    if not request.user_message:
+        raise HTTPException(status_code=400, detail="User message is required")
+
+    (model, route, persona), prompt, session = await resolve_chat_prompt(request)
+
+    async def events():
+        parts = []
+        usage = {}
+        started = time.perf_counter()
+        try:
+            async for text, chunk_usage in stream_model_text(model, prompt, http_request):
+                usage = chunk_usage or usage
+                if text:
+                    parts.append(text)
+                    yield sse_event({"delta": text})
+
+            ai_text = "".join(parts).strip() or "[No response generated]"
+            chat_router.record(route, elapsed_ms(started))
+            if session:
+                context_window.schedule_summary(session_store.record_turn(session, request.user_message, ai_text))
+            yield sse_event({"ai_message": ai_text, "usage": turn_usage(persona, usage, prompt)}, event="done")
+
+        except ClientDisconnected:
+            # Nobody is listening and the reply is cut off: don't store or count it.
+            return
+
+        except ModelOverloaded as e:
+            yield sse_event({"error": str(e), "retry_after": e.retry_after}, event="error")
+
+        except Exception as e:
+            print(f"Error in chat stream: {e}")
+            metrics.record_error("chat_stream", e)
+            yield sse_event({"error": str(e)}, event="error")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def stats() -> dict:
+    return {
+        "chat_router": chat_router.stats(),
+        "persona_cache": persona_cache.stats(),
+        "topic_openers": opener_cache.stats(),
+        "sessions": session_store.stats(),
+        "context_window": context_window.stats(),
+    }
@@ -0,0 +1,71 @@
+import json
+import time
+from contextlib import aclosing
+
+from fastapi import HTTPException, Request
+
+from app import model_client
+from app.model_router import chat_router
+from app.persona_cache import persona_cache
+from app.sessions import session_store
+
+# Helpers shared by the chat and speech-to-text routers. They live here, not
+# in either router, so that each router can be enabled without importing the
+# other (see ECHO_ROUTERS in app/main.py).
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the model reply finished streaming."""
+
+
+def get_session(session_id: str):
+    """The server-side conversation for `session_id`; raises HTTPException(404) if there is none."""
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return session
+
+
+async def chat_model(system_prompt: str, user_message: str):
+    """
+    Route a chat turn to the fast or pro tier and return (model, route,
+    persona); the model carries the track's persona from the persona cache.
+    """
+    route = chat_router.route(system_prompt, user_message)
+    model, persona = await persona_cache.model_for(route.model_name, system_prompt)
+    return model, route, persona
+
+
+def turn_usage(persona, usage: dict, prompt) -> dict:
+    """Gemini's usage metadata plus the cached/uncached input split for this turn."""
+    prompt_text = prompt if isinstance(prompt, str) else ""
+    return {**usage, **persona_cache.turn_usage(persona, usage, prompt_text)}
+
+
+def sse_event(data: dict, event: str | None = None) -> str:
+    """Format a server-sent event frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+
+async def stream_model_text(model, contents, http_request: Request):
+    """
+    Yield (text, usage) for each streamed chunk of a model reply. Raises
+    ClientDisconnected as soon as the client goes away, after closing the
+    model stream so the upstream generation is cancelled at once; callers
+    must not treat the partial reply as a finished turn.
+    """
+    async with aclosing(model_client.stream_content(model, contents)) as chunks:
+        async for chunk in chunks:
+            if await http_request.is_disconnected():
+                print("Client disconnected, cancelling model stream")
+                raise ClientDisconnected()
+            try:
+                text = chunk.text
+            except ValueError:
+                text = ""
+            yield text, model_client.usage_metadata(chunk)
+
+
+def elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
@@ -0,0 +1,143 @@
+import json
+import math
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+
+from app import metrics, structured_output
+from app.goal_index import GOAL_INDEX_ENABLED, goal_matcher
+from app.model_registry import model_registry
+from app.model_router import chat_router
+from app.persona_cache import persona_cache
+from app.scheduler import ONBOARDING, ModelOverloaded, is_rate_limited
+from app.structured_output import StructuredOutputError, generate_structured, json_generation_config
+from app.topic_openers import opener_cache
+from app.track_cache import track_cache
+
+# Onboarding: turns a learner's language and goal into a learning track.
+router = APIRouter(tags=["onboarding"])
+USES_GEMINI = True
+
+
+class OnboardingRequest(BaseModel):
+    """Data model for the user's goal selection."""
+    language: str = Field(..., example="English")
+    goal: str = Field(..., example="A doctor needing medical terminology")
+
+
+class OnboardingResponse(BaseModel):
+    """Data model for the generated learning track."""
+    system_prompt: str = Field(..., example="You are Dr. Mateo, a senior doctor...")
+    initial_topics: List[str] = Field(..., example=["Greeting a patient", "Asking about symptoms"])
+
+
+class TrackResponse(OnboardingResponse):
+    """A generated learning track as returned to the client."""
+    track_id: Optional[str] = Field(
+        None, description="Set when topic openers are being prefetched; this client's handle for DELETE /chat/openers"
+    )
+
+async def generate_learning_track(language: str, goal: str, priority: int = ONBOARDING) -> OnboardingResponse:
+    """
+    Generate a learning track using Gemini API in JSON mode.
+    Raises StructuredOutputError if the reply is unusable even after a repair.
+    """
+    prompt = f"""
+        You are an expert curriculum designer for an AI language tutor.
+        A user wants to learn {language} to achieve a specific goal: {goal}.
+
+        Generate a JSON object with the following keys:
+        1. "system_prompt" - A detailed persona description including role, accent (if any), teaching style, and constrained vocabulary tailored to the goal.
+        2. "initial_topics" - An array of 3-5 short starter topics relevant to the goal.
+    """
+    model = model_registry.for_endpoint("onboarding", generation_config=json_generation_config(OnboardingResponse))
+    return await generate_structured(model, prompt, OnboardingResponse, priority=priority)
+
+
+async def fetch_learning_track(language: str, goal: str, priority: int = ONBOARDING) -> dict:
+    """
+    Generate a learning track as OnboardingResponse fields.
+    Raises ValueError if the AI response is unusable, and ModelOverloaded
+    if Gemini had no capacity for it, so callers can ask for a retry.
+    """
+    try:
+        track = await generate_learning_track(language, goal, priority)
+    except (StructuredOutputError, ModelOverloaded):
+        raise
+    except Exception as e:
+        if is_rate_limited(e):
+            raise ModelOverloaded(f"Gemini is rate limiting requests: {e}") from e
+        print(f"Error generating learning track: {e}")
+        raise ValueError(f"Learning track generation failed: {e}")
+    return track.model_dump()
+
+
+async def match_or_fetch_learning_track(language: str, goal: str, priority: int = ONBOARDING) -> dict:
+    """
+    Reuse the track of a previously seen, near-identical goal when the goal
+    index is enabled; otherwise generate a new one and index it.
+    """
+    if not GOAL_INDEX_ENABLED:
+        return await fetch_learning_track(language, goal, priority)
+
+    track = goal_matcher.match(language, goal)
+    if track is None:
+        track = await fetch_learning_track(language, goal, priority)
+        goal_matcher.add(language, goal, track)
+    return track
+
+@router.post("/onboarding/generate-track", response_model=TrackResponse)
+async def generate_track(request: OnboardingRequest):
+    """
+    Generates a new learning track (AI persona and topics) 
+    based on the user's goals.
+    """
+    try:
+        if not request.language or not request.goal:
+            raise HTTPException(status_code=400, detail="Language and goal are required")
+
+        # Only successfully parsed tracks are cached; the fallbacks below are not.
+        data = await track_cache.get_or_generate(
+            request.language, request.goal, match_or_fetch_learning_track
+        )
+        # Register the persona now so the track's first chat turn already reuses it.
+        persona_cache.register(chat_router.persona_model(data["system_prompt"]), data["system_prompt"])
+        track_id = opener_cache.prefetch(data["system_prompt"], data["initial_topics"])
+        return TrackResponse(**data, track_id=track_id)
+
+    except HTTPException:
+        raise
+
+    except ModelOverloaded as e:
+        # Transient: ask the client to retry rather than handing out the default track.
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+    except json.JSONDecodeError as e:
+        print(f"JSON parsing error: {e}")
+        metrics.record_error("onboarding", e)
+        return OnboardingResponse(
+            system_prompt=f"I'm a friendly {request.language} tutor helping you with: {request.goal}",
+            initial_topics=["Getting Started", "Basic Conversation", "Practice Exercise"]
+        )
+    
+    except ValueError as e:
+        print(f"Validation error: {e}")
+        metrics.record_error("onboarding", e)
+        return OnboardingResponse(
+            system_prompt=f"I'm a friendly {request.language} tutor helping you with: {request.goal}",
+            initial_topics=["Getting Started", "Basic Conversation", "Practice Exercise"]
+        )
+    
+    except Exception as e:
+        print(f"Unexpected error in generate_track: {e}")
+        metrics.record_error("onboarding", e)
+        raise HTTPException(status_code=500, detail=f"Error generating learning track: {str(e)}")
+
+
+def stats() -> dict:
+    return {
+        "track_cache": track_cache.stats(),
+        "goal_index": goal_matcher.stats(),
+        "structured_output": structured_output.stats(),
+    }
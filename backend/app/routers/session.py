@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import zlib
+from contextlib import asynccontextmanager
+from typing import List
+
+import httpx
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.agora_client import AgoraClient, CircuitOpenError, base_url_for
+from app.agora_tokens import ROLE_PUBLISHER, ROLE_SUBSCRIBER, TokenService
+from app.bot_pool import AGORA_BOT_POOL_KEYS, AGORA_BOT_POOL_SIZE, BotPool, parse_pool_keys
+from app.session_registry import session_registry
+
+# Voice sessions: Agora RTC/RTM tokens and the Conversational AI bot that
+# joins the learner's channel.
+router = APIRouter(tags=["session"])
+USES_GEMINI = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled Agora client for the whole worker lifetime
+    await agora_client.start()
+    reaper = None
+    if AGORA_APP_ID and AGORA_CUSTOMER_ID:
+        bot_pool.warm()
+        reaper = asyncio.create_task(session_registry.run_reaper(_reap_session_bot))
+    yield
+    if reaper is not None:
+        reaper.cancel()
+    await bot_pool.drain()
+    await agora_client.close()
+
+
+class SessionStartRequest(BaseModel):
+    trackId: str
+    voice: str | None = None
+    language: str | None = None
+    # False: return tokens at once and start the bot in the background;
+    # follow it on /session/{channel}/status or /session/{channel}/events.
+    waitForBot: bool | None = None
+
+
+class SessionStartResponse(BaseModel):
+    channel: str
+    uid: str
+    rtcToken: str
+    rtmToken: str
+    botStatus: str
+
+
+class SessionStopRequest(BaseModel):
+    channel: str
+
+
+class TokenBatchRequest(BaseModel):
+    channel: str
+    # Participants to mint for; `count` adds that many fresh uids.
+    uids: List[str] = []
+    count: int = Field(0, ge=0)
+    role: str = Field("publisher", pattern="^(publisher|subscriber)$")
+
+
+class TokenPair(BaseModel):
+    channel: str
+    uid: str
+    rtcUid: int
+    rtcToken: str
+    rtmToken: str
+    expiresAt: int
+
+
+class TokenBatchResponse(BaseModel):
+    channel: str
+    tokens: List[TokenPair]
+
+
+AGORA_APP_ID = os.getenv("AGORA_APP_ID", "")
+AGORA_APP_CERTIFICATE = os.getenv("AGORA_APP_CERTIFICATE", "")
+AGORA_TOKEN_TTL = int(os.getenv("AGORA_TOKEN_TTL", "3600"))
+AGORA_CUSTOMER_ID = os.getenv("AGORA_CUSTOMER_ID", "")
+AGORA_CUSTOMER_SECRET = os.getenv("AGORA_CUSTOMER_SECRET", "")
+AGORA_REGION = os.getenv("AGORA_REGION", "ap")
+# Overrides the regional endpoint, e.g. to point at bench.mock_agora.
+AGORA_BASE_URL = os.getenv("AGORA_BASE_URL", "")
+AGORA_WAIT_FOR_BOT = os.getenv("AGORA_WAIT_FOR_BOT", "true").lower() == "true"
+BOT_UID = 999999  # Fixed UID for bot
+MAX_TOKEN_BATCH = int(os.getenv("AGORA_MAX_TOKEN_BATCH", "500"))
+
+agora_client = AgoraClient(AGORA_BASE_URL or base_url_for(AGORA_REGION), AGORA_CUSTOMER_ID, AGORA_CUSTOMER_SECRET)
+
+
+token_service = TokenService(AGORA_APP_ID, AGORA_APP_CERTIFICATE, AGORA_TOKEN_TTL)
+
+
+def _rtc_uid(uid: str) -> int:
+    """Stable numeric RTC uid for a string uid, the same in every worker."""
+    return zlib.crc32(uid.encode()) % (10 ** 8)
+
+
+async def _start_agora_bot(channel: str, uid: str, language: str | None, voice: str | None) -> dict:
+    """Start Agora Conversational AI Bot via REST API."""
+    if not AGORA_CUSTOMER_ID or not AGORA_CUSTOMER_SECRET:
+        return {"status": "error", "message": "Agora credentials not configured"}
+    
+    # Generate bot RTC token
+    bot_uid = BOT_UID
+    bot_rtc_token, _ = token_service.rtc_token(channel, bot_uid)
+    
+    # Prepare bot configuration
+    bot_config = {
+        "appId": AGORA_APP_ID,
+        "channel": channel,
+        "token": bot_rtc_token,
+        "uid": str(bot_uid),
+        "enableVoiceChat": True,
+        "enableTranscription": True,
+        "voice": {
+            "language": language or "en-US",
+            "voiceType": voice or "female",
+        },
+        "llm": {
+            "provider": "google",
+            "apiKey": os.getenv("GOOGLE_API_KEY"),
+            "model": "gemini-1.5-pro",
+        },
+    }
+    
+    started_at = time.perf_counter()
+    try:
+        response = await agora_client.post(
+            "start",
+            f"/v1/projects/{AGORA_APP_ID}/rtc/speech-to-speech/start",
+            bot_config,
+        )
+        response.raise_for_status()
+        result = response.json()
+        session_registry.record_bot_start(time.perf_counter() - started_at, ok=True)
+        return {"status": "started", "data": result}
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        session_registry.record_bot_start(time.perf_counter() - started_at, ok=False)
+        print(f"Failed to start Agora bot: {e}")
+        return {"status": "error", "message": str(e)}
+
+
+def _bot_fields(bot_result: dict) -> dict:
+    """Registry fields for a bot start result, including the agent id Agora assigned."""
+    data = bot_result.get("data") or {}
+    return {
+        "bot_data": bot_result.get("data"),
+        "bot_id": data.get("agent_id") or data.get("id"),
+        "error": bot_result.get("message"),
+    }
+
+
+async def _start_agora_bot_in_background(channel: str, uid: str, language: str | None, voice: str | None):
+    """Start the bot after /session/start has returned, recording progress in the registry."""
+    bot_result = await _start_agora_bot(channel, uid, language, voice)
+    fields = _bot_fields(bot_result)
+    if session_registry.finish_start(channel, bot_result.get("status", "unknown"), **fields):
+        return
+    session = session_registry.get(channel)
+    if session is None or session.bot_status != "stopping":
+        return
+    # The user stopped the session while the bot was still joining; /session/stop left it to us.
+    if bot_result.get("status") == "started":
+        try:
+            await _stop_agora_bot(channel, session.bot_uid, fields["bot_id"])
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            print(f"Failed to stop Agora bot after its start: {e}")
+            # Leave it running and known so the reaper stops it.
+            session_registry.update(channel, "started", **{**fields, "error": str(e)})
+            return
+    session_registry.update(channel, "stopped")
+
+
+async def _stop_agora_bot(channel: str, bot_uid: str = str(BOT_UID), bot_id: str | None = None) -> httpx.Response:
+    """Ask Agora to stop a bot; raises httpx.HTTPError for error responses."""
+    payload = {"channel": channel, "uid": bot_uid}
+    if bot_id:
+        payload["agent_id"] = bot_id
+    response = await agora_client.post(
+        "stop",
+        f"/v1/projects/{AGORA_APP_ID}/rtc/speech-to-speech/stop",
+        payload,
+    )
+    response.raise_for_status()
+    return response
+
+
+async def _reap_session_bot(session) -> bool:
+    """Stop callback for the registry's reaper."""
+    try:
+        await _stop_agora_bot(session.channel, session.bot_uid, session.bot_id)
+        return True
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        print(f"Failed to reap Agora bot for {session.channel}: {e}")
+        return False
+
+
+bot_pool = BotPool(
+    AGORA_BOT_POOL_SIZE,
+    parse_pool_keys(AGORA_BOT_POOL_KEYS),
+    start_bot=lambda channel, language, voice: _start_agora_bot(channel, "", language, voice),
+    stop_bot=_stop_agora_bot,
+)
+
+_background_tasks: set = set()
+
+
+@router.get("/agora-token")
+async def get_agora_token():
+    """RTC and RTM tokens for a fresh channel, for clients that join without /session/start."""
+    if not AGORA_APP_ID:
+        return {"error": "AGORA_APP_ID not configured"}
+
+    channel_name = f"echo-{uuid.uuid4()}"
+    uid = str(uuid.uuid4())[:8]
+    tokens = token_service.pair(channel_name, _rtc_uid(uid), uid)
+    return {
+        "token": tokens["rtcToken"],
+        "rtmToken": tokens["rtmToken"],
+        "uid": uid,
+        "rtcUid": tokens["rtcUid"],
+        "channel_name": channel_name,
+        "expiresAt": tokens["expiresAt"],
+    }
+
+
+@router.post("/session/tokens", response_model=TokenBatchResponse)
+async def session_tokens(req: TokenBatchRequest):
+    """RTC+RTM token pairs for many participants of one channel in a single call."""
+    if not AGORA_APP_ID:
+        raise HTTPException(status_code=400, detail="AGORA_APP_ID not configured")
+    uids = list(req.uids) + [str(uuid.uuid4())[:8] for _ in range(req.count)]
+    if not uids:
+        raise HTTPException(status_code=422, detail="Give uids or a count")
+    if len(uids) > MAX_TOKEN_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_TOKEN_BATCH} participants per call")
+    role = ROLE_SUBSCRIBER if req.role == "subscriber" else ROLE_PUBLISHER
+    return TokenBatchResponse(
+        channel=req.channel,
+        tokens=[token_service.pair(req.channel, _rtc_uid(uid), uid, role) for uid in uids],
+    )
+
+
+@router.post("/session/start", response_model=SessionStartResponse)
+async def start_session(req: SessionStartRequest):
+    """Create an Agora RTC/RTM session and summon the Bot (stub)."""
+    if not AGORA_APP_ID:
+        # Return explicit message to guide env setup
+        return SessionStartResponse(
+            channel="",
+            uid="",
+            rtcToken="",
+            rtmToken="",
+            botStatus="error: set AGORA_APP_ID/.env",
+        )
+
+    uid = str(uuid.uuid4())[:8]
+
+    # A pre-warmed channel already has its bot running
+    warm = bot_pool.acquire(req.language, req.voice)
+    channel = warm[0] if warm else str(uuid.uuid4())
+
+    # Generate real Agora tokens
+    tokens = token_service.pair(channel, _rtc_uid(uid), uid)
+
+    wait_for_bot = AGORA_WAIT_FOR_BOT if req.waitForBot is None else req.waitForBot
+    session_fields = {"bot_uid": str(BOT_UID), "token_expires_at": tokens["expiresAt"] or time.time() + AGORA_TOKEN_TTL}
+    if warm:
+        bot_status = "started"
+        session_registry.register(channel, uid, bot_status, **session_fields, **_bot_fields(warm[1]))
+    elif wait_for_bot:
+        # Start the Agora Conversational AI bot
+        bot_result = await _start_agora_bot(channel, uid, req.language, req.voice)
+        bot_status = bot_result.get("status", "unknown")
+        session_registry.register(channel, uid, bot_status, **session_fields, **_bot_fields(bot_result))
+    else:
+        bot_status = "starting"
+        session_registry.register(channel, uid, bot_status, **session_fields)
+        task = asyncio.create_task(_start_agora_bot_in_background(channel, uid, req.language, req.voice))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    return SessionStartResponse(
+        channel=channel,
+        uid=uid,
+        rtcToken=tokens["rtcToken"],
+        rtmToken=tokens["rtmToken"],
+        botStatus=bot_status,
+    )
+
+
+@router.post("/session/stop")
+async def stop_session(req: SessionStopRequest):
+    """Stop the Agora Bot and clean up."""
+    if not AGORA_CUSTOMER_ID or not AGORA_CUSTOMER_SECRET:
+        return {"status": "error", "message": "Agora credentials not configured"}
+    
+    if session_registry.get(req.channel) is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    session = session_registry.claim_for_stop(req.channel, {"started"})
+    if session is None and session_registry.claim_for_stop(req.channel, {"starting"}):
+        # The bot is still joining; its start task stops it once the join returns.
+        return {"status": "stopping", "channel": req.channel}
+    if session is None:
+        # Already stopped, being stopped elsewhere, or the bot never started.
+        return {"status": session_registry.get(req.channel).bot_status, "channel": req.channel}
+
+    try:
+        await _stop_agora_bot(req.channel, session.bot_uid, session.bot_id)
+        session_registry.update(req.channel, "stopped")
+        return {"status": "stopped", "channel": req.channel}
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        print(f"Failed to stop Agora bot: {e}")
+        # Still running as far as we know; the reaper or a retry will stop it.
+        session_registry.update(req.channel, "started", error=str(e))
+        return {"status": "error", "message": str(e)}
+
+
+@router.get("/session/{channel}/status")
+async def session_status(channel: str):
+    """Current bot state for a session started with waitForBot=false."""
+    session = session_registry.get(channel)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return session.public()
+
+
+@router.post("/session/{channel}/heartbeat")
+async def session_heartbeat(channel: str):
+    """Mark the session as in use so the reaper leaves its bot running."""
+    if not session_registry.touch(channel):
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return {"status": "ok", "channel": channel}
+
+
+@router.get("/session/{channel}/events")
+async def session_events(channel: str):
+    """Server-sent events with the session's bot state until the bot is up or has failed."""
+    if session_registry.get(channel) is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+
+    async def events():
+        async for state in session_registry.watch(channel):
+            if state is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(state)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/session/pool")
+async def session_pool():
+    """Pre-warmed bot pool occupancy and hit rate."""
+    return bot_pool.stats()
+
+
+@router.get("/session/stats")
+async def session_stats():
+    """Active sessions, bot-start latency histogram, reaper and Agora client counters."""
+    return {
+        "sessions": session_registry.stats(),
+        "pool": bot_pool.stats(),
+        "agora": agora_client.stats(),
+        "tokens": token_service.stats(),
+    }
+
+
+def stats() -> dict:
+    return {"agora_sessions": session_registry.stats(), "bot_pool": bot_pool.stats()}
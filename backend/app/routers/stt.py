@@ -0,0 +1,349 @@
+import asyncio
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile, WebSocket
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+from app import audio_prep, audio_upload, context_window, long_audio, metrics, model_client, stream_stt
+from app.model_registry import model_registry
+from app.model_router import chat_router
+from app.routers.common import ClientDisconnected, chat_model, elapsed_ms, get_session, sse_event, stream_model_text, turn_usage
+from app.scheduler import INTERACTIVE
+from app.sessions import session_store
+
+# Speech: transcription of uploaded clips and live audio, and one-request voice turns.
+# Uploads over STT_MAX_UPLOAD_BYTES are refused before their body is parsed.
+router = APIRouter(tags=["speech"], route_class=audio_upload.UploadLimitRoute)
+USES_GEMINI = True
+
+# Returned by /speech-to-text when the model heard nothing.
+NO_TRANSCRIPTION = "[No transcription available]"
+
+
+class EmptyTranscription(Exception):
+    """A voice turn's clip had no speech in it, so there is nothing to reply to."""
+
+
+class SegmentTiming(BaseModel):
+    """Timing of one segment of a long recording."""
+    index: int
+    start_seconds: float
+    end_seconds: float
+    latency_ms: float
+    error: Optional[str] = None
+
+
+class AudioPrepReport(BaseModel):
+    """What normalisation did to the uploaded clip before it went to the model."""
+    container: str
+    action: str
+    mime_type_in: Optional[str] = None
+    mime_type_out: Optional[str] = None
+    bytes_in: int
+    bytes_out: int
+    seconds_in: Optional[float] = None
+    seconds_out: Optional[float] = None
+    trimmed_seconds: Optional[float] = None
+    sample_rate: Optional[int] = None
+    prep_ms: float
+
+
+class TranscriptionResponse(BaseModel):
+    """Data model for a transcription response."""
+    transcription: str = Field(..., example="Hello, what's the weather today?")
+    segments: Optional[List[SegmentTiming]] = None
+    audio: Optional[AudioPrepReport] = None
+
+async def receive_audio(file: UploadFile) -> audio_upload.SpooledAudio:
+    """Spool and normalise an uploaded clip, rejecting empty or oversized uploads."""
+    try:
+        audio = await audio_upload.spool_upload(file)
+    except audio_upload.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    if not audio.size:
+        audio.cleanup()
+        raise HTTPException(status_code=400, detail="Empty file provided")
+
+    metrics.STT_UPLOAD_BYTES.observe(audio.size)
+    upload = f"{audio.size} bytes ({audio.mime_type})"
+    await normalise_audio(audio)
+    if audio.prep:
+        upload += f" -> {audio.size} bytes ({audio.mime_type}) {audio.prep['action']} in {audio.prep['prep_ms']} ms"
+    print(
+        f"speech-to-text upload: {upload}, "
+        f"peak buffered {audio.peak_buffer_bytes} bytes, "
+        f"{'inline' if audio.data is not None else 'Files API'}"
+    )
+    return audio
+
+
+async def normalise_audio(audio: audio_upload.SpooledAudio):
+    """Run audio_prep on a spooled clip off the event loop; on failure the clip is left as it was."""
+    if not audio_prep.STT_AUDIO_PREP:
+        return
+    try:
+        audio.prep = await run_in_threadpool(audio_prep.normalise, audio)
+    except Exception as e:
+        # Normalising only saves bytes and tokens; the original still transcribes.
+        print(f"Audio normalisation failed, sending the upload as is: {e}")
+        metrics.record_error("audio_prep", e)
+        audio_prep.record_failure()
+
+
+async def transcribe_audio(audio: audio_upload.SpooledAudio, long_audio_mode: bool = False,
+                           priority: int = INTERACTIVE) -> TranscriptionResponse:
+    """Transcribe a spooled clip, segmenting long WAV recordings."""
+    audio_blob = None
+    wav = long_audio.open_wav(audio.data, audio.path)
+    try:
+        if wav and (long_audio_mode or long_audio.duration_seconds(wav) > long_audio.STT_LONG_AUDIO_SECONDS):
+            segments = long_audio.plan_segments(wav)
+            if len(segments) > 1:
+                transcription, timings = await long_audio.transcribe_segments(
+                    model_registry.for_endpoint("stt"), wav, segments, priority=priority
+                )
+                return TranscriptionResponse(
+                    transcription=transcription or NO_TRANSCRIPTION,
+                    segments=timings,
+                    audio=audio.prep,
+                )
+
+        # Inline blob for small clips, Files API upload for large ones
+        audio_blob = await audio_upload.audio_part(audio)
+
+        # Create prompt
+        prompt_parts = [
+            "Please transcribe the following audio file accurately. Return only the transcription text.",
+            audio_blob
+        ]
+
+        # Generate transcription
+        response = await model_client.generate_content(model_registry.for_endpoint("stt"), prompt_parts,
+                                                       priority=priority)
+
+        if response and response.text and response.text.strip():
+            transcription = response.text.strip()
+            return TranscriptionResponse(transcription=transcription, audio=audio.prep)
+        else:
+            return TranscriptionResponse(transcription=NO_TRANSCRIPTION, audio=audio.prep)
+
+    finally:
+        if wav:
+            wav.close()
+        if audio_blob is not None:
+            await audio_upload.release_part(audio_blob)
+
+
+@router.post("/speech-to-text", response_model=TranscriptionResponse)
+async def speech_to_text(file: UploadFile = File(...), long_audio_mode: bool = False):
+    """
+    Accepts an audio file and returns the transcription.
+
+    The clip is first normalised (see app/audio_prep.py); `audio` in the
+    response reports the bytes and seconds before and after, and the time
+    that took. WAV recordings longer than STT_LONG_AUDIO_SECONDS, or any WAV
+    when `long_audio_mode=true`, are split into segments that are
+    transcribed in parallel; the response then lists per-segment timings.
+    """
+    audio = None
+    try:
+        if not file:
+            raise HTTPException(status_code=400, detail="No file provided")
+
+        audio = await receive_audio(file)
+        return await transcribe_audio(audio, long_audio_mode)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        print(f"Error in speech-to-text: {e}")
+        metrics.record_error("speech_to_text", e)
+        return TranscriptionResponse(transcription=f"[Error during transcription: {str(e)}]")
+
+    finally:
+        if audio:
+            audio.cleanup()
+
+
+async def finish_transcription(task, audio: audio_upload.SpooledAudio):
+    """
+    Stop a voice turn's transcription, then remove its audio. A clip spooled
+    to disk may still be read by a Files API upload in a worker thread, which
+    cancelling the task doesn't stop, so that transcription is awaited instead.
+    """
+    if task is not None and not task.done():
+        if audio.path is None:
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    audio.cleanup()
+
+
+MULTIMODAL_TURN_INSTRUCTIONS = (
+    "\nThe user's turn is the attached audio. On the first line write 'Transcript: ' "
+    "followed by exactly what the user said. Then, starting on the next line, write "
+    "the AI's reply only."
+)
+
+
+@router.post("/voice/turn")
+async def voice_turn(
+    http_request: Request,
+    file: UploadFile = File(...),
+    session_id: str = Form(...),
+    multimodal: bool = Form(False),
+):
+    """
+    One voice turn in a single request: audio in, streamed reply out.
+
+    Replaces /speech-to-text followed by /chat/text for a session created
+    with /chat/session. The reply streams as server-sent events:
+    `event: transcript` with what the user said, `data:` frames with reply
+    deltas, and `event: done` with the full reply and per-stage timings.
+
+    The session is looked up before the clip is read, so an unknown one is
+    a 404 without any audio work. By default the clip is then transcribed
+    first; a clip with no speech in it ends the stream with `event: error`
+    and nothing is stored. With `multimodal=true` the audio and the conversation go to
+    the model in one call that returns both the transcript and the reply.
+    """
+    started = time.perf_counter()
+    session = await run_in_threadpool(get_session, session_id)
+    audio = await receive_audio(file)
+    timings = {"upload_ms": elapsed_ms(started)}
+    turn = {}  # chat route and reply start, set once the reply is requested
+
+    stt_task = None if multimodal else asyncio.create_task(transcribe_audio(audio))
+
+    async def pipeline_events():
+        transcription = (await stt_task).transcription
+        timings["transcribe_ms"] = elapsed_ms(started)
+        if transcription == NO_TRANSCRIPTION:
+            raise EmptyTranscription("No speech was recognised in the audio")
+        yield transcription, None
+
+        prompt = context_window.build_session_prompt(session, transcription)
+        model, turn["route"], turn["persona"] = await chat_model(session.system_prompt, transcription)
+        turn["prompt"] = prompt
+        turn["reply_started"] = time.perf_counter()
+        async for text, usage in stream_model_text(model, prompt, http_request):
+            yield None, (text, usage)
+
+    async def multimodal_events():
+        audio_blob = await audio_upload.audio_part(audio)
+        try:
+            prompt = context_window.build_session_prompt(session, "(attached audio)")
+            contents = [prompt + MULTIMODAL_TURN_INSTRUCTIONS, audio_blob]
+            # The transcript isn't known yet, so only the persona can escalate.
+            model, turn["route"], turn["persona"] = await chat_model(session.system_prompt, "")
+            turn["prompt"] = prompt
+            turn["reply_started"] = time.perf_counter()
+            header = ""
+            transcription = None
+            async for text, usage in stream_model_text(model, contents, http_request):
+                if transcription is None:
+                    header += text
+                    if "\n" not in header:
+                        continue
+                    line, text = header.split("\n", 1)
+                    transcription = line.strip().removeprefix("Transcript:").strip()
+                    timings["transcribe_ms"] = elapsed_ms(started)
+                    yield transcription, None
+                yield None, (text, usage)
+            if transcription is None:
+                yield header.strip().removeprefix("Transcript:").strip(), None
+        finally:
+            await audio_upload.release_part(audio_blob)
+
+    async def events():
+        parts = []
+        usage = {}
+        transcription = ""
+        try:
+            stages = multimodal_events() if multimodal else pipeline_events()
+            async for stage_transcription, delta in stages:
+                if stage_transcription is not None:
+                    transcription = stage_transcription
+                    yield sse_event({"text": transcription}, event="transcript")
+                    continue
+                text, chunk_usage = delta
+                usage = chunk_usage or usage
+                if text:
+                    if not parts:
+                        timings["first_token_ms"] = elapsed_ms(started)
+                    parts.append(text)
+                    yield sse_event({"delta": text})
+
+            ai_text = "".join(parts).strip() or "[No response generated]"
+            timings["total_ms"] = elapsed_ms(started)
+            chat_router.record(turn["route"], elapsed_ms(turn["reply_started"]))
+            context_window.schedule_summary(session_store.record_turn(session, transcription, ai_text))
+            yield sse_event(
+                {
+                    "transcription": transcription,
+                    "ai_message": ai_text,
+                    "usage": turn_usage(turn["persona"], usage, turn["prompt"]),
+                    "timings": timings,
+                    "audio": audio.prep,
+                    "model_tier": turn["route"].tier,
+                },
+                event="done",
+            )
+
+        except ClientDisconnected:
+            # The reply was cut off: don't store the turn or report it as done.
+            return
+
+        except EmptyTranscription as e:
+            # Nothing to answer: the tutor isn't asked and the session is left as it was.
+            yield sse_event({"error": str(e)}, event="error")
+
+        except Exception as e:
+            print(f"Error in voice turn: {e}")
+            metrics.record_error("voice_turn", e)
+            yield sse_event({"error": str(e)}, event="error")
+
+        finally:
+            await finish_transcription(stt_task, audio)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def get_stream_transcriber():
+    """Transcriber used by /ws/speech-to-text; override in tests to stub the model."""
+    return stream_stt.GeminiTranscriber(model_registry.for_endpoint("stt"))
+
+
+@router.websocket("/ws/speech-to-text")
+async def speech_to_text_stream(
+    websocket: WebSocket,
+    sample_rate: int = 16000,
+    transcriber=Depends(get_stream_transcriber),
+):
+    """
+    Streams microphone audio in and transcripts out.
+
+    Send binary frames of 16-bit little-endian mono PCM at `sample_rate`,
+    8-48 kHz; the socket is closed with code 1008 for any other rate.
+    The server replies with {"type": "partial", "text"} when the speaker
+    pauses and {"type": "final", "text", "latency_ms"} when they stop, where
+    latency_ms runs from the end of speech to the final text. Send
+    {"type": "end"} to flush the last utterance and close.
+    """
+    await stream_stt.run_session(websocket, transcriber, sample_rate)
+
+
+def stats() -> dict:
+    return {
+        "stt_uploads": audio_upload.stats(),
+        "stt_audio_prep": audio_prep.stats(),
+        "stt_stream": stream_stt.stats(),
+    }
@@ -0,0 +1,243 @@
+import os
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from collections import deque
+
+# Admission control for Gemini calls. Every call takes a token from a
+# per-worker bucket refilled at GEMINI_RPM requests per minute (0 = no limit),
+# waiting in a bounded priority queue when the bucket is empty: interactive
+# chat and speech first, then onboarding, then background/batch work. Waiters
+# whose deadline passes are shed instead of piling up, and calls Gemini
+# rejects with 429/503 are retried with jittered backoff.
+# Quotas are per project, so under gunicorn set GEMINI_RPM to quota / workers.
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "0"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "10"))
+GEMINI_QUEUE_MAX = int(os.getenv("GEMINI_QUEUE_MAX", "256"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_RETRY_BACKOFF_SECONDS = float(os.getenv("GEMINI_RETRY_BACKOFF_SECONDS", "0.5"))
+
+INTERACTIVE = 0
+ONBOARDING = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", ONBOARDING: "onboarding", BATCH: "batch"}
+
+# How long a call may wait for admission (including retries) before it is shed.
+DEFAULT_DEADLINES = {
+    INTERACTIVE: float(os.getenv("GEMINI_DEADLINE_INTERACTIVE_SECONDS", "10")),
+    ONBOARDING: float(os.getenv("GEMINI_DEADLINE_ONBOARDING_SECONDS", "30")),
+    BATCH: float(os.getenv("GEMINI_DEADLINE_BATCH_SECONDS", "300")),
+}
+
+RETRYABLE_STATUS_CODES = {429, 503}
+
+
+class ModelOverloaded(Exception):
+    """The call was shed: the queue is full or its deadline passed before it could run."""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """True for Gemini's 429 / 503 errors (google.api_core exceptions carry `.code`)."""
+    code = getattr(error, "code", None)
+    try:
+        return int(code) in RETRYABLE_STATUS_CODES
+    except (TypeError, ValueError):
+        return False
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; rate 0 never throttles."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token and return 0, or return the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def drain(self):
+        """Gemini said slow down: spend the burst so everyone waits for the refill."""
+        if self.rate > 0:
+            self.tokens = min(self.tokens, 0.0)
+
+
+class ModelScheduler:
+    """Priority admission queue, rate limiting, retries and request coalescing for model calls."""
+
+    def __init__(self, rate_per_minute: float = GEMINI_RPM, burst: int = GEMINI_BURST,
+                 max_queue: int = GEMINI_QUEUE_MAX, max_retries: int = GEMINI_MAX_RETRIES,
+                 backoff_seconds: float = GEMINI_RETRY_BACKOFF_SECONDS):
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._seq = itertools.count()
+        self._loop = None
+        self._waiting: list = []
+        self._dispatcher = None
+        self._coalesced: dict = {}
+        self._waits_ms = {name: deque(maxlen=1000) for name in PRIORITY_NAMES.values()}
+        self._max_depth = 0
+        self._stats = {
+            "admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_deadline": 0,
+            "rate_limited": 0, "retries": 0, "coalesced": 0,
+        }
+
+    async def call(self, func, priority: int = INTERACTIVE, deadline_seconds: float | None = None,
+                   coalesce_key=None):
+        """
+        Await `func()` (a coroutine factory) once admitted. Retries Gemini
+        rate-limit errors within the deadline and raises ModelOverloaded if
+        the call is shed. Concurrent calls with the same `coalesce_key` share
+        one upstream request.
+        """
+        if coalesce_key is None:
+            return await self._call(func, priority, deadline_seconds)
+        shared = self._coalesced.get(coalesce_key)
+        if shared is not None:
+            self._stats["coalesced"] += 1
+        else:
+            shared = asyncio.ensure_future(self._call(func, priority, deadline_seconds))
+            self._coalesced[coalesce_key] = shared
+            shared.add_done_callback(lambda _: self._coalesced.pop(coalesce_key, None))
+        # Shielded so one caller going away doesn't cancel the others.
+        return await asyncio.shield(shared)
+
+    async def _call(self, func, priority: int, deadline_seconds: float | None):
+        deadline = self.deadline(priority, deadline_seconds)
+        for attempt in range(self.max_retries + 1):
+            await self.admit(priority, deadline - asyncio.get_running_loop().time())
+            try:
+                return await func()
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def deadline(self, priority: int, deadline_seconds: float | None = None) -> float:
+        """Loop time by which a call at `priority` must have been admitted, retries included."""
+        return asyncio.get_running_loop().time() + (deadline_seconds or DEFAULT_DEADLINES[priority])
+
+    def retry_delay(self, error: Exception, attempt: int, deadline: float) -> float | None:
+        """
+        Seconds to back off before retrying a call that failed with `error`
+        on its `attempt`-th try, or None if it should be raised: it isn't a
+        rate-limit error, retries are used up, or the deadline would pass.
+        """
+        if not is_rate_limited(error):
+            return None
+        self._stats["rate_limited"] += 1
+        self.bucket.drain()
+        delay = self.backoff_seconds * 2 ** attempt
+        delay = random.uniform(delay / 2, delay)
+        if attempt >= self.max_retries or asyncio.get_running_loop().time() + delay >= deadline:
+            return None
+        self._stats["retries"] += 1
+        return delay
+
+    async def admit(self, priority: int = INTERACTIVE, deadline_seconds: float | None = None):
+        """Wait for a rate-limit token, in priority order; raises ModelOverloaded when shed."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A new event loop (tests, a restarted worker): old waiters are gone.
+            self._loop, self._waiting, self._dispatcher = loop, [], None
+        timeout = DEFAULT_DEADLINES[priority] if deadline_seconds is None else deadline_seconds
+        started = loop.time()
+
+        if not self._live_waiters() and self.bucket.take() == 0:
+            self._admitted(priority, 0.0)
+            return
+        if timeout <= 0:
+            self._stats["shed_deadline"] += 1
+            raise ModelOverloaded("Model call deadline passed before admission")
+
+        if len(self._waiting) >= self.max_queue:
+            self._waiting = self._live_waiters()
+            heapq.heapify(self._waiting)
+        if len(self._waiting) >= self.max_queue:
+            worst = max(self._waiting)
+            if worst[0] <= priority:
+                self._stats["shed_queue_full"] += 1
+                raise ModelOverloaded("Model queue is full", retry_after=self._retry_after())
+            # Make room by shedding the lowest-priority, most recent waiter.
+            self._waiting.remove(worst)
+            heapq.heapify(self._waiting)
+            self._stats["shed_queue_full"] += 1
+            worst[2].set_exception(ModelOverloaded("Shed for higher-priority work", self._retry_after()))
+
+        future = loop.create_future()
+        heapq.heappush(self._waiting, (priority, next(self._seq), future))
+        self._stats["queued"] += 1
+        self._max_depth = max(self._max_depth, len(self._waiting))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._stats["shed_deadline"] += 1
+            raise ModelOverloaded("Timed out waiting for model capacity", retry_after=self._retry_after())
+        self._admitted(priority, (loop.time() - started) * 1000)
+
+    async def _dispatch(self):
+        """Hand out tokens to the highest-priority waiter as the bucket refills."""
+        while self._waiting:
+            if self._waiting[0][2].done():
+                # Shed, timed out or cancelled while queued.
+                heapq.heappop(self._waiting)
+                continue
+            wait = self.bucket.take()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                future.set_result(None)
+
+    def _live_waiters(self) -> list:
+        return [entry for entry in self._waiting if not entry[2].done()]
+
+    def _retry_after(self) -> float:
+        if self.bucket.rate <= 0:
+            return 1.0
+        return round(max(len(self._waiting), 1) / self.bucket.rate, 1)
+
+    def _admitted(self, priority: int, waited_ms: float):
+        self._stats["admitted"] += 1
+        self._waits_ms[PRIORITY_NAMES[priority]].append(waited_ms)
+
+    def stats(self) -> dict:
+        waits = {}
+        for name, samples in self._waits_ms.items():
+            ordered = sorted(samples)
+            waits[name] = {
+                "p50_ms": round(ordered[len(ordered) // 2], 1) if ordered else None,
+                "p95_ms": round(ordered[int(len(ordered) * 0.95)], 1) if ordered else None,
+            }
+        return {
+            **self._stats,
+            "rate_per_minute": self.bucket.rate * 60,
+            "queue_depth": len(self._live_waiters()),
+            "max_queue_depth": self._max_depth,
+            "wait": waits,
+        }
+
+
+scheduler = ModelScheduler()
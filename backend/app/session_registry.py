@@ -0,0 +1,405 @@
+import os
+import asyncio
+import bisect
+import itertools
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field, fields
+
+# Every Agora session handed out is recorded here so /session/stop only acts
+# on channels the backend created, with the bot's own uid and agent id, and
+# so bots whose user went quiet or whose token ran out can be reaped.
+# Set SESSION_REGISTRY_DB_PATH to share the registry between worker processes.
+SESSION_REGISTRY_DB_PATH = os.getenv("SESSION_REGISTRY_DB_PATH", "")
+AGORA_SESSION_IDLE_SECONDS = float(os.getenv("AGORA_SESSION_IDLE_SECONDS", "300"))
+AGORA_REAPER_INTERVAL_SECONDS = float(os.getenv("AGORA_REAPER_INTERVAL_SECONDS", "30"))
+AGORA_REAPER_BATCH_SIZE = int(os.getenv("AGORA_REAPER_BATCH_SIZE", "20"))
+# A session left 'stopping' this long (its worker died, or the Agora stop
+# call hung) is picked up by the reaper again.
+AGORA_STOP_TIMEOUT_SECONDS = float(os.getenv("AGORA_STOP_TIMEOUT_SECONDS", "120"))
+
+# Bot states that will not change again without a new request.
+TERMINAL_BOT_STATES = {"started", "error", "stopped"}
+# States in which a bot may be running in Agora and can be stopped.
+RUNNING_BOT_STATES = {"starting", "started"}
+# Upper bounds (seconds) of the bot-start latency histogram buckets.
+START_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 15.0)
+
+
+@dataclass
+class BotSession:
+    """An Agora channel handed to a user and the state of its bot."""
+    channel: str
+    uid: str = ""
+    bot_status: str = "pending"
+    bot_uid: str = ""
+    bot_id: str | None = None
+    bot_data: dict | None = None
+    error: str | None = None
+    token_expires_at: float = 0.0
+    created_at: float = field(default_factory=time.time)
+    last_activity: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False, compare=False)
+
+    def public(self) -> dict:
+        return {
+            "channel": self.channel,
+            "uid": self.uid,
+            "botStatus": self.bot_status,
+            "botId": self.bot_id,
+            "error": self.error,
+            "tokenExpiresAt": self.token_expires_at,
+            "lastActivity": self.last_activity,
+            "updatedAt": self.updated_at,
+        }
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("_changed")
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BotSession":
+        known = {f.name for f in fields(cls)} - {"_changed"}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+class SQLiteSessionTable:
+    """Agora sessions in a local SQLite file shared by every worker."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS agora_sessions ("
+            "channel TEXT PRIMARY KEY, bot_status TEXT NOT NULL, data TEXT NOT NULL, "
+            "last_activity REAL NOT NULL, token_expires_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS agora_sessions_status ON agora_sessions (bot_status, last_activity)"
+        )
+
+    def load(self, channel: str) -> BotSession | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM agora_sessions WHERE channel = ?", (channel,)
+            ).fetchone()
+        return BotSession.from_dict(json.loads(row[0])) if row else None
+
+    def save(self, session: BotSession):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO agora_sessions "
+                "(channel, bot_status, data, last_activity, token_expires_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session.channel, session.bot_status, json.dumps(session.to_dict()),
+                 session.last_activity, session.token_expires_at, session.updated_at),
+            )
+
+    def touch(self, channel: str, now: float):
+        # data.last_activity may lag behind this column; SessionRegistry.get() reads both.
+        with self._lock:
+            self._conn.execute(
+                "UPDATE agora_sessions SET last_activity = ? WHERE channel = ?", (now, channel)
+            )
+
+    def claim(self, channel: str, from_states: set, to_state: str) -> bool:
+        """Atomically move a session out of `from_states`; False if another worker got there first."""
+        placeholders = ",".join("?" * len(from_states))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE agora_sessions SET bot_status = ? WHERE channel = ? AND bot_status IN ({placeholders})",
+                (to_state, channel, *from_states),
+            )
+        return cursor.rowcount == 1
+
+    def claim_stale_stop(self, channel: str, updated_before: float, now: float) -> bool:
+        """Atomically take over a stop nobody finished since `updated_before`; False if another worker did."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE agora_sessions SET updated_at = ? "
+                "WHERE channel = ? AND bot_status = 'stopping' AND updated_at < ?",
+                (now, channel, updated_before),
+            )
+        return cursor.rowcount == 1
+
+    def due(self, idle_before: float, expires_before: float, stopping_before: float, limit: int) -> list:
+        placeholders = ",".join("?" * len(RUNNING_BOT_STATES))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT channel FROM agora_sessions WHERE (bot_status IN ({placeholders}) "
+                "AND (last_activity < ? OR (token_expires_at > 0 AND token_expires_at < ?))) "
+                "OR (bot_status = 'stopping' AND updated_at < ?) "
+                "ORDER BY last_activity LIMIT ?",
+                (*RUNNING_BOT_STATES, idle_before, expires_before, stopping_before, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def last_activity(self, channel: str) -> float | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_activity FROM agora_sessions WHERE channel = ?", (channel,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def count_by_status(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT bot_status, COUNT(*) FROM agora_sessions GROUP BY bot_status"
+            ).fetchall()
+        return dict(rows)
+
+    def delete(self, channel: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM agora_sessions WHERE channel = ?", (channel,))
+
+    def prune(self, states: set, updated_before: float):
+        placeholders = ",".join("?" * len(states))
+        with self._lock:
+            self._conn.execute(
+                f"DELETE FROM agora_sessions WHERE bot_status IN ({placeholders}) AND updated_at < ?",
+                (*states, updated_before),
+            )
+
+
+class SessionRegistry:
+    """
+    Record of Agora sessions, with change notification for status streams.
+
+    Sessions always live in this process's memory so watchers can be woken;
+    with a SQLite table every change is also written through, and sessions
+    created by another worker are loaded from it on demand.
+    """
+
+    def __init__(self, table: SQLiteSessionTable | None = None):
+        self._sessions: dict = {}
+        self._table = table
+        self._start_latency_counts = [0] * (len(START_LATENCY_BUCKETS) + 1)
+        self._start_latency_sum = 0.0
+        self._stats = {"bot_starts": 0, "bot_start_failures": 0, "reaped": 0, "reap_failures": 0}
+
+    def register(self, channel: str, uid: str, bot_status: str = "pending", **fields) -> BotSession:
+        session = BotSession(channel=channel, uid=uid, bot_status=bot_status, **fields)
+        self._sessions[channel] = session
+        self._save(session)
+        return session
+
+    def get(self, channel: str) -> BotSession | None:
+        session = self._sessions.get(channel)
+        if self._table is None:
+            return session
+        stored = self._table.load(channel)
+        if stored is None:
+            return None
+        stored.last_activity = self._table.last_activity(channel) or stored.last_activity
+        if session is None:
+            self._sessions[channel] = session = stored
+        else:
+            # Another worker may have moved it on; keep our event for watchers.
+            for name, value in stored.to_dict().items():
+                setattr(session, name, value)
+        return session
+
+    def update(self, channel: str, bot_status: str, **fields):
+        session = self.get(channel)
+        if session is None:
+            return
+        session.bot_status = bot_status
+        for name, value in fields.items():
+            setattr(session, name, value)
+        session.updated_at = time.time()
+        self._save(session)
+        # Wake everyone watching this session, then arm a fresh event.
+        session._changed.set()
+        session._changed = asyncio.Event()
+
+    def touch(self, channel: str) -> bool:
+        """Heartbeat from the client: the session is still in use."""
+        session = self.get(channel)
+        if session is None:
+            return False
+        session.last_activity = time.time()
+        if self._table is not None:
+            self._table.touch(channel, session.last_activity)
+        return True
+
+    def claim_for_stop(self, channel: str, from_states: set = RUNNING_BOT_STATES) -> BotSession | None:
+        """
+        Mark a session in one of `from_states` as 'stopping' and return it, or
+        None if it is unknown or not in those states (say, already stopped by
+        this worker or another one).
+        """
+        session = self.get(channel)
+        if session is None or session.bot_status not in from_states:
+            return None
+        if self._table is not None and not self._table.claim(channel, from_states, "stopping"):
+            return None
+        self.update(channel, "stopping")
+        return session
+
+    def claim_stale_stop(self, channel: str, timeout_seconds: float = AGORA_STOP_TIMEOUT_SECONDS) -> BotSession | None:
+        """
+        Take over stopping a session that has been 'stopping' for longer than
+        `timeout_seconds`, or return None if it hasn't or another worker did.
+        """
+        session = self.get(channel)
+        cutoff = time.time() - timeout_seconds
+        if session is None or session.bot_status != "stopping" or session.updated_at >= cutoff:
+            return None
+        if self._table is not None and not self._table.claim_stale_stop(channel, cutoff, time.time()):
+            return None
+        self.update(channel, "stopping")
+        return session
+
+    def finish_start(self, channel: str, bot_status: str, **fields) -> bool:
+        """
+        Record the outcome of a bot start if the session is still 'starting'.
+        False if it was claimed for stop while the bot was joining, in which
+        case the caller owns stopping the bot.
+        """
+        session = self.get(channel)
+        if session is None or session.bot_status != "starting":
+            return False
+        if self._table is not None and not self._table.claim(channel, {"starting"}, bot_status):
+            return False
+        self.update(channel, bot_status, **fields)
+        return True
+
+    async def watch(self, channel: str, keepalive_seconds: float = 15.0):
+        """
+        Yield the session's public state now and after every change until its
+        bot reaches a terminal state; yields None as a keepalive while idle.
+        Changes made by another worker don't wake this one, so the shared
+        table is read again every `keepalive_seconds`.
+        """
+        session = self._sessions.get(channel) or self.get(channel)
+        sent = None
+        while session is not None:
+            state = session.public()
+            if state != sent:
+                yield state
+                sent = state
+            else:
+                yield None
+            if session.bot_status in TERMINAL_BOT_STATES:
+                return
+            try:
+                await asyncio.wait_for(session._changed.wait(), keepalive_seconds)
+            except asyncio.TimeoutError:
+                session = self.get(channel)
+
+    def remove(self, channel: str):
+        self._sessions.pop(channel, None)
+        if self._table is not None:
+            self._table.delete(channel)
+
+    def prune(self, older_than_seconds: float):
+        """Forget stopped and failed sessions nobody has looked at for a while."""
+        cutoff = time.time() - older_than_seconds
+        finished = {"stopped", "error"}
+        for channel, session in list(self._sessions.items()):
+            if session.bot_status in finished and session.updated_at < cutoff:
+                del self._sessions[channel]
+        if self._table is not None:
+            self._table.prune(finished, cutoff)
+
+    def due_for_reaping(self, idle_seconds: float, limit: int,
+                        stop_timeout_seconds: float = AGORA_STOP_TIMEOUT_SECONDS) -> list:
+        """
+        Channels of running bots idle for `idle_seconds` or past their token
+        expiry, and of stops that have been pending for `stop_timeout_seconds`.
+        """
+        now = time.time()
+        if self._table is not None:
+            return self._table.due(now - idle_seconds, now, now - stop_timeout_seconds, limit)
+        due = [
+            s for s in self._sessions.values()
+            if (s.bot_status in RUNNING_BOT_STATES
+                and (s.last_activity < now - idle_seconds or 0 < s.token_expires_at < now))
+            or (s.bot_status == "stopping" and s.updated_at < now - stop_timeout_seconds)
+        ]
+        due.sort(key=lambda s: s.last_activity)
+        return [s.channel for s in due[:limit]]
+
+    async def reap(self, stop_bot, idle_seconds: float = AGORA_SESSION_IDLE_SECONDS,
+                   batch_size: int = AGORA_REAPER_BATCH_SIZE,
+                   stop_timeout_seconds: float = AGORA_STOP_TIMEOUT_SECONDS) -> int:
+        """
+        Stop idle or expired bots, and retry stops left unfinished, `batch_size`
+        at a time until none are due. `stop_bot(session)` returns True once
+        Agora has stopped the bot.
+        """
+        reaped = 0
+        seen = set()
+        while True:
+            channels = [
+                c for c in self.due_for_reaping(idle_seconds, batch_size, stop_timeout_seconds) if c not in seen
+            ]
+            if not channels:
+                return reaped
+            seen.update(channels)
+            claimed = [
+                s for s in (
+                    self.claim_for_stop(c) or self.claim_stale_stop(c, stop_timeout_seconds) for c in channels
+                )
+                if s is not None
+            ]
+            results = await asyncio.gather(*(stop_bot(s) for s in claimed), return_exceptions=True)
+            for session, ok in zip(claimed, results):
+                if ok is True:
+                    reaped += 1
+                    self._stats["reaped"] += 1
+                    self.update(session.channel, "stopped", error="reaped: idle or token expired")
+                else:
+                    self._stats["reap_failures"] += 1
+                    # Leave it running so the next sweep tries again.
+                    self.update(session.channel, "started", error=f"reap failed: {ok}")
+
+    async def run_reaper(self, stop_bot, interval_seconds: float = AGORA_REAPER_INTERVAL_SECONDS):
+        """Sweep for idle bots every `interval_seconds` until cancelled."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.reap(stop_bot)
+                self.prune(AGORA_SESSION_IDLE_SECONDS)
+            except Exception as e:
+                print(f"Session reaper sweep failed: {e}")
+
+    def record_bot_start(self, seconds: float, ok: bool):
+        self._stats["bot_starts" if ok else "bot_start_failures"] += 1
+        self._start_latency_counts[bisect.bisect_left(START_LATENCY_BUCKETS, seconds)] += 1
+        self._start_latency_sum += seconds
+
+    def stats(self) -> dict:
+        if self._table is not None:
+            by_status = self._table.count_by_status()
+        else:
+            by_status = {}
+            for session in self._sessions.values():
+                by_status[session.bot_status] = by_status.get(session.bot_status, 0) + 1
+        labels = [f"le_{bound}" for bound in START_LATENCY_BUCKETS] + ["le_inf"]
+        started = sum(self._start_latency_counts)
+        return {
+            **self._stats,
+            "backend": "sqlite" if self._table is not None else "memory",
+            "active": sum(by_status.get(state, 0) for state in RUNNING_BOT_STATES),
+            "by_status": by_status,
+            "bot_start_latency_seconds": {
+                # Cumulative, like a Prometheus histogram.
+                "buckets": dict(zip(labels, itertools.accumulate(self._start_latency_counts))),
+                "count": started,
+                "mean": round(self._start_latency_sum / started, 3) if started else None,
+            },
+        }
+
+    def _save(self, session: BotSession):
+        if self._table is not None:
+            self._table.save(session)
+
+
+session_registry = SessionRegistry(SQLiteSessionTable(SESSION_REGISTRY_DB_PATH) if SESSION_REGISTRY_DB_PATH else None)
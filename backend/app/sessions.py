@@ -0,0 +1,186 @@
+import os
+import uuid
+from dataclasses import asdict, dataclass, field
+
+from app.cache import SQLiteCache, TTLCache
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "/tmp/echo_sessions.db")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+
+
+def format_turn(role: str, content: str) -> str:
+    """Render one chat message the way the chat prompt expects it."""
+    prefix = "User" if role == "human" else "AI"
+    return f"{prefix}: {content}"
+
+
+@dataclass
+class ChatSession:
+    """A conversation kept on the server so clients only send the new message."""
+    session_id: str
+    system_prompt: str
+    history: list = field(default_factory=list)
+    # Per-persona history limits; None means the CHAT_* defaults.
+    token_budget: int | None = None
+    verbatim_turns: int | None = None
+    # Rolling summary of history[:summarized_count], built in the background
+    # once turns fall out of the verbatim window.
+    summary: str = ""
+    summarized_count: int = 0
+    # Summary and every verbatim turn, extended as turns are appended so
+    # earlier messages are never formatted twice. The system prompt is not
+    # part of it: it goes to the model as its system instruction.
+    prompt_prefix: str = ""
+
+    def __post_init__(self):
+        if not self.prompt_prefix:
+            self.rebuild_prefix()
+
+    def rebuild_prefix(self):
+        self.prompt_prefix = ""
+        if self.summary:
+            self.prompt_prefix += f"Summary of earlier conversation: {self.summary}\n"
+        for message in self.history[self.summarized_count:]:
+            self.prompt_prefix += format_turn(message["role"], message["content"]) + "\n"
+
+    def append(self, role: str, content: str):
+        self.history.append({"role": role, "content": content})
+        self.prompt_prefix += format_turn(role, content) + "\n"
+
+    def fold(self, summary: str, summarized_count: int):
+        """Replace history[:summarized_count] in the prompt with `summary`."""
+        self.summary = summary
+        self.summarized_count = summarized_count
+        self.rebuild_prefix()
+
+    def build_prompt(self, user_message: str) -> str:
+        return f"{self.prompt_prefix}User: {user_message}\nAI:"
+
+
+class MemorySessionBackend:
+    """Per-process LRU of live ChatSession objects."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache(max_entries, ttl_seconds)
+
+    def load(self, session_id: str) -> ChatSession | None:
+        return self._cache.get(session_id)
+
+    def save(self, session: ChatSession):
+        self._cache.set(session.session_id, session)
+
+    def update(self, session_id: str, change) -> ChatSession | None:
+        # Sessions are live objects here, so there is no stale copy to race with.
+        session = self._cache.get(session_id)
+        if session is not None:
+            change(session)
+            self._cache.set(session_id, session)
+        return session
+
+    def delete(self, session_id: str):
+        self._cache.delete(session_id)
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class SQLiteSessionBackend:
+    """Sessions serialised into a local SQLite file shared by all workers."""
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float):
+        self._db = SQLiteCache(path, "chat_sessions", max_entries, ttl_seconds)
+
+    def load(self, session_id: str) -> ChatSession | None:
+        data = self._db.get(session_id)
+        return ChatSession(**data) if data else None
+
+    def save(self, session: ChatSession):
+        self._db.set(session.session_id, asdict(session))
+
+    def update(self, session_id: str, change) -> ChatSession | None:
+        """Apply `change` to the stored session in one transaction and return the result."""
+        def apply(data: dict) -> dict:
+            session = ChatSession(**data)
+            change(session)
+            return asdict(session)
+        data = self._db.update(session_id, apply)
+        return ChatSession(**data) if data else None
+
+    def delete(self, session_id: str):
+        self._db.delete(session_id)
+
+    def __len__(self):
+        return len(self._db)
+
+
+def create_session_backend():
+    """Build the session backend selected by SESSION_BACKEND (memory or sqlite)."""
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionBackend(SESSION_DB_PATH, SESSION_MAX_ENTRIES, SESSION_TTL_SECONDS)
+    if SESSION_BACKEND != "memory":
+        print(f"Unknown SESSION_BACKEND {SESSION_BACKEND!r}, using memory")
+    return MemorySessionBackend(SESSION_MAX_ENTRIES, SESSION_TTL_SECONDS)
+
+
+class SessionStore:
+    """Creates and persists chat sessions on top of a pluggable backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, system_prompt: str, history: list | None = None, **limits) -> ChatSession:
+        session = ChatSession(
+            session_id=uuid.uuid4().hex,
+            system_prompt=system_prompt,
+            history=list(history or []),
+            **limits,
+        )
+        self.backend.save(session)
+        return session
+
+    def get(self, session_id: str) -> ChatSession | None:
+        return self.backend.load(session_id)
+
+    def record_turn(self, session: ChatSession, user_message: str, ai_message: str) -> ChatSession:
+        """
+        Append a turn to the stored session, not to the copy loaded before the
+        model call, so turns and summaries saved meanwhile by other requests
+        or workers are kept. Returns the session as stored.
+        """
+        def add_turn(current: ChatSession):
+            current.append("human", user_message)
+            current.append("ai", ai_message)
+
+        stored = self.backend.update(session.session_id, add_turn)
+        if stored is None:
+            # Expired during the reply: store it again from the copy we have.
+            add_turn(session)
+            self.backend.save(session)
+            return session
+        return stored
+
+    def fold(self, session_id: str, summary: str, summarized_count: int) -> bool:
+        """Fold a summary into the stored session unless a newer one already covers it."""
+        folded = []
+
+        def apply(current: ChatSession):
+            if summarized_count > current.summarized_count:
+                current.fold(summary, summarized_count)
+                folded.append(True)
+
+        self.backend.update(session_id, apply)
+        return bool(folded)
+
+    def save(self, session: ChatSession):
+        self.backend.save(session)
+
+    def delete(self, session_id: str):
+        self.backend.delete(session_id)
+
+    def stats(self) -> dict:
+        return {"backend": SESSION_BACKEND, "active": len(self.backend)}
+
+
+session_store = SessionStore(create_session_backend())
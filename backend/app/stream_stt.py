@@ -0,0 +1,258 @@
+import os
+import io
+import asyncio
+import json
+import time
+import wave
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app import model_client
+
+# Incremental speech-to-text over a WebSocket. The client streams raw 16-bit
+# little-endian mono PCM; the server runs an energy-based voice activity
+# detector over 20 ms frames and transcribes each utterance when the speaker
+# pauses (partial) and when they stop (final).
+STT_STREAM_MAX_SECONDS = float(os.getenv("STT_STREAM_MAX_SECONDS", "60"))
+STT_PARTIAL_SILENCE_MS = int(os.getenv("STT_PARTIAL_SILENCE_MS", "250"))
+STT_END_SILENCE_MS = int(os.getenv("STT_END_SILENCE_MS", "700"))
+STT_VAD_MIN_RMS = float(os.getenv("STT_VAD_MIN_RMS", "300"))
+# Sample rates a client may stream at; anything else is refused on connect.
+STT_STREAM_MIN_RATE = 8000
+STT_STREAM_MAX_RATE = 48000
+
+VAD_FRAME_MS = 20
+PRE_ROLL_MS = 200
+NOISE_FLOOR_FACTOR = 3.0
+TRANSCRIBE_PROMPT = "Please transcribe the following audio accurately. Return only the transcription text."
+
+_latencies_ms: list = []
+_stats = {"sessions": 0, "utterances": 0, "partials": 0, "finals_from_partial": 0}
+
+
+class PCMRingBuffer:
+    """Fixed-size int16 ring addressed by absolute sample index."""
+
+    def __init__(self, capacity: int):
+        self._buffer = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.total = 0
+
+    def write(self, samples: np.ndarray):
+        if len(samples) >= self.capacity:
+            # Only the tail fits, but every sample still advances the absolute index.
+            self.total += len(samples) - self.capacity
+            samples = samples[-self.capacity:]
+        start = self.total % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        self._buffer[:len(samples) - first] = samples[first:]
+        self.total += len(samples)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Samples in [start, end), clamped to what the ring still holds."""
+        start = max(start, self.total - self.capacity, 0)
+        end = min(end, self.total)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+        indices = np.arange(start, end) % self.capacity
+        return self._buffer[indices]
+
+
+def pcm_to_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    out = io.BytesIO()
+    with wave.open(out, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(sample_rate)
+        writer.writeframes(samples.astype("<i2").tobytes())
+    return out.getvalue()
+
+
+class GeminiTranscriber:
+    """Default transcriber: one Gemini call per utterance snapshot."""
+
+    def __init__(self, model):
+        self.model = model
+
+    async def __call__(self, wav_bytes: bytes) -> str:
+        blob = {"mime_type": "audio/wav", "data": wav_bytes}
+        response = await model_client.generate_content(self.model, [TRANSCRIBE_PROMPT, blob])
+        return response.text.strip() if response and response.text else ""
+
+
+class StreamingSession:
+    """VAD and transcription state for one WebSocket connection."""
+
+    def __init__(self, websocket: WebSocket, transcriber, sample_rate: int):
+        self.websocket = websocket
+        self.transcriber = transcriber
+        self.sample_rate = sample_rate
+        self.ring = PCMRingBuffer(int(STT_STREAM_MAX_SECONDS * sample_rate))
+        self.frame_len = sample_rate * VAD_FRAME_MS // 1000
+        self.pending = b""
+        # Absolute index of the first sample not yet run through the VAD, so
+        # chunks shorter than a frame add up to whole frames across messages.
+        self.analysed = 0
+        self.noise_floor = None
+        # Absolute sample indices of the current utterance; None between utterances.
+        self.utterance_start = None
+        self.speech_end = 0
+        self.speech_end_time = 0.0
+        self.utterance_id = 0
+        # Latest partial: (utterance_id, speech_end it covered, task)
+        self.partial = None
+        self.tasks: set = set()
+
+    async def feed(self, data: bytes):
+        data = self.pending + data
+        usable = len(data) // 2 * 2
+        self.pending = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype="<i2")
+        if not len(samples):
+            return
+        self.ring.write(samples)
+        now = time.perf_counter()
+
+        # Samples the ring has already overwritten can't be analysed any more.
+        frame_start = max(self.analysed, self.ring.total - self.ring.capacity)
+        frames = (self.ring.total - frame_start) // self.frame_len
+        if not frames:
+            return
+        self.analysed = frame_start + frames * self.frame_len
+        blocks = self.ring.read(frame_start, self.analysed).astype(np.float32).reshape(frames, self.frame_len)
+        energies = np.sqrt(np.mean(blocks * blocks, axis=1))
+        for i, energy in enumerate(energies):
+            frame_end = frame_start + (i + 1) * self.frame_len
+            if self._is_speech(energy):
+                if self.utterance_start is None:
+                    pre_roll = self.sample_rate * PRE_ROLL_MS // 1000
+                    self.utterance_start = max(frame_end - self.frame_len - pre_roll, 0)
+                self.speech_end = frame_end
+                self.speech_end_time = now
+            elif self.utterance_start is not None:
+                silence_ms = (frame_end - self.speech_end) * 1000 / self.sample_rate
+                if silence_ms >= STT_END_SILENCE_MS:
+                    self.finalise()
+                elif silence_ms >= STT_PARTIAL_SILENCE_MS:
+                    self.request_partial()
+
+    def _is_speech(self, energy: float) -> bool:
+        if self.noise_floor is None:
+            self.noise_floor = energy
+        threshold = max(STT_VAD_MIN_RMS, self.noise_floor * NOISE_FLOOR_FACTOR)
+        if energy < threshold:
+            # Track the background level only while nobody is speaking.
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * energy
+            return False
+        return True
+
+    def _snapshot(self) -> bytes:
+        return pcm_to_wav(self.ring.read(self.utterance_start, self.speech_end), self.sample_rate)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def request_partial(self):
+        """Transcribe the utterance so far, unless that audio is already being transcribed."""
+        if self.partial and self.partial[:2] == (self.utterance_id, self.speech_end):
+            return
+        task = self._spawn(self._transcribe(self._snapshot()))
+        self.partial = (self.utterance_id, self.speech_end, task)
+        self._spawn(self._send_partial(self.utterance_id, task))
+
+    async def _send_partial(self, utterance_id: int, task):
+        text = await task
+        # A later final for this utterance supersedes the partial.
+        if text and utterance_id == self.utterance_id:
+            _stats["partials"] += 1
+            await self.websocket.send_json({"type": "partial", "text": text})
+
+    def finalise(self):
+        """Close the current utterance and send its final transcript."""
+        if self.utterance_start is None:
+            return
+        utterance_id, speech_end_time = self.utterance_id, self.speech_end_time
+        if self.partial and self.partial[:2] == (utterance_id, self.speech_end):
+            # Nothing was said since the last partial: its result is the final.
+            task = self.partial[2]
+            _stats["finals_from_partial"] += 1
+        else:
+            task = self._spawn(self._transcribe(self._snapshot()))
+        self.utterance_start = None
+        self.utterance_id += 1
+        self.partial = None
+        _stats["utterances"] += 1
+        self._spawn(self._send_final(task, speech_end_time))
+
+    async def _send_final(self, task, speech_end_time: float):
+        text = await task
+        latency_ms = round((time.perf_counter() - speech_end_time) * 1000, 1)
+        _latencies_ms.append(latency_ms)
+        del _latencies_ms[:-1000]
+        await self.websocket.send_json({"type": "final", "text": text, "latency_ms": latency_ms})
+
+    async def _transcribe(self, wav_bytes: bytes) -> str:
+        try:
+            return await self.transcriber(wav_bytes)
+        except Exception as e:
+            print(f"Error in streaming transcription: {e}")
+            await self.websocket.send_json({"type": "error", "message": str(e)})
+            return ""
+
+
+async def run_session(websocket: WebSocket, transcriber, sample_rate: int):
+    """
+    Serve one streaming STT connection.
+
+    Binary messages are PCM audio. A text message {"type": "end"} finalises
+    any open utterance and closes the connection once its transcript is sent.
+    """
+    await websocket.accept()
+    if not STT_STREAM_MIN_RATE <= sample_rate <= STT_STREAM_MAX_RATE:
+        # Policy violation: a rate of 0 has no VAD frames, a huge one an unbounded ring buffer.
+        await websocket.close(
+            code=1008, reason=f"sample_rate must be {STT_STREAM_MIN_RATE}-{STT_STREAM_MAX_RATE} Hz"
+        )
+        return
+    _stats["sessions"] += 1
+    session = StreamingSession(websocket, transcriber, sample_rate)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                await session.feed(message["bytes"])
+            elif message.get("text") and _is_end(message["text"]):
+                session.finalise()
+                if session.tasks:
+                    await asyncio.gather(*session.tasks, return_exceptions=True)
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in session.tasks:
+            task.cancel()
+
+
+def _is_end(text: str) -> bool:
+    try:
+        return json.loads(text).get("type") == "end"
+    except (ValueError, AttributeError):
+        return False
+
+
+def stats() -> dict:
+    """End-of-speech to final-text latency for streaming STT, reported by /health."""
+    latencies = sorted(_latencies_ms)
+    return {
+        **_stats,
+        "final_latency_ms_p50": latencies[len(latencies) // 2] if latencies else None,
+        "final_latency_ms_p95": latencies[int(len(latencies) * 0.95)] if latencies else None,
+    }
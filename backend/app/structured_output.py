@@ -0,0 +1,201 @@
+import json
+from contextlib import aclosing
+
+from pydantic import BaseModel, ValidationError
+
+from app import model_client
+from app.context_window import estimate_tokens
+from app.scheduler import ONBOARDING
+
+# Structured generation: the model is asked for JSON matching a pydantic
+# schema (Gemini's JSON mode with response_schema), the stream is checked
+# for well-formed JSON while it arrives so a broken reply is abandoned as
+# soon as it goes wrong, and a reply that still fails gets one targeted
+# repair call instead of being thrown away.
+
+# Schema keywords Gemini's response_schema understands.
+_SCHEMA_KEYS = {"type", "properties", "items", "required", "description", "enum", "nullable", "format"}
+
+_stats = {
+    "generations": 0,
+    "parse_failures": 0,
+    "aborted_streams": 0,
+    "repairs_succeeded": 0,
+    "repairs_failed": 0,
+    "wasted_tokens": 0,
+}
+
+
+class StructuredOutputError(ValueError):
+    """The model's reply could not be turned into the schema, even after a repair attempt."""
+
+
+def response_schema(model_cls: type[BaseModel]) -> dict:
+    """The pydantic model's JSON schema, reduced to what Gemini's response_schema accepts."""
+    def reduce(node: dict) -> dict:
+        out = {}
+        for key, value in node.items():
+            if key not in _SCHEMA_KEYS:
+                continue
+            if key == "properties":
+                value = {name: reduce(prop) for name, prop in value.items()}
+            elif key == "items":
+                value = reduce(value)
+            out[key] = value
+        return out
+    return reduce(model_cls.model_json_schema())
+
+
+def json_generation_config(model_cls: type[BaseModel]) -> dict:
+    return {"response_mime_type": "application/json", "response_schema": response_schema(model_cls)}
+
+
+class IncrementalJSONParser:
+    """
+    Checks a streamed JSON object chunk by chunk without re-scanning what it
+    has already seen. Text before the opening brace (a code fence, a stray
+    sentence) is skipped; after the closing brace only whitespace and fences
+    are allowed. `error` is set as soon as the structure is broken.
+    """
+
+    _CLOSERS = {"{": "}", "[": "]"}
+
+    def __init__(self):
+        self._parts: list = []
+        self._stack: list = []
+        self._in_string = False
+        self._escape = False
+        self.started = False
+        self.complete = False
+        self.error: str | None = None
+        self._offset = 0
+        self._start = 0
+        self._end = 0
+
+    def feed(self, chunk: str) -> bool:
+        """Consume the next chunk; returns False once the stream can no longer be valid JSON."""
+        if self.error:
+            return False
+        self._parts.append(chunk)
+        for i, char in enumerate(chunk):
+            position = self._offset + i
+            if self.complete:
+                if not char.isspace() and char != "`":
+                    self.error = f"unexpected {char!r} after the JSON object"
+                    return False
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                elif char in "\n\r":
+                    self.error = "unescaped newline inside a string"
+                    return False
+                continue
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self._start = position
+                    self._stack.append("}")
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in self._CLOSERS:
+                self._stack.append(self._CLOSERS[char])
+            elif char in "}]":
+                if not self._stack or self._stack.pop() != char:
+                    self.error = f"mismatched {char!r}"
+                    return False
+                if not self._stack:
+                    self.complete = True
+                    self._end = position + 1
+        self._offset += len(chunk)
+        return True
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def result(self) -> dict:
+        """The parsed object; raises ValueError if the stream ended incomplete or broken."""
+        if self.error:
+            raise ValueError(self.error)
+        if not self.complete:
+            raise ValueError("no complete JSON object in response" if self.started else "no JSON object in response")
+        data = json.loads(self.text[self._start:self._end])
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        return data
+
+
+def parse_structured(parser: IncrementalJSONParser, model_cls: type[BaseModel]) -> BaseModel:
+    """Validate a finished stream against the schema; raises ValueError with the reason."""
+    try:
+        return model_cls.model_validate(parser.result())
+    except ValidationError as e:
+        raise ValueError(f"schema mismatch: {e.errors()[0]['loc']} {e.errors()[0]['msg']}")
+
+
+async def generate_structured(model, prompt: str, model_cls: type[BaseModel], priority: int = ONBOARDING) -> BaseModel:
+    """
+    Stream a JSON reply for `model_cls` from `model` (configured with
+    json_generation_config), abandoning the stream as soon as it stops being
+    valid JSON. A reply that fails gets one repair call; raises
+    StructuredOutputError if that fails too.
+    """
+    _stats["generations"] += 1
+    parser = IncrementalJSONParser()
+    usage = {}
+    async with aclosing(model_client.stream_content(model, prompt, priority=priority)) as chunks:
+        async for chunk in chunks:
+            usage = model_client.usage_metadata(chunk) or usage
+            try:
+                text = chunk.text
+            except ValueError:
+                text = ""
+            if not parser.feed(text):
+                _stats["aborted_streams"] += 1
+                break
+    try:
+        return parse_structured(parser, model_cls)
+    except (ValueError, json.JSONDecodeError) as e:
+        error = str(e)
+    _stats["parse_failures"] += 1
+    _stats["wasted_tokens"] += usage.get("candidates_token_count") or estimate_tokens(parser.text)
+    print(f"Structured output failed ({error}); attempting one repair")
+    return await _repair(model, parser.text, error, model_cls, priority)
+
+
+async def _repair(model, raw: str, error: str, model_cls: type[BaseModel], priority: int) -> BaseModel:
+    prompt = f"""
+        The JSON below was meant to match this schema but is invalid: {error}.
+        Return the corrected JSON object only, keeping all of its content.
+
+        Schema:
+        {json.dumps(response_schema(model_cls))}
+
+        JSON:
+        {raw}
+    """
+    try:
+        response = await model_client.generate_content(model, prompt, priority=priority)
+        parser = IncrementalJSONParser()
+        parser.feed(response.text if response and response.text else "")
+        result = parse_structured(parser, model_cls)
+    except Exception as e:
+        _stats["repairs_failed"] += 1
+        raise StructuredOutputError(f"{error}; repair failed: {e}")
+    _stats["repairs_succeeded"] += 1
+    return result
+
+
+def stats() -> dict:
+    """Parse failures, repairs and tokens spent on discarded generations, reported by /health."""
+    generations = _stats["generations"]
+    return {
+        **_stats,
+        "parse_failure_rate": round(_stats["parse_failures"] / generations, 3) if generations else 0.0,
+    }
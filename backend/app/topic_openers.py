@@ -0,0 +1,183 @@
+import os
+import asyncio
+import hashlib
+import uuid
+
+from app import model_client
+from app.cache import TTLCache
+from app.model_router import chat_router
+from app.persona_cache import persona_cache
+from app.scheduler import BATCH, INTERACTIVE
+
+# Right after onboarding, the tutor's opening line for each of the track's
+# initial topics is generated in the background, so the first turn on a
+# topic is served from memory instead of waiting on a cold model call.
+# Prefetches run at BATCH priority under a global concurrency budget. Tracks
+# are shared by everyone whose goal maps to them, so each prefetch hands its
+# caller a handle; the openers are dropped and their prefetches cancelled
+# once every handle is discarded, or when the track is evicted.
+OPENER_PREFETCH_ENABLED = os.getenv("OPENER_PREFETCH_ENABLED", "false").lower() == "true"
+OPENER_PREFETCH_CONCURRENCY = int(os.getenv("OPENER_PREFETCH_CONCURRENCY", "4"))
+OPENER_CACHE_MAX_TRACKS = int(os.getenv("OPENER_CACHE_MAX_TRACKS", "500"))
+OPENER_CACHE_TTL_SECONDS = float(os.getenv("OPENER_CACHE_TTL_SECONDS", str(6 * 3600)))
+
+
+def track_id(system_prompt: str) -> str:
+    """Stable id of a track, derived from its persona."""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:32]
+
+
+def handle_track(handle: str) -> str:
+    """The track id a prefetch handle refers to."""
+    return handle.split("-", 1)[0]
+
+
+def opener_prompt(topic: str) -> str:
+    return (
+        f'Start a new practice conversation on the topic "{topic}". Stay in character, '
+        "greet the learner and open the topic in one or two short sentences, "
+        "ending with a question they can answer."
+    )
+
+
+class TrackOpeners:
+    """Openers of one track, by topic, and the prefetches still running for it."""
+
+    def __init__(self, system_prompt: str):
+        self.system_prompt = system_prompt
+        self.openers: dict = {}
+        self.tasks: dict = {}
+        self.handles: set = set()
+
+
+class OpenerCache:
+    """Per-track cache of prefetched topic openers."""
+
+    def __init__(self, enabled: bool = OPENER_PREFETCH_ENABLED, concurrency: int = OPENER_PREFETCH_CONCURRENCY,
+                 max_tracks: int = OPENER_CACHE_MAX_TRACKS, ttl_seconds: float = OPENER_CACHE_TTL_SECONDS):
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self._tracks = TTLCache(max_tracks, ttl_seconds, on_evict=lambda _, track: self._cancel(track))
+        self._budget: asyncio.Semaphore | None = None
+        self._in_flight = 0
+        self._stats = {
+            "prefetched": 0, "prefetch_errors": 0, "cancelled": 0,
+            "hits": 0, "pending_hits": 0, "misses": 0,
+        }
+
+    def prefetch(self, system_prompt: str, topics: list) -> str | None:
+        """
+        Start generating openers for `topics` in the background; returns this
+        caller's handle on the track, for discard().
+        """
+        if not self.enabled or not topics:
+            return None
+        key = track_id(system_prompt)
+        track = self._tracks.get(key)
+        if track is None:
+            track = TrackOpeners(system_prompt)
+            self._tracks.set(key, track)
+        handle = f"{key}-{uuid.uuid4().hex[:12]}"
+        track.handles.add(handle)
+        for topic in topics:
+            if topic not in track.openers and topic not in track.tasks:
+                task = asyncio.create_task(self._prefetch_one(track, topic))
+                track.tasks[topic] = task
+                task.add_done_callback(lambda done, topic=topic: self._finished(track, topic, done))
+        return handle
+
+    @staticmethod
+    def _finished(track: TrackOpeners, topic: str, task: asyncio.Task):
+        track.tasks.pop(topic, None)
+        if not task.cancelled():
+            task.exception()  # failures are counted in _prefetch_one; nobody may await this task
+
+    async def _prefetch_one(self, track: TrackOpeners, topic: str) -> str:
+        if self._budget is None:
+            self._budget = asyncio.Semaphore(self.concurrency)
+        async with self._budget:
+            self._in_flight += 1
+            try:
+                text = await self._generate(track.system_prompt, topic, BATCH)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Opener prefetch failed for topic {topic!r}: {e}")
+                self._stats["prefetch_errors"] += 1
+                raise
+            finally:
+                self._in_flight -= 1
+        track.openers[topic] = text
+        self._stats["prefetched"] += 1
+        return text
+
+    async def _generate(self, system_prompt: str, topic: str, priority: int) -> str:
+        model, _ = await persona_cache.model_for(chat_router.persona_model(system_prompt), system_prompt)
+        response = await model_client.generate_content(model, opener_prompt(topic), priority=priority)
+        text = response.text.strip() if response and response.text else ""
+        if not text:
+            raise ValueError("empty opener")
+        return text
+
+    async def opener(self, system_prompt: str, topic: str) -> tuple:
+        """
+        (opening line, prefetched) for `topic`: the prefetched line when it is
+        ready or still running, otherwise one generated now.
+        """
+        track = self._tracks.get(track_id(system_prompt))
+        if track is not None:
+            text = track.openers.get(topic)
+            if text is not None:
+                self._stats["hits"] += 1
+                return text, True
+            task = track.tasks.get(topic)
+            if task is not None:
+                try:
+                    text = await asyncio.shield(task)
+                    self._stats["pending_hits"] += 1
+                    return text, True
+                except asyncio.CancelledError:
+                    if not task.cancelled():
+                        raise  # this request was cancelled, not the prefetch
+                except Exception:
+                    pass  # fall through to an on-demand opener
+        self._stats["misses"] += 1
+        text = await self._generate(system_prompt, topic, INTERACTIVE)
+        if track is not None:
+            track.openers[topic] = text
+        return text, False
+
+    def discard(self, handle: str) -> bool:
+        """
+        Release a handle from prefetch(). When it was the track's last one,
+        forget the openers and cancel the outstanding prefetches. False for
+        an unknown or already released handle, so repeating it is harmless.
+        """
+        key = handle_track(handle)
+        track = self._tracks.get(key)
+        if track is None or handle not in track.handles:
+            return False
+        track.handles.discard(handle)
+        if not track.handles:
+            self._tracks.delete(key)
+            self._cancel(track)
+        return True
+
+    def _cancel(self, track: TrackOpeners):
+        for task in list(track.tasks.values()):
+            if not task.done():
+                task.cancel()
+                self._stats["cancelled"] += 1
+
+    def stats(self) -> dict:
+        served = self._stats["hits"] + self._stats["pending_hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "enabled": self.enabled,
+            "tracks": len(self._tracks),
+            "in_flight": self._in_flight,
+            "hit_rate": round((self._stats["hits"] + self._stats["pending_hits"]) / served, 3) if served else 0.0,
+        }
+
+
+opener_cache = OpenerCache()
@@ -0,0 +1,99 @@
+import os
+import asyncio
+import hashlib
+
+from app.cache import SQLiteCache, TTLCache
+
+TRACK_CACHE_MAX_ENTRIES = int(os.getenv("TRACK_CACHE_MAX_ENTRIES", "2000"))
+TRACK_CACHE_TTL_SECONDS = float(os.getenv("TRACK_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Optional second tier shared by all workers; empty disables it.
+TRACK_CACHE_DB_PATH = os.getenv("TRACK_CACHE_DB_PATH", "")
+TRACK_CACHE_DB_MAX_ENTRIES = int(os.getenv("TRACK_CACHE_DB_MAX_ENTRIES", "50000"))
+
+
+def normalise(text: str) -> str:
+    """Case- and whitespace-insensitive form of a language or goal."""
+    return " ".join(text.casefold().split())
+
+
+def track_key(language: str, goal: str) -> str:
+    """Content address of an onboarding request."""
+    raw = f"{normalise(language)}\n{normalise(goal)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TrackCache:
+    """
+    Two-tier cache of generated learning tracks keyed on (language, goal).
+
+    Concurrent misses for the same key share a single generation. Only
+    values returned by `generate` are stored, so callers keep fallbacks out
+    of the cache by raising instead of returning them.
+    """
+
+    def __init__(self, memory: TTLCache, disk: SQLiteCache | None = None):
+        self.memory = memory
+        self.disk = disk
+        self._pending: dict = {}
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def get(self, key: str) -> dict | None:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self._stats["disk_hits"] += 1
+                self.memory.set(key, value)
+        if value is not None:
+            self._stats["hits"] += 1
+        return value
+
+    def put(self, key: str, value: dict):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def get_or_generate(self, language: str, goal: str, generate) -> dict:
+        """Return the cached track, or run `generate(language, goal)` once per key."""
+        key = track_key(language, goal)
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            value = await generate(language, goal)
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            self._stats["errors"] += 1
+            future.set_exception(e)
+            # Mark retrieved so a miss without followers doesn't log a warning.
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    def stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0,
+            "entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else None,
+        }
+
+
+track_cache = TrackCache(
+    TTLCache(TRACK_CACHE_MAX_ENTRIES, TRACK_CACHE_TTL_SECONDS),
+    SQLiteCache(TRACK_CACHE_DB_PATH, "learning_tracks", TRACK_CACHE_DB_MAX_ENTRIES, TRACK_CACHE_TTL_SECONDS)
+    if TRACK_CACHE_DB_PATH else None,
+)
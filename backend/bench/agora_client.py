@@ -0,0 +1,83 @@
+"""Benchmark: pooled AgoraClient vs a new httpx client per call, against the mock Agora server.
+
+Run from backend/:
+
+    python -m bench.agora_client --calls 200 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.agora_client import AgoraClient, CircuitOpenError
+from bench.mock_agora import create_app, serve_in_thread
+
+START_PATH = "/v1/projects/bench/rtc/speech-to-speech/start"
+
+
+async def per_call_clients(base_url: str, calls: int) -> list:
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            await client.post(f"{base_url}{START_PATH}", json={"channel": f"c{i}", "uid": "1"})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def pooled_client(base_url: str, calls: int) -> tuple:
+    client = AgoraClient(base_url, "id", "secret")
+    await client.start()
+    latencies, errors = [], 0
+    for i in range(calls):
+        start = time.perf_counter()
+        try:
+            response = await client.post("start", START_PATH, {"channel": f"c{i}", "uid": "1"})
+            errors += response.is_error
+        except (httpx.HTTPError, CircuitOpenError):
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    stats = client.stats()
+    await client.close()
+    return latencies, errors, stats
+
+
+def summary(latencies: list) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 2),
+        "p95_ms": round(1000 * ordered[int(len(ordered) * 0.95)], 2),
+    }
+
+
+async def run(calls: int, latency: float, error_rate: float, port: int) -> dict:
+    server = serve_in_thread(create_app(latency, error_rate, seed=1), port)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        fresh = await per_call_clients(base_url, calls)
+        pooled, errors, stats = await pooled_client(base_url, calls)
+    finally:
+        server.should_exit = True
+    return {
+        "calls": calls,
+        "server_latency_ms": latency * 1000,
+        "injected_error_rate": error_rate,
+        "new_client_per_call": summary(fresh),
+        "pooled_client": {**summary(pooled), "errors_after_retry": errors, **stats},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8901)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.calls, args.latency, args.error_rate, args.port)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
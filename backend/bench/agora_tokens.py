@@ -0,0 +1,58 @@
+"""Benchmark: Agora RTC+RTM token pairs per second with and without the token cache.
+
+Run from backend/:
+
+    python -m bench.agora_tokens --requests 20000 --participants 200
+"""
+import argparse
+import json
+import random
+import time
+import zlib
+
+from app.agora_tokens import TokenService
+
+APP_ID = "0" * 32
+CERTIFICATE = "1" * 32
+
+
+def run(requests: int, participants: int, cache_size: int, seed: int = 0) -> dict:
+    """
+    Mint `requests` token pairs for `participants` distinct (channel, uid)
+    pairs, picked at random the way reconnects and bot restarts repeat them.
+    """
+    service = TokenService(APP_ID, CERTIFICATE, max_entries=cache_size)
+    rng = random.Random(seed)
+    who = [(f"channel-{i // 4}", f"user{i:04d}") for i in range(participants)]
+    picks = [rng.choice(who) for _ in range(requests)]
+
+    start = time.perf_counter()
+    for channel, uid in picks:
+        service.pair(channel, zlib.crc32(uid.encode()) % (10 ** 8), uid)
+    elapsed = time.perf_counter() - start
+    return {
+        "cache_size": cache_size,
+        "pairs_per_second": round(requests / elapsed),
+        "us_per_pair": round(1e6 * elapsed / requests, 2),
+        **service.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--participants", type=int, default=200)
+    args = parser.parse_args()
+    uncached = run(args.requests, args.participants, cache_size=0)
+    cached = run(args.requests, args.participants, cache_size=10_000)
+    print(json.dumps({
+        "requests": args.requests,
+        "participants": args.participants,
+        "uncached": uncached,
+        "cached": cached,
+        "speedup": round(cached["pairs_per_second"] / uncached["pairs_per_second"], 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark: bytes, audio seconds and CPU time of audio_prep.normalise per upload format.
+
+Run from backend/:
+
+    python -m bench.audio_prep --seconds 5 30 120
+
+Each clip is speech-like tone bursts with pauses, padded with background
+noise at the start and end the way a push-to-talk recording is. Gemini
+bills audio at a fixed rate per second (AUDIO_TOKENS_PER_SECOND), so the
+token estimate only moves with trimmed silence; bytes move with the
+channel count and sample rate too.
+"""
+import argparse
+import io
+import json
+import statistics
+import time
+import wave
+
+import numpy as np
+
+AUDIO_TOKENS_PER_SECOND = 32
+FORMATS = {
+    "48k_stereo": (48_000, 2),
+    "44k1_mono": (44_100, 1),
+    "16k_mono": (16_000, 1),
+}
+
+
+def recording(seconds: float, rate: int, channels: int, lead_silence: float, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    total = int(seconds * rate)
+    samples = rng.normal(0, 30, total).astype(np.float32)  # room noise, about -60 dBFS
+    pos, end = int(lead_silence * rate), total - int(lead_silence * rate)
+    while pos < end:
+        burst = min(int(rng.uniform(0.5, 2.5) * rate), end - pos)
+        t = np.arange(burst) / rate
+        samples[pos:pos + burst] += 6000 * np.sin(2 * np.pi * rng.uniform(120, 300) * t)
+        pos += burst + int(rng.uniform(0.2, 0.6) * rate)
+    frames = np.repeat(samples[:, None], channels, axis=1).astype("<i2")
+    out = io.BytesIO()
+    with wave.open(out, "wb") as writer:
+        writer.setnchannels(channels)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(frames.tobytes())
+    return out.getvalue()
+
+
+def measure(data: bytes, repeats: int) -> dict:
+    from app import audio_prep
+    from app.audio_upload import SpooledAudio
+
+    times = []
+    for _ in range(repeats):
+        audio = SpooledAudio("application/octet-stream", len(data), data=data)
+        start = time.perf_counter()
+        report = audio_prep.normalise(audio)
+        times.append((time.perf_counter() - start) * 1000)
+    seconds_in = report.get("seconds_in") or 0
+    seconds_out = report.get("seconds_out", seconds_in)
+    return {
+        "bytes_in": report["bytes_in"],
+        "bytes_out": report["bytes_out"],
+        "byte_ratio": round(report["bytes_out"] / report["bytes_in"], 3),
+        "mime_type_out": report["mime_type_out"],
+        "audio_tokens_in": round(seconds_in * AUDIO_TOKENS_PER_SECOND),
+        "audio_tokens_out": round(seconds_out * AUDIO_TOKENS_PER_SECOND),
+        "prep_ms_median": round(statistics.median(times), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, nargs="+", default=[5, 30, 120])
+    parser.add_argument("--lead-silence", type=float, default=1.5, help="noise-only seconds at each end")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for seconds in args.seconds:
+        for name, (rate, channels) in FORMATS.items():
+            data = recording(seconds, rate, channels, args.lead_silence)
+            results.append({"format": name, "seconds": seconds, **measure(data, args.repeats)})
+    # Containers that can't be decoded without ffmpeg still get their type from the magic bytes.
+    webm = b"\x1a\x45\xdf\xa3" + bytes(4096)
+    results.append({"format": "webm", "seconds": None, **measure(webm, 1)})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
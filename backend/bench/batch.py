@@ -0,0 +1,122 @@
+"""Benchmark: batch job throughput, its effect on interactive latency, and crash recovery.
+
+Run from backend/:
+
+    python -m bench.batch --items 300 --rps 5 --duration 20 --gemini-rpm 1200
+    python -m bench.batch --items 300 --crash-after 5
+
+Starts the app under gunicorn against the fake Gemini (see bench.load).
+Interactive /chat/text traffic runs for `--duration` seconds on its own,
+then again while a batch job generates `--items` tracks with distinct
+goals. GEMINI_RPM is set so the scheduler queues, which is where the
+priority between the two shows. With `--crash-after` the server is
+SIGKILLed that many seconds into the job and restarted; the report says
+whether the job resumed from its checkpoint and whether the output ended up
+with every index exactly once.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import time
+
+import httpx
+
+from bench.fake_gemini import FakeConfig
+from bench.load import Scenario, drive, spawn_server, wait_ready, worker_pids
+
+BATCH_DIR = "/tmp/echo_bench_batch"
+
+
+def job_file(items: int) -> str:
+    return "\n".join(
+        json.dumps({"kind": "track", "language": "Spanish", "goal": f"Bench goal number {i}", "id": str(i)})
+        for i in range(items)
+    )
+
+
+def check_output(job_id: str, items: int) -> dict:
+    with open(os.path.join(BATCH_DIR, job_id, "output.jsonl")) as f:
+        indexes = [json.loads(line)["index"] for line in f]
+    return {"lines": len(indexes), "unique": len(set(indexes)), "complete": sorted(set(indexes)) == list(range(items))}
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str, timeout: float = 600) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = (await client.get(f"/batch/jobs/{job_id}")).json()
+        if job["status"] not in ("running", "queued", "interrupted"):
+            return job
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"batch job {job_id} did not finish")
+
+
+async def run(args) -> dict:
+    shutil.rmtree(BATCH_DIR, ignore_errors=True)
+    env = {
+        **FakeConfig(latency_ms=args.gemini_latency_ms, ttft_ms=args.gemini_latency_ms / 4).to_env(),
+        "GEMINI_RPM": str(args.gemini_rpm), "BATCH_DIR": BATCH_DIR, "BATCH_LEASE_SECONDS": "3",
+        "BATCH_CONCURRENCY": str(args.concurrency), "ECHO_ROUTERS": "onboarding,chat,batch",
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join("/tmp", f"echo_bench_metrics_{args.port}"),
+    }
+    target = f"http://127.0.0.1:{args.port}"
+    server = spawn_server("app.main", args.port, args.workers, env)
+    report = {"config": vars(args)}
+    try:
+        await wait_ready(target)
+        async with httpx.AsyncClient(base_url=target, timeout=120) as client:
+            chat = Scenario("chat_text", client, b"")
+            if not args.crash_after:
+                report["interactive_alone"] = await drive(chat, args.rps, args.duration)
+
+            start = time.perf_counter()
+            response = await client.post("/batch/jobs", files={"file": ("job.jsonl", job_file(args.items))})
+            job_id = response.json()["id"]
+
+            if args.crash_after:
+                await asyncio.sleep(args.crash_after)
+                before = (await client.get(f"/batch/jobs/{job_id}")).json()["processed"]
+                for pid in worker_pids(server.pid):
+                    os.kill(pid, signal.SIGKILL)
+                server.kill()
+                server.wait()
+                server = spawn_server("app.main", args.port, args.workers, env)
+                await wait_ready(target)
+                job = await wait_for_job(client, job_id)
+                report["crash"] = {"processed_before_crash": before, **check_output(job_id, args.items)}
+            else:
+                report["interactive_during_batch"] = await drive(chat, args.rps, args.duration)
+                job = await wait_for_job(client, job_id)
+
+            elapsed = time.perf_counter() - start
+            report["batch"] = {
+                "status": job["status"], "succeeded": job["succeeded"], "failed": job["failed"],
+                "elapsed_s": round(elapsed, 1), "items_per_minute": round(job["total"] / elapsed * 60, 1),
+            }
+            health = (await client.get("/health")).json()
+            report["scheduler_wait"] = health["model_client"].get("scheduler", {}).get("wait")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=300)
+    parser.add_argument("--rps", type=float, default=5.0, help="interactive chat requests per second")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--gemini-rpm", type=float, default=1200.0, help="GEMINI_RPM per worker")
+    parser.add_argument("--gemini-latency-ms", type=float, default=400.0)
+    parser.add_argument("--concurrency", type=int, default=4, help="BATCH_CONCURRENCY")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8150)
+    parser.add_argument("--crash-after", type=float, default=0.0, help="SIGKILL the server this many seconds in")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
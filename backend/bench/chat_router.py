@@ -0,0 +1,90 @@
+"""Replay harness: chat-turn latency with every turn on pro vs routed between fast and pro.
+
+Run from backend/:
+
+    python -m bench.chat_router --conversations bench/data/chat_replay.jsonl
+    python -m bench.chat_router --live        # real Gemini calls, needs GOOGLE_API_KEY
+
+Each line of the conversations file is {"system_prompt": ..., "turns": [learner
+messages]}. Turns are replayed in order with the growing history, once with
+every turn on the pro model (the old behaviour) and once through ChatRouter.
+Offline, each call's latency comes from a per-tier model (base + per prompt
+token, log-normal noise) instead of the network.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+from app.context_window import build_windowed_prompt, estimate_tokens
+from app.model_router import FAST, PRO, ChatRouter
+
+# Offline latency model per tier: (base ms, ms per 1k prompt tokens).
+TIER_LATENCY = {FAST: (350.0, 60.0), PRO: (1200.0, 220.0)}
+
+
+def load(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def simulated_latency_ms(tier: str, prompt_tokens: int, rng: random.Random) -> float:
+    base, per_k = TIER_LATENCY[tier]
+    return (base + per_k * prompt_tokens / 1000) * rng.lognormvariate(0, 0.25)
+
+
+async def live_latency_ms(model_name: str, system_prompt: str, prompt: str) -> float:
+    from app import model_client
+    from app.model_registry import model_registry
+
+    model = model_registry.get(model_name, system_instruction=system_prompt)
+    start = time.perf_counter()
+    await model_client.generate_content(model, prompt)
+    return (time.perf_counter() - start) * 1000
+
+
+async def replay(conversations: list, router: ChatRouter, live: bool, seed: int) -> dict:
+    rng = random.Random(seed)
+    latencies = []
+    for conversation in conversations:
+        system_prompt = conversation["system_prompt"]
+        history = []
+        for message in conversation["turns"]:
+            route = router.route(system_prompt, message)
+            prompt = build_windowed_prompt(system_prompt, history, message)
+            if live:
+                latency = await live_latency_ms(route.model_name, system_prompt, prompt)
+            else:
+                latency = simulated_latency_ms(route.tier, estimate_tokens(system_prompt + prompt), rng)
+            router.record(route, latency)
+            latencies.append(latency)
+            history += [{"role": "human", "content": message}, {"role": "ai", "content": "(reply)"}]
+    ordered = np.array(latencies)
+    return {
+        "turns": len(latencies),
+        "latency_ms_p50": round(float(np.percentile(ordered, 50)), 1),
+        "latency_ms_p95": round(float(np.percentile(ordered, 95)), 1),
+        "router": router.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", default="bench/data/chat_replay.jsonl")
+    parser.add_argument("--live", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    conversations = load(args.conversations)
+
+    all_pro = ChatRouter(enabled=True, fast_model="gemini-1.5-pro", pro_model="gemini-1.5-pro", min_words=0)
+    routed = ChatRouter(enabled=True)
+    baseline = asyncio.run(replay(conversations, all_pro, args.live, args.seed))
+    with_router = asyncio.run(replay(conversations, routed, args.live, args.seed))
+    print(json.dumps({"all_pro": baseline, "routed": with_router}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
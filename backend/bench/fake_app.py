@@ -0,0 +1,20 @@
+"""ASGI entry point for load tests: the backend with Gemini replaced by bench.fake_gemini.
+
+Run from backend/:
+
+    BENCH_GEMINI_LATENCY_MS=800 gunicorn bench.fake_app:app -c gunicorn.conf.py
+    ECHO_ROUTERS=chat,stt gunicorn bench.fake_app:app -c gunicorn.conf.py   # a subset of the API
+
+The fake is configured from BENCH_GEMINI_* (see FakeConfig.from_env) and
+installed before the app module is imported, so every worker serves the real
+app code against the fake model. Point AGORA_BASE_URL at bench.mock_agora to
+keep session starts offline too.
+"""
+import importlib
+import os
+
+from bench.fake_gemini import FakeConfig, FakeGemini, install
+
+install(FakeGemini(FakeConfig.from_env()))
+
+app = importlib.import_module(os.getenv("BENCH_APP", "app.main")).app
@@ -0,0 +1,198 @@
+"""Deterministic stand-in for google.generativeai, for benchmarks that must not spend quota.
+
+    from bench.fake_gemini import FakeConfig, FakeGemini, install
+
+    gemini = install(FakeGemini(FakeConfig(latency_ms=800, errors={429: 0.05})))
+
+`install` swaps genai.GenerativeModel (and the Files API calls used for large
+audio) for fakes before the backend is imported, so app code runs unchanged.
+Each call sleeps for a log-normal latency around `latency_ms`; streamed calls
+deliver their first chunk after `ttft_ms` and the rest evenly over the
+remaining time. `errors` maps an HTTP status (429, 500, 503) to the fraction
+of calls that fail with the matching google.api_core exception, and
+`quota_rps` rejects calls over a rolling one-second quota with a 429, like
+Gemini's per-minute quota compressed in time. JSON-mode calls answer with an
+object built from their response_schema.
+
+FakeConfig.from_env() reads the same settings from BENCH_GEMINI_* variables,
+which is how bench.fake_app configures server workers.
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+from google.api_core import exceptions as api_exceptions
+
+ERROR_TYPES = {
+    429: api_exceptions.TooManyRequests,
+    500: api_exceptions.InternalServerError,
+    503: api_exceptions.ServiceUnavailable,
+}
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 800.0
+    latency_sigma: float = 0.25  # log-normal shape; 0 makes every call take exactly latency_ms
+    ttft_ms: float = 250.0
+    chunks: int = 8
+    errors: dict = field(default_factory=dict)  # {status: rate}
+    quota_rps: int = 0
+    reply: str = "That's a great start! Let's keep practising together."
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeConfig":
+        errors = {}
+        for item in os.getenv("BENCH_GEMINI_ERRORS", "").split(","):
+            if item.strip():
+                status, rate = item.split(":")
+                errors[int(status)] = float(rate)
+        return cls(
+            latency_ms=float(os.getenv("BENCH_GEMINI_LATENCY_MS", "800")),
+            latency_sigma=float(os.getenv("BENCH_GEMINI_LATENCY_SIGMA", "0.25")),
+            ttft_ms=float(os.getenv("BENCH_GEMINI_TTFT_MS", "250")),
+            chunks=int(os.getenv("BENCH_GEMINI_CHUNKS", "8")),
+            errors=errors,
+            quota_rps=int(os.getenv("BENCH_GEMINI_QUOTA_RPS", "0")),
+            seed=int(os.getenv("BENCH_GEMINI_SEED", "0")),
+        )
+
+    def to_env(self) -> dict:
+        return {
+            "BENCH_GEMINI_LATENCY_MS": str(self.latency_ms),
+            "BENCH_GEMINI_LATENCY_SIGMA": str(self.latency_sigma),
+            "BENCH_GEMINI_TTFT_MS": str(self.ttft_ms),
+            "BENCH_GEMINI_CHUNKS": str(self.chunks),
+            "BENCH_GEMINI_ERRORS": ",".join(f"{status}:{rate}" for status, rate in self.errors.items()),
+            "BENCH_GEMINI_QUOTA_RPS": str(self.quota_rps),
+            "BENCH_GEMINI_SEED": str(self.seed),
+        }
+
+
+def sample_json(schema: dict):
+    """A value matching a (reduced) JSON schema."""
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: sample_json(prop) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_json(schema.get("items", {"type": "string"})) for _ in range(3)]
+    if kind in ("integer", "number"):
+        return 1
+    if kind == "boolean":
+        return True
+    return "You are Sofia, a patient tutor who keeps every sentence short and friendly."
+
+
+class FakeGemini:
+    """Shared latency model, error injection, quota and call counters for every fake model."""
+
+    def __init__(self, config: FakeConfig | None = None):
+        self.config = config or FakeConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._recent: deque = deque()
+        self.stats = {"calls": 0, "streams": 0, "rejected": 0, "errors": 0}
+
+    def model(self, model_name: str = "gemini-1.5-flash", **kwargs) -> "FakeGenerativeModel":
+        return FakeGenerativeModel(model_name, gemini=self, **kwargs)
+
+    def _admit(self) -> float:
+        """Latency for the next call, or raise the error injected for it."""
+        config = self.config
+        now = time.monotonic()
+        with self._lock:
+            self.stats["calls"] += 1
+            if config.quota_rps:
+                while self._recent and now - self._recent[0] > 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= config.quota_rps:
+                    self.stats["rejected"] += 1
+                    raise api_exceptions.TooManyRequests("429 Resource has been exhausted (fake quota)")
+                self._recent.append(now)
+            roll = self._rng.random()
+            for status, rate in config.errors.items():
+                if roll < rate:
+                    self.stats["errors"] += 1
+                    raise ERROR_TYPES[status](f"{status} injected by fake Gemini")
+                roll -= rate
+            noise = self._rng.lognormvariate(0, config.latency_sigma) if config.latency_sigma else 1.0
+        return config.latency_ms * noise / 1000
+
+
+class FakeGenerativeModel:
+    """Blocking stand-in for genai.GenerativeModel, like the real client."""
+
+    def __init__(self, model_name: str = "gemini-1.5-flash", system_instruction=None,
+                 generation_config=None, gemini: FakeGemini | None = None, **kwargs):
+        self.model_name = f"models/{model_name.removeprefix('models/')}"
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config or {}
+        self.gemini = gemini or _installed or FakeGemini()
+
+    def _reply(self) -> str:
+        if self.generation_config.get("response_mime_type") == "application/json":
+            return json.dumps(sample_json(self.generation_config.get("response_schema") or {"type": "object"}))
+        return self.gemini.config.reply
+
+    def _usage(self, contents, text: str):
+        parts = contents if isinstance(contents, list) else [contents]
+        text_chars = sum(len(part) for part in parts if isinstance(part, str))
+        prompt_tokens = (text_chars + len(self.system_instruction or "")) // 4
+        response_tokens = len(text) // 4
+        return SimpleNamespace(
+            prompt_token_count=prompt_tokens, cached_content_token_count=0,
+            candidates_token_count=response_tokens, total_token_count=prompt_tokens + response_tokens,
+        )
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        latency = self.gemini._admit()
+        text = self._reply()
+        if stream:
+            return self._stream(contents, text, latency)
+        time.sleep(latency)
+        return SimpleNamespace(text=text, usage_metadata=self._usage(contents, text))
+
+    def _stream(self, contents, text: str, latency: float):
+        self.gemini.stats["streams"] += 1
+        config = self.gemini.config
+        ttft = min(config.ttft_ms / 1000, latency)
+        pieces = max(1, config.chunks)
+        size = -(-len(text) // pieces)
+        time.sleep(ttft)
+        for i in range(pieces):
+            if i:
+                time.sleep((latency - ttft) / (pieces - 1))
+            last = i == pieces - 1
+            yield SimpleNamespace(
+                text=text[i * size:(i + 1) * size],
+                usage_metadata=self._usage(contents, text) if last else None,
+            )
+
+
+_installed: FakeGemini | None = None
+
+
+def install(gemini: FakeGemini | None = None) -> FakeGemini:
+    """Route every google.generativeai model and file call in this process to `gemini`."""
+    global _installed
+    import google.generativeai as genai
+
+    _installed = gemini or FakeGemini()
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.upload_file = lambda path, mime_type=None, **_: SimpleNamespace(
+        name=f"files/{os.path.basename(path)}", uri=f"fake://{path}", mime_type=mime_type,
+        state=SimpleNamespace(name="ACTIVE"),
+    )
+    genai.get_file = lambda name: SimpleNamespace(name=name, state=SimpleNamespace(name="ACTIVE"))
+    genai.delete_file = lambda name: None
+
+    from app.model_registry import model_registry
+
+    model_registry._factory = FakeGenerativeModel
+    return _installed
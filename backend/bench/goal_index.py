@@ -0,0 +1,70 @@
+"""Benchmark: goal-index insert and lookup latency at 10k and 100k stored goals.
+
+Run from backend/:
+
+    python -m bench.goal_index --sizes 10000 100000 --lookups 500
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from app.goal_index import GoalIndex
+
+ROLES = ["doctor", "nurse", "lawyer", "tourist", "student", "engineer", "chef", "pilot",
+         "teacher", "accountant", "sales manager", "architect", "pharmacist", "journalist"]
+NEEDS = ["medical terminology", "ordering food", "business meetings", "job interviews",
+         "small talk", "legal vocabulary", "travel directions", "negotiating contracts",
+         "technical presentations", "customer support", "shopping", "emergency situations"]
+EXTRAS = ["", "for work", "before a trip", "quickly", "at an advanced level", "in a new city"]
+
+
+def synthetic_goal(rng: random.Random) -> str:
+    return " ".join(filter(None, [
+        rng.choice(["a", "an experienced", "a junior", ""]),
+        rng.choice(ROLES), rng.choice(["needing", "who wants", "learning"]),
+        rng.choice(NEEDS), rng.choice(EXTRAS), str(rng.randrange(10_000)),
+    ]))
+
+
+def run(size: int, lookups: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    goals = [synthetic_goal(rng) for _ in range(size)]
+    index = GoalIndex(max_entries=size)
+
+    start = time.perf_counter()
+    for i, goal in enumerate(goals):
+        index.add(goal, i)
+    insert_s = time.perf_counter() - start
+
+    queries = [synthetic_goal(rng) for _ in range(lookups)]
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k=5)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+
+    return {
+        "stored_goals": size,
+        "dim": index.dim,
+        "matrix_mb": round(index._vectors.nbytes / 2**20, 1),
+        "insert_us_per_goal": round(1e6 * insert_s / size, 1),
+        "lookup_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+        "lookup_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+        "lookup_ms_max": round(float(latencies.max()), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    print(json.dumps([run(size, args.lookups) for size in args.sizes], indent=2))
+
+
+if __name__ == "__main__":
+    main()
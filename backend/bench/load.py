@@ -0,0 +1,269 @@
+"""Load driver: fixed-rate traffic against the backend, reported as JSON.
+
+Run from backend/. Fully offline, with the app under gunicorn against the fake
+Gemini and the mock Agora server:
+
+    python -m bench.load --spawn --scenarios chat_text,speech_to_text,onboarding,session_start \\
+        --rps 20 --duration 30 --output /tmp/echo-load-baseline.json
+
+or against servers that are already running (pass --pid with a gunicorn
+master pid to include its workers' memory):
+
+    python -m bench.load --target http://127.0.0.1:8000 --pid 1234
+
+Each scenario gets its own open-loop stream of `--rps` requests per second,
+so a slow server builds a backlog instead of slowing the driver down. The
+report has throughput, p50/p95/p99 latency and status counts per scenario,
+plus peak and final RSS per worker, sampled every `--rss-interval` seconds.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import wave
+
+import httpx
+import numpy as np
+
+from bench.fake_gemini import FakeConfig
+from bench.mock_agora import create_app, serve_in_thread
+
+SCENARIOS = ("chat_text", "speech_to_text", "onboarding", "session_start")
+SYSTEM_PROMPT = "You are Sofia, a friendly Spanish tutor. Keep replies short and ask one question at a time."
+
+
+def wav_clip(seconds: float = 2.0, rate: int = 16000) -> bytes:
+    """A mono 16-bit WAV tone, the size of a short spoken answer."""
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * math.pi * 220 * t) * 8000).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+class Scenario:
+    """One endpoint's request."""
+
+    def __init__(self, name: str, client: httpx.AsyncClient, audio: bytes):
+        self.name = name
+        self.client = client
+        self.audio = audio
+
+    async def request(self, i: int) -> int:
+        if self.name == "chat_text":
+            payload = {"system_prompt": SYSTEM_PROMPT, "history": [], "user_message": f"Hola, me llamo Ana ({i})"}
+            response = await self.client.post("/chat/text", json=payload)
+        elif self.name == "speech_to_text":
+            files = {"file": ("answer.wav", self.audio, "audio/wav")}
+            response = await self.client.post("/speech-to-text", files=files)
+        elif self.name == "onboarding":
+            # A distinct goal per request, so every call misses the track cache.
+            payload = {"language": "Spanish", "goal": f"Ordering food while travelling, variant {i}"}
+            response = await self.client.post("/onboarding/generate-track", json=payload)
+        else:
+            response = await self.client.post("/session/start", json={"trackId": f"bench-{i}", "language": "es"})
+            channel = response.json().get("channel") if response.status_code == 200 else None
+            if channel:
+                await self.client.post("/session/stop", json={"channel": channel})
+                return response.status_code
+        return response.status_code
+
+
+async def drive(scenario: Scenario, rps: float, duration: float) -> dict:
+    latencies = []
+    statuses: dict = {}
+
+    async def one(i: int):
+        start = time.perf_counter()
+        try:
+            status = await scenario.request(i)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if status == 200:
+            latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(int(rps * duration)):
+        delay = start + i / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    report = {"requests": len(tasks), "ok": len(latencies), "statuses": statuses,
+              "elapsed_s": round(elapsed, 2), "throughput_rps": round(len(latencies) / elapsed, 2)}
+    if latencies:
+        ms = np.array(latencies) * 1000
+        report["latency_ms"] = {q: round(float(np.percentile(ms, int(q[1:]))), 1) for q in ("p50", "p95", "p99")}
+        report["latency_ms"]["max"] = round(float(ms.max()), 1)
+    return report
+
+
+def worker_pids(master: int) -> list:
+    """The master's direct children (gunicorn workers), or the process itself if it has none."""
+    try:
+        with open(f"/proc/{master}/task/{master}/children") as f:
+            children = [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []
+    return children or [master]
+
+
+def rss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+async def sample_rss(masters: dict, interval: float, stop: asyncio.Event) -> dict:
+    """Peak and last RSS (MB) per worker of each server, until `stop` is set."""
+    samples: dict = {name: {} for name in masters}
+    while True:
+        for name, master in masters.items():
+            for pid in worker_pids(master):
+                rss = rss_mb(pid)
+                if rss is not None:
+                    worker = samples[name].setdefault(str(pid), {"peak_mb": 0.0})
+                    worker["peak_mb"] = max(worker["peak_mb"], rss)
+                    worker["last_mb"] = rss
+        if stop.is_set():
+            return samples
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def spawn_server(app: str, port: int, workers: int, env: dict) -> subprocess.Popen:
+    """gunicorn bench.fake_app:app serving `app` on 127.0.0.1:port."""
+    env = {**os.environ, **env, "BENCH_APP": app, "GUNICORN_BIND": f"127.0.0.1:{port}",
+           "GUNICORN_WORKERS": str(workers)}
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "bench.fake_app:app", "-c", "gunicorn.conf.py"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while True:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"server at {url} did not start")
+            await asyncio.sleep(0.2)
+
+
+async def run(args) -> dict:
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    fake = FakeConfig(latency_ms=args.gemini_latency_ms, ttft_ms=args.gemini_ttft_ms,
+                      errors={429: args.gemini_429_rate, 503: args.gemini_503_rate})
+    processes = []
+    masters = {}
+    target = args.target
+    try:
+        if args.spawn:
+            mock = create_app(latency=args.agora_latency, seed=0)
+            serve_in_thread(mock, args.port + 900)
+            env = {
+                **fake.to_env(),
+                "AGORA_APP_ID": "bench", "AGORA_APP_CERTIFICATE": "0" * 32,
+                "AGORA_CUSTOMER_ID": "bench", "AGORA_CUSTOMER_SECRET": "bench",
+                "AGORA_BASE_URL": f"http://127.0.0.1:{args.port + 900}",
+                "PROMETHEUS_MULTIPROC_DIR": os.path.join("/tmp", f"echo_bench_metrics_{args.port}"),
+            }
+            api = spawn_server("app.main", args.port, args.workers, env)
+            processes.append(api)
+            masters["api"] = api.pid
+            target = f"http://127.0.0.1:{args.port}"
+            await wait_ready(target)
+        elif args.pid:
+            masters["api"] = args.pid
+
+        audio = wav_clip(args.audio_seconds)
+        limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+        timeout = httpx.Timeout(args.timeout)
+        async with httpx.AsyncClient(base_url=target, limits=limits, timeout=timeout) as client:
+            stop = asyncio.Event()
+            rss = asyncio.create_task(sample_rss(masters, args.rss_interval, stop))
+            reports = await asyncio.gather(*(
+                drive(Scenario(name, client, audio), args.rps, args.duration)
+                for name in scenarios
+            ))
+            stop.set()
+            workers = await rss
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+    return {
+        "config": {
+            "rps_per_scenario": args.rps, "duration_s": args.duration, "spawned": args.spawn,
+            "workers": args.workers if args.spawn else None,
+            "fake_gemini": fake.__dict__ if args.spawn else None,
+        },
+        "scenarios": dict(zip(scenarios, reports)),
+        "workers_rss": workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default="chat_text,speech_to_text,onboarding")
+    parser.add_argument("--rps", type=float, default=10.0, help="requests per second, per scenario")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--target", default="http://127.0.0.1:8000")
+    parser.add_argument("--pid", type=int, default=None, help="gunicorn master to sample RSS from")
+    parser.add_argument("--spawn", action="store_true", help="start the server against fake Gemini and mock Agora")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800.0)
+    parser.add_argument("--gemini-ttft-ms", type=float, default=250.0)
+    parser.add_argument("--gemini-429-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-503-rate", type=float, default=0.0)
+    parser.add_argument("--agora-latency", type=float, default=0.05)
+    parser.add_argument("--audio-seconds", type=float, default=2.0)
+    parser.add_argument("--max-connections", type=int, default=512)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--rss-interval", type=float, default=1.0)
+    parser.add_argument("--output", default=None, help="also write the JSON report here")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
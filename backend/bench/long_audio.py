@@ -0,0 +1,99 @@
+"""Benchmark: chunked parallel transcription vs the single-shot /speech-to-text path.
+
+Run from backend/:
+
+    python -m bench.long_audio --minutes 1 5 10
+
+A synthetic 16 kHz mono WAV of speech-like bursts separated by pauses is
+posted to /speech-to-text with and without long_audio_mode. The stubbed
+model's latency grows linearly with the audio it is given, like Gemini's.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+import wave
+
+import httpx
+import numpy as np
+
+RATE = 16_000
+
+
+def synthetic_speech(seconds: float, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    total = int(seconds * RATE)
+    samples = np.zeros(total, dtype=np.float32)
+    pos = 0
+    while pos < total:
+        burst = int(rng.uniform(2, 8) * RATE)
+        t = np.arange(min(burst, total - pos)) / RATE
+        samples[pos:pos + len(t)] = 0.3 * np.sin(2 * np.pi * rng.uniform(120, 300) * t)
+        pos += len(t) + int(rng.uniform(0.3, 1.2) * RATE)
+    out = io.BytesIO()
+    with wave.open(out, "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(RATE)
+        writer.writeframes((samples * 32767).astype(np.int16).tobytes())
+    return out.getvalue()
+
+
+class LinearLatencyModel:
+    """Stub STT model: fixed overhead plus a cost per second of audio."""
+
+    def __init__(self, base_s: float, per_audio_s: float):
+        self.base_s = base_s
+        self.per_audio_s = per_audio_s
+
+    def generate_content(self, contents, **kwargs):
+        blob = contents[1]
+        with wave.open(io.BytesIO(blob["data"]), "rb") as wav:
+            seconds = wav.getnframes() / wav.getframerate()
+        time.sleep(self.base_s + self.per_audio_s * seconds)
+        return type("Response", (), {"text": f"{seconds:.0f} seconds of speech"})()
+
+
+async def run(minutes: list, base_s: float, per_audio_s: float) -> list:
+    from app import main
+    from app.model_registry import model_registry
+
+    model_registry._factory = lambda model_name, **kwargs: LinearLatencyModel(base_s, per_audio_s)
+    transport = httpx.ASGITransport(app=main.app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for length in minutes:
+            audio = synthetic_speech(length * 60)
+            row = {"audio_minutes": length, "upload_mb": round(len(audio) / 2**20, 1)}
+            for mode in ("single_shot", "chunked"):
+                start = time.perf_counter()
+                response = await client.post(
+                    "/speech-to-text",
+                    params={"long_audio_mode": mode == "chunked"},
+                    files={"file": ("clip.wav", audio, "audio/wav")},
+                )
+                row[f"{mode}_s"] = round(time.perf_counter() - start, 2)
+                if mode == "chunked":
+                    row["segments"] = len(response.json().get("segments") or [])
+            row["speedup"] = round(row["single_shot_s"] / row["chunked_s"], 2)
+            results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 5, 10])
+    parser.add_argument("--base-latency", type=float, default=0.3)
+    parser.add_argument("--per-audio-second", type=float, default=0.01)
+    args = parser.parse_args()
+    # Keep the single-shot path inline so both modes pay only model latency.
+    os.environ.setdefault("STT_INLINE_MAX_BYTES", str(64 * 2**20))
+    os.environ.setdefault("STT_LONG_AUDIO_SECONDS", "1e9")
+    results = asyncio.run(run(args.minutes, args.base_latency, args.per_audio_second))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
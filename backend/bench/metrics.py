@@ -0,0 +1,110 @@
+"""Overhead of the Prometheus timing hooks: per-request middleware cost and per-model-call cost.
+
+Run from backend/:
+
+    python -m bench.metrics
+    python -m bench.metrics --multiprocess      # file-backed samples, as under gunicorn
+
+Requests are driven straight through the ASGI interface (no sockets) against
+a trivial FastAPI app, with and without MetricsMiddleware, so the difference
+is the middleware alone. The model-call hook is timed the same way in a loop.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def drive(app, requests: int) -> list:
+    """Per-request latency in microseconds for GET /ping through `app`."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/ping", "raw_path": b"/ping", "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await app(dict(scope), receive, send)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def build_app(with_metrics: bool):
+    from fastapi import FastAPI
+
+    from app import metrics
+
+    app = FastAPI()
+    if with_metrics:
+        app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    return app
+
+
+def summary(latencies: list) -> dict:
+    return {
+        "p50_us": round(percentile(latencies, 0.5), 1),
+        "p95_us": round(percentile(latencies, 0.95), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--multiprocess", action="store_true")
+    args = parser.parse_args()
+    if args.multiprocess:
+        # Must be set before prometheus_client is imported.
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="echo_metrics_")
+
+    from app import metrics
+
+    # Alternate the two apps over several rounds so drift in machine load
+    # affects both alike.
+    apps = {"without_metrics": build_app(False), "with_metrics": build_app(True)}
+    samples = {name: [] for name in apps}
+    for app in apps.values():
+        asyncio.run(drive(app, 1000))  # warm up
+    for _ in range(args.rounds):
+        for name, app in apps.items():
+            samples[name] += asyncio.run(drive(app, args.requests // args.rounds))
+    results = {name: summary(latencies) for name, latencies in samples.items()}
+    results["middleware_overhead_p50_us"] = round(
+        results["with_metrics"]["p50_us"] - results["without_metrics"]["p50_us"], 1
+    )
+
+    usage = {"prompt_token_count": 900, "cached_content_token_count": 0, "candidates_token_count": 120}
+    hook = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        metrics.MODEL_IN_FLIGHT.inc()
+        metrics.MODEL_IN_FLIGHT.dec()
+        metrics.record_model_call("gemini-1.5-flash", "stream", 0.8, usage, 0.2)
+        hook.append((time.perf_counter() - start) * 1e6)
+    results["model_call_hook"] = summary(hook)
+    results["multiprocess"] = bool(metrics.MULTIPROC_DIR)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Local stand-in for the Agora Conversational AI REST API.
+
+    python -m bench.mock_agora --port 8900 --latency 0.05 --error-rate 0.1
+
+Implements the start/stop endpoints the backend calls, with configurable
+latency and injected 503s, so session code can be exercised offline. Point
+the backend at it by passing its URL as the AgoraClient base URL.
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency: float = 0.05, error_rate: float = 0.0, seed: int | None = None) -> FastAPI:
+    app = FastAPI(title="Mock Agora")
+    rng = random.Random(seed)
+    app.state.calls = {"start": 0, "stop": 0, "errors": 0}
+    app.state.agents = {}
+
+    async def respond(kind: str, body: dict):
+        app.state.calls[kind] += 1
+        await asyncio.sleep(latency)
+        if rng.random() < error_rate:
+            app.state.calls["errors"] += 1
+            return JSONResponse({"message": "injected failure"}, status_code=503)
+        return None
+
+    @app.post("/v1/projects/{app_id}/rtc/speech-to-speech/start")
+    async def start(app_id: str, request: Request):
+        body = await request.json()
+        failure = await respond("start", body)
+        if failure:
+            return failure
+        agent_id = uuid.uuid4().hex
+        app.state.agents[agent_id] = {"channel": body.get("channel"), "uid": body.get("uid")}
+        return {"agent_id": agent_id, "status": "RUNNING", "create_ts": int(time.time())}
+
+    @app.post("/v1/projects/{app_id}/rtc/speech-to-speech/stop")
+    async def stop(app_id: str, request: Request):
+        body = await request.json()
+        failure = await respond("stop", body)
+        if failure:
+            return failure
+        for agent_id, agent in list(app.state.agents.items()):
+            if agent["channel"] == body.get("channel"):
+                del app.state.agents[agent_id]
+        return {"status": "STOPPED"}
+
+    return app
+
+
+def serve_in_thread(app: FastAPI, port: int) -> uvicorn.Server:
+    """Run `app` on 127.0.0.1:port in a daemon thread; returns the server."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.error_rate), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
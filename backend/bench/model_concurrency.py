@@ -0,0 +1,63 @@
+"""Load test: concurrent /chat/text requests against a stubbed slow Gemini model.
+
+Run from backend/:
+
+    python -m bench.model_concurrency --requests 32 --delay 0.5
+
+The fake model (bench.fake_gemini, fixed latency) sleeps in
+`generate_content` the same way the real client blocks on the network. With
+the model client off the event loop the achieved concurrency approaches min(requests, GEMINI_MAX_CONCURRENCY); a blocking
+handler would stay at 1. /health is probed while the burst is in flight.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from bench.fake_gemini import FakeConfig, FakeGemini, install
+
+
+async def run(requests: int, delay: float) -> dict:
+    install(FakeGemini(FakeConfig(latency_ms=delay * 1000, latency_sigma=0)))
+
+    from app import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        payload = {"system_prompt": "You are a tutor.", "history": [], "user_message": "Hi"}
+
+        async def probe_health():
+            await asyncio.sleep(delay / 4)
+            start = time.perf_counter()
+            await client.get("/health")
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            probe_health(),
+            *(client.post("/chat/text", json=payload) for _ in range(requests)),
+        )
+        elapsed = time.perf_counter() - start
+
+    health_latency = results[0]
+    return {
+        "requests": requests,
+        "model_delay_s": delay,
+        "elapsed_s": round(elapsed, 3),
+        "effective_concurrency": round(requests * delay / elapsed, 2),
+        "health_latency_ms": round(health_latency * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--delay", type=float, default=0.5)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.delay)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
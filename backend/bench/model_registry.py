@@ -0,0 +1,91 @@
+"""Benchmark: per-request model setup with a fresh GenerativeModel vs the model registry.
+
+Run from backend/:
+
+    python -m bench.model_registry --requests 2000 --personas 50
+
+Measures everything that happens before the network call: building the
+model object and the GenerateContentRequest for a chat turn. "per_request"
+is the old path (new model each time, persona prepended to the prompt);
+"registry" reuses the persona's model and sends the persona as its system
+instruction. No API key is needed; nothing is sent.
+"""
+import argparse
+import json
+import random
+import time
+
+import google.generativeai as genai
+import numpy as np
+
+from app.model_registry import ModelRegistry
+
+MODEL = "gemini-1.5-flash"
+PERSONA = (
+    "You are '{name}', a patient {language} tutor who plays a {role}. Speak at a B1 level, "
+    "correct one mistake per turn, and stick to vocabulary about {topic}. "
+) * 12
+HISTORY = "\n".join(f"User: message {i}\nAI: reply {i}" for i in range(8))
+
+
+def personas(count: int) -> list:
+    return [
+        PERSONA.format(name=f"Tutor{i}", language="Spanish", role="pharmacist", topic=f"topic {i}")
+        for i in range(count)
+    ]
+
+
+def request_tokens(request) -> int:
+    return sum(len(part.text) for content in request.contents for part in content.parts) // 4
+
+
+def per_request(system_prompt: str, message: str):
+    model = genai.GenerativeModel(MODEL)
+    prompt = f"System: {system_prompt}\n{HISTORY}\nUser: {message}\nAI:"
+    return model._prepare_request(contents=prompt, tools=None, tool_config=None)
+
+
+def with_registry(registry: ModelRegistry, system_prompt: str, message: str):
+    model = registry.get(MODEL, system_instruction=system_prompt)
+    prompt = f"{HISTORY}\nUser: {message}\nAI:"
+    return model._prepare_request(contents=prompt, tools=None, tool_config=None)
+
+
+def measure(fn, picks: list) -> dict:
+    latencies = []
+    contents_tokens = 0
+    for i, system_prompt in enumerate(picks):
+        start = time.perf_counter()
+        request = fn(system_prompt, f"turn {i}")
+        latencies.append(time.perf_counter() - start)
+        contents_tokens += request_tokens(request)
+    us = np.array(latencies) * 1e6
+    return {
+        "us_p50": round(float(np.percentile(us, 50)), 1),
+        "us_p95": round(float(np.percentile(us, 95)), 1),
+        "avg_contents_tokens": round(contents_tokens / len(picks)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--personas", type=int, default=50)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    pool = personas(args.personas)
+    picks = [rng.choice(pool) for _ in range(args.requests)]
+    registry = ModelRegistry()
+    print(json.dumps({
+        "requests": args.requests,
+        "personas": args.personas,
+        "per_request": measure(per_request, picks),
+        "registry": {
+            **measure(lambda prompt, message: with_registry(registry, prompt, message), picks),
+            **registry.stats(),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Simulation: a traffic burst against a fake rate-limited Gemini, with and without the model scheduler.
+
+Run from backend/:
+
+    python -m bench.scheduler --quota-rps 20 --interactive 120 --onboarding 40 --batch 80
+
+The fake model (bench.fake_gemini with quota_rps) allows `quota-rps`
+requests per rolling second and answers everything over that with a 429,
+like Gemini's per-minute quota compressed in time. "direct" sends every call
+straight through (no limit, no retries); "scheduled" puts the same traffic
+through ModelScheduler with the bucket set to the quota.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+from google.api_core.exceptions import TooManyRequests
+
+from app import model_client
+from app.scheduler import BATCH, INTERACTIVE, ONBOARDING, PRIORITY_NAMES, ModelOverloaded, ModelScheduler
+from bench.fake_gemini import FakeConfig, FakeGemini
+
+
+async def simulate(scheduler: ModelScheduler, gemini: FakeGemini, mix: dict, spread: float, seed: int) -> dict:
+    model_client.scheduler = scheduler  # route model_client through this scheduler
+    model = gemini.model("fake-rate-limited")
+    rng = random.Random(seed)
+    jobs = [(priority, i) for priority, count in mix.items() for i in range(count)]
+    rng.shuffle(jobs)
+    outcomes = {name: {"ok": 0, "rate_limited": 0, "shed": 0, "latencies": []} for name in PRIORITY_NAMES.values()}
+
+    async def one(priority: int, i: int):
+        await asyncio.sleep(rng.uniform(0, spread))
+        result = outcomes[PRIORITY_NAMES[priority]]
+        start = time.perf_counter()
+        try:
+            await model_client.generate_content(model, f"request {priority}-{i}", priority=priority)
+            result["ok"] += 1
+            result["latencies"].append(time.perf_counter() - start)
+        except TooManyRequests:
+            result["rate_limited"] += 1
+        except ModelOverloaded:
+            result["shed"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(priority, i) for priority, i in jobs))
+    elapsed = time.perf_counter() - start
+
+    report = {
+        "elapsed_s": round(elapsed, 2),
+        "upstream_calls": gemini.stats["calls"],
+        "upstream_429s": gemini.stats["rejected"],
+    }
+    for name, result in outcomes.items():
+        latencies = np.array(result.pop("latencies") or [0.0]) * 1000
+        total = result["ok"] + result["rate_limited"] + result["shed"]
+        report[name] = {
+            **result,
+            "success_rate": round(result["ok"] / total, 3) if total else None,
+            "latency_ms_p50": round(float(np.percentile(latencies, 50)), 1),
+            "latency_ms_p95": round(float(np.percentile(latencies, 95)), 1),
+        }
+    report["scheduler"] = scheduler.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quota-rps", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--interactive", type=int, default=120)
+    parser.add_argument("--onboarding", type=int, default=40)
+    parser.add_argument("--batch", type=int, default=80)
+    parser.add_argument("--spread", type=float, default=2.0, help="seconds over which requests arrive")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    mix = {INTERACTIVE: args.interactive, ONBOARDING: args.onboarding, BATCH: args.batch}
+
+    direct = ModelScheduler(rate_per_minute=0, max_retries=0)
+    scheduled = ModelScheduler(rate_per_minute=args.quota_rps * 60, burst=args.quota_rps, backoff_seconds=0.2)
+
+    def gemini():
+        return FakeGemini(FakeConfig(latency_ms=args.latency * 1000, latency_sigma=0, quota_rps=args.quota_rps))
+
+    print(json.dumps({
+        "quota_rps": args.quota_rps,
+        "requests": {PRIORITY_NAMES[p]: n for p, n in mix.items()},
+        "direct": asyncio.run(simulate(direct, gemini(), mix, args.spread, args.seed)),
+        "scheduled": asyncio.run(simulate(scheduled, gemini(), mix, args.spread, args.seed)),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Cold start: import time of the app module and time-to-ready / RSS of gunicorn workers.
+
+Run from backend/:
+
+    python -m bench.startup --runs 5
+    ECHO_ROUTERS=session python -m bench.startup --runs 5    # a session-only deployment
+
+Each run starts a fresh interpreter, so nothing is shared between runs.
+"import" is the wall time of `import app.main` in a new process; "ready" is
+the time from launching gunicorn until GET / answers, and RSS is read from
+every worker at that moment, before any request has touched a model.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench.load import rss_mb, worker_pids
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def import_seconds(module: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def ready_run(app: str, port: int, workers: int) -> dict:
+    env = {**os.environ, "GUNICORN_BIND": f"127.0.0.1:{port}", "GUNICORN_WORKERS": str(workers)}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", app, "-c", "gunicorn.conf.py"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        # Ready once every worker has answered: keep asking until all pids have shown up.
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() - start > 120:
+                raise RuntimeError("server did not start")
+            time.sleep(0.02)
+        ready = time.perf_counter() - start
+        # Workers boot in parallel; give the slower ones a moment before reading memory.
+        time.sleep(2)
+        rss = [rss_mb(pid) for pid in worker_pids(process.pid)]
+        return {"ready_s": ready, "worker_rss_mb": [value for value in rss if value is not None]}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8190)
+    args = parser.parse_args()
+
+    imports = [import_seconds(args.module) for _ in range(args.runs)]
+    runs = [ready_run(args.app, args.port, args.workers) for _ in range(args.runs)]
+    rss = [value for run in runs for value in run["worker_rss_mb"]]
+    print(json.dumps({
+        "app": args.app,
+        "routers": os.getenv("ECHO_ROUTERS", "default"),
+        "import_s_median": round(statistics.median(imports), 3),
+        "ready_s_median": round(statistics.median(run["ready_s"] for run in runs), 3),
+        "worker_rss_mb_median": round(statistics.median(rss), 1) if rss else None,
+        "worker_rss_mb_max": max(rss) if rss else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
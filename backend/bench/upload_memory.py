@@ -0,0 +1,65 @@
+"""Benchmark: Python memory held by the /speech-to-text ingestion path vs upload size.
+
+Run from backend/:
+
+    python -m bench.upload_memory --sizes-mb 2 8 32 128
+
+Each upload is fed through audio_upload.spool_upload the way FastAPI hands
+it over (a spooled temp file of unknown size). Clips above the inline limit
+should show the same tracemalloc peak regardless of size, about one read
+chunk, because they go to disk and then to the Files API.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from starlette.datastructures import Headers, UploadFile
+
+
+async def measure(size: int) -> dict:
+    from app import audio_upload
+
+    raw = tempfile.SpooledTemporaryFile(max_size=2**20)
+    block = os.urandom(2**20)
+    for _ in range(size // len(block)):
+        raw.write(block)
+    raw.seek(0)
+    upload = UploadFile(raw, filename="clip.wav", headers=Headers({"content-type": "audio/wav"}))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    audio = await audio_upload.spool_upload(upload, max_bytes=size)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    audio.cleanup()
+    raw.close()
+
+    return {
+        "upload_mb": size // 2**20,
+        "path": "inline" if audio.data is not None else "files_api",
+        "peak_buffer_bytes": audio.peak_buffer_bytes,
+        "tracemalloc_peak_mb": round(peak / 2**20, 2),
+        "spool_ms": round(elapsed * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[2, 8, 32, 128])
+    parser.add_argument("--inline-max-mb", type=int, default=4)
+    args = parser.parse_args()
+    os.environ["STT_INLINE_MAX_BYTES"] = str(args.inline_max_mb * 2**20)
+
+    async def run_all():
+        return [await measure(size * 2**20) for size in args.sizes_mb]
+
+    print(json.dumps(asyncio.run(run_all()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import os
+import shutil
+
+# Gunicorn settings for the API container.
+#
+# Prometheus metrics are aggregated across workers through files in
+# PROMETHEUS_MULTIPROC_DIR. The variable has to be set before any worker
+# imports prometheus_client, so it is set here in the master; the directory
+# is emptied on start so a restarted container doesn't report stale samples.
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/echo_metrics")
+
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a dead worker; its counters and histograms stay.
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app import audio_upload
+
+
+def upload_app(monkeypatch, limit: int) -> TestClient:
+    monkeypatch.setattr(audio_upload, "STT_MAX_UPLOAD_BYTES", limit)
+    monkeypatch.setattr(audio_upload, "MULTIPART_OVERHEAD_BYTES", 1024)
+    parsed = []
+    router = APIRouter(route_class=audio_upload.UploadLimitRoute)
+
+    @router.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        parsed.append(file.filename)
+        return {"size": len(await file.read())}
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    client.parsed = parsed
+    return client
+
+
+def test_oversized_upload_is_refused_before_parsing(monkeypatch):
+    client = upload_app(monkeypatch, limit=10_000)
+    response = client.post("/upload", files={"file": ("clip.wav", b"\0" * 20_000, "audio/wav")})
+    assert response.status_code == 413
+    assert client.parsed == []
+
+
+def test_oversized_chunked_upload_is_refused(monkeypatch):
+    client = upload_app(monkeypatch, limit=10_000)
+    body = (b"--b\r\nContent-Disposition: form-data; name=\"file\"; filename=\"clip.wav\"\r\n\r\n"
+            + b"\0" * 20_000 + b"\r\n--b--\r\n")
+    response = client.post("/upload", content=iter([body[i:i + 4096] for i in range(0, len(body), 4096)]),
+                           headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
+    assert client.parsed == []
+
+
+def test_upload_within_the_limit_is_accepted(monkeypatch):
+    client = upload_app(monkeypatch, limit=10_000)
+    response = client.post("/upload", files={"file": ("clip.wav", b"\0" * 5_000, "audio/wav")})
+    assert response.status_code == 200
+    assert response.json() == {"size": 5_000}
@@ -0,0 +1,20 @@
+from app import batch_jobs
+
+
+def test_results_snapshot_leaves_out_a_line_being_written(tmp_path):
+    path = tmp_path / "output.jsonl"
+    path.write_bytes(b'{"index": 0}\n{"index": 1}\n{"ind')
+    length = batch_jobs.complete_length(str(path), block_bytes=4)
+    assert length == len(b'{"index": 0}\n{"index": 1}\n')
+
+    with open(path, "ab") as f:
+        f.write(b'ex": 2}\n')
+    assert b"".join(batch_jobs.read_prefix(str(path), length, chunk_bytes=5)) == b'{"index": 0}\n{"index": 1}\n'
+
+
+def test_results_snapshot_of_missing_or_partial_file(tmp_path):
+    assert batch_jobs.complete_length(str(tmp_path / "missing.jsonl")) == 0
+    path = tmp_path / "output.jsonl"
+    path.write_bytes(b'{"index"')
+    assert batch_jobs.complete_length(str(path)) == 0
+    assert list(batch_jobs.read_prefix(str(path), 0)) == []
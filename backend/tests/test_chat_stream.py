@@ -0,0 +1,112 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.cache import TTLCache
+from app.model_registry import model_registry
+from app.audio_upload import SpooledAudio
+from app.routers import chat, stt
+from app.sessions import session_store
+
+
+class StreamingModel:
+    """Streams a fixed reply in three chunks."""
+
+    def __init__(self, model_name="gemini-1.5-flash", **kwargs):
+        self.model_name = f"models/{model_name}"
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        return iter(SimpleNamespace(text=text, usage_metadata=None) for text in ("That's ", "a great ", "start!"))
+
+
+class DisconnectingRequest:
+    """Reports a disconnect once `after` chunks have been checked."""
+
+    def __init__(self, after: int):
+        self.checks = 0
+        self.after = after
+
+    async def is_disconnected(self) -> bool:
+        self.checks += 1
+        return self.checks > self.after
+
+
+async def stream_turn(session_id: str, http_request) -> list:
+    request = chat.ChatRequest(user_message="Hola", session_id=session_id)
+    response = await chat.chat_stream(request, http_request)
+    return [frame async for frame in response.body_iterator]
+
+
+async def stream_voice_turn(session_id: str, http_request) -> list:
+    response = await stt.voice_turn(http_request, None, session_id, multimodal=False)
+    return [frame async for frame in response.body_iterator]
+
+
+def use_streaming_model(monkeypatch):
+    """Build StreamingModel replies, in a fresh model cache, for this test only."""
+    monkeypatch.setattr(model_registry, "_factory", StreamingModel)
+    monkeypatch.setattr(model_registry, "_models", TTLCache(16, 60))
+
+
+def run_turn(monkeypatch, disconnect_after: int):
+    use_streaming_model(monkeypatch)
+    session = session_store.create("You are Sofia, a Spanish tutor.")
+    frames = asyncio.run(stream_turn(session.session_id, DisconnectingRequest(disconnect_after)))
+    return frames, session_store.get(session.session_id)
+
+
+def test_disconnect_mid_reply_leaves_history_unchanged(monkeypatch):
+    frames, session = run_turn(monkeypatch, disconnect_after=1)
+    assert session.history == []
+    assert not any(frame.startswith("event: done") for frame in frames)
+
+
+def test_finished_reply_is_recorded(monkeypatch):
+    frames, session = run_turn(monkeypatch, disconnect_after=10)
+    assert [turn["content"] for turn in session.history] == ["Hola", "That's a great start!"]
+    assert frames[-1].startswith("event: done")
+
+
+def patch_voice_input(monkeypatch, transcription: str) -> list:
+    """Stub out spooling and transcription; returns the list of clips received."""
+    received = []
+
+    async def receive_audio(file):
+        received.append(file)
+        return SpooledAudio("audio/wav", 4, data=b"RIFF")
+
+    async def transcribe_audio(audio):
+        return stt.TranscriptionResponse(transcription=transcription)
+
+    monkeypatch.setattr(stt, "receive_audio", receive_audio)
+    monkeypatch.setattr(stt, "transcribe_audio", transcribe_audio)
+    return received
+
+
+def test_voice_turn_disconnect_leaves_history_unchanged(monkeypatch):
+    patch_voice_input(monkeypatch, "Hola")
+    use_streaming_model(monkeypatch)
+    session = session_store.create("You are Sofia, a Spanish tutor.")
+    frames = asyncio.run(stream_voice_turn(session.session_id, DisconnectingRequest(1)))
+    assert session_store.get(session.session_id).history == []
+    assert frames[0].startswith("event: transcript")
+    assert not any(frame.startswith(("event: done", "event: error")) for frame in frames)
+
+
+def test_voice_turn_without_speech_is_not_sent_to_chat(monkeypatch):
+    patch_voice_input(monkeypatch, stt.NO_TRANSCRIPTION)
+    session = session_store.create("You are Sofia, a Spanish tutor.")
+    frames = asyncio.run(stream_voice_turn(session.session_id, DisconnectingRequest(10)))
+    assert session_store.get(session.session_id).history == []
+    assert [frame.split("\n")[0] for frame in frames] == ["event: error"]
+    assert "No speech" in frames[0]
+
+
+def test_voice_turn_checks_the_session_before_reading_audio(monkeypatch):
+    received = patch_voice_input(monkeypatch, "Hola")
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(stream_voice_turn("no-such-session", DisconnectingRequest(10)))
+    assert raised.value.status_code == 404
+    assert received == []
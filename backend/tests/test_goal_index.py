@@ -0,0 +1,23 @@
+import time
+from types import SimpleNamespace
+
+from app import goal_index
+from app.goal_index import GoalIndex
+
+
+def test_entries_expire_with_the_tracks_they_point_to(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(goal_index, "time", SimpleNamespace(monotonic=lambda: now[0], perf_counter=time.perf_counter))
+    index = GoalIndex(dim=64, max_entries=4, ttl_seconds=60)
+    index.add("ordering food at a restaurant", {"track": "old"})
+    now[0] += 30
+    index.add("booking a hotel room", {"track": "new"})
+
+    assert index.search("ordering food in a restaurant")[0][1] == {"track": "old"}
+    now[0] += 31
+    assert [payload for _, payload in index.search("ordering food in a restaurant", k=2)] == [{"track": "new"}]
+    assert len(index) == 1
+
+
+def test_index_ttl_defaults_to_the_track_cache_ttl():
+    assert GoalIndex().ttl_seconds == goal_index.TRACK_CACHE_TTL_SECONDS
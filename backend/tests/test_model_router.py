@@ -0,0 +1,31 @@
+import pytest
+
+from app.model_router import FAST, PRO, ChatRouter, persona_level
+
+
+@pytest.mark.parametrize("persona, level", [
+    ("You are Sofia. Level: B2. Topics: travel.", "b2"),
+    ("You are Mateo, a tutor for advanced learners of Spanish.", "advanced"),
+    ("Speak at an upper intermediate level.", "upper-intermediate"),
+    ("Keep it at A2 level, for beginner students.", "a2"),
+    ("Proficiency: C1", "c1"),
+    ("An advanced beginner level tutor.", "beginner"),
+])
+def test_persona_level_reads_stated_levels(persona, level):
+    assert persona_level(persona) == level
+
+
+@pytest.mark.parametrize("persona", [
+    "You are Lucia, coaching a learner who wants to become fluent in Italian.",
+    "You are Ana, patient with an advanced beginner.",
+    "You are Tom, a fluent speaker of English and an advanced chess player.",
+    "Discuss intermediate steps of cooking a paella.",
+])
+def test_persona_level_ignores_level_words_used_otherwise(persona):
+    assert persona_level(persona) is None
+
+
+def test_only_a_stated_advanced_level_escalates():
+    router = ChatRouter(enabled=True)
+    assert router.route("You help a learner who wants to become fluent.", "Hola").tier == FAST
+    assert router.route("Level: fluent. You are Carmen.", "Hola").tier == PRO
@@ -0,0 +1,58 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from google.api_core.exceptions import TooManyRequests
+
+from app.model_registry import model_registry
+from app.routers import onboarding
+from app.scheduler import scheduler
+
+TRACK = {"system_prompt": "You are Sofia, a Spanish tutor.", "initial_topics": ["Ordering coffee"]}
+
+
+class RateLimitedModel:
+    """Rejects the first `failures` streaming calls with a 429, then streams a track."""
+
+    calls = 0
+    failures = 1
+
+    def __init__(self, model_name="gemini-1.5-flash", **kwargs):
+        self.model_name = f"models/{model_name}"
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        if stream:
+            RateLimitedModel.calls += 1
+            if RateLimitedModel.calls <= RateLimitedModel.failures:
+                raise TooManyRequests("Resource has been exhausted")
+            text = json.dumps(TRACK)
+            return iter(SimpleNamespace(text=part, usage_metadata=None) for part in (text[:20], text[20:]))
+        return SimpleNamespace(text="¡Hola!", usage_metadata=None)
+
+
+@pytest.fixture
+def rate_limited(monkeypatch):
+    monkeypatch.setattr(model_registry, "_factory", RateLimitedModel)
+    monkeypatch.setattr(scheduler, "backoff_seconds", 0.01)
+    monkeypatch.setattr(RateLimitedModel, "calls", 0)
+    return RateLimitedModel
+
+
+def generate(goal: str):
+    return asyncio.run(onboarding.generate_track(onboarding.OnboardingRequest(language="Spanish", goal=goal)))
+
+
+def test_rate_limited_stream_is_retried(rate_limited):
+    track = generate("Ordering coffee after a 429")
+    assert track.system_prompt == TRACK["system_prompt"]
+    assert rate_limited.calls == 2
+
+
+def test_persistent_rate_limit_is_a_503(rate_limited, monkeypatch):
+    monkeypatch.setattr(rate_limited, "failures", 100)
+    with pytest.raises(HTTPException) as raised:
+        generate("Ordering coffee while rate limited")
+    assert raised.value.status_code == 503
+    assert "Retry-After" in raised.value.headers
@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+
+from app.session_registry import SessionRegistry, SQLiteSessionTable
+
+
+async def collect(registry: SessionRegistry, channel: str) -> list:
+    return [state async for state in registry.watch(channel, keepalive_seconds=0.05)]
+
+
+def test_watch_sees_changes_made_by_another_worker(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    watching, other = SessionRegistry(SQLiteSessionTable(path)), SessionRegistry(SQLiteSessionTable(path))
+    watching.register("room", "user", "starting")
+
+    async def scenario():
+        watcher = asyncio.create_task(collect(watching, "room"))
+        await asyncio.sleep(0.12)
+        other.update("room", "started", bot_id="agent-1")
+        return await asyncio.wait_for(watcher, 1)
+
+    states = asyncio.run(scenario())
+    sent = [state for state in states if state is not None]
+    assert [state["botStatus"] for state in sent] == ["starting", "started"]
+    assert sent[-1]["botId"] == "agent-1"
+    assert None in states
+
+
+def test_watch_wakes_on_local_changes():
+    registry = SessionRegistry()
+    registry.register("room", "user", "starting")
+
+    async def scenario():
+        watcher = asyncio.create_task(collect(registry, "room"))
+        await asyncio.sleep(0)
+        registry.update("room", "error", error="no credentials")
+        return await asyncio.wait_for(watcher, 1)
+
+    assert [state["botStatus"] for state in asyncio.run(scenario())] == ["starting", "error"]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def registry(request, tmp_path):
+    return SessionRegistry(SQLiteSessionTable(str(tmp_path / "sessions.db")) if request.param == "sqlite" else None)
+
+
+def test_reaper_retries_a_stop_left_unfinished(registry):
+    registry.register("room", "user", "started", bot_id="agent-1")
+    assert registry.claim_for_stop("room") is not None  # then the worker died before stopping it
+    stopped = []
+
+    async def stop_bot(session):
+        stopped.append(session.bot_id)
+        return True
+
+    assert asyncio.run(registry.reap(stop_bot, idle_seconds=3600)) == 0  # a stop in progress is left alone
+    time.sleep(0.01)
+    assert asyncio.run(registry.reap(stop_bot, idle_seconds=3600, stop_timeout_seconds=0.005)) == 1
+    assert stopped == ["agent-1"]
+    assert registry.get("room").bot_status == "stopped"
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.routers import session
+from app.session_registry import SessionRegistry, SQLiteSessionTable
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def registry(request, monkeypatch, tmp_path):
+    table = SQLiteSessionTable(str(tmp_path / "sessions.db")) if request.param == "sqlite" else None
+    registry = SessionRegistry(table)
+    monkeypatch.setattr(session, "session_registry", registry)
+    monkeypatch.setattr(session, "AGORA_CUSTOMER_ID", "customer")
+    monkeypatch.setattr(session, "AGORA_CUSTOMER_SECRET", "secret")
+    return registry
+
+
+def test_stop_while_starting_stops_the_bot_once_it_joins(registry, monkeypatch):
+    stopped = []
+
+    async def start_bot(channel, uid, language, voice):
+        await joined.wait()
+        return {"status": "started", "data": {"agent_id": "agent-1"}}
+
+    async def stop_bot(channel, bot_uid="999999", bot_id=None):
+        stopped.append(bot_id)
+
+    monkeypatch.setattr(session, "_start_agora_bot", start_bot)
+    monkeypatch.setattr(session, "_stop_agora_bot", stop_bot)
+
+    async def scenario():
+        registry.register("room", "user", "starting", bot_uid="999999")
+        start = asyncio.create_task(session._start_agora_bot_in_background("room", "user", None, None))
+        await asyncio.sleep(0)
+        response = await session.stop_session(session.SessionStopRequest(channel="room"))
+        joined.set()
+        await start
+        return response
+
+    joined = asyncio.Event()
+    response = asyncio.run(scenario())
+    assert response["status"] == "stopping"
+    assert stopped == ["agent-1"]
+    assert registry.get("room").bot_status == "stopped"
+
+
+def test_start_without_stop_records_the_bot(registry, monkeypatch):
+    async def start_bot(channel, uid, language, voice):
+        return {"status": "started", "data": {"agent_id": "agent-1"}}
+
+    monkeypatch.setattr(session, "_start_agora_bot", start_bot)
+    registry.register("room", "user", "starting", bot_uid="999999")
+    asyncio.run(session._start_agora_bot_in_background("room", "user", None, None))
+    assert registry.get("room").bot_status == "started"
+    assert registry.get("room").bot_id == "agent-1"
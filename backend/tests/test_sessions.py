@@ -0,0 +1,41 @@
+from app.sessions import SessionStore, SQLiteSessionBackend
+
+
+def stores(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    return (SessionStore(SQLiteSessionBackend(path, 100, 3600)),
+            SessionStore(SQLiteSessionBackend(path, 100, 3600)))
+
+
+def test_turn_keeps_a_summary_folded_by_another_worker(tmp_path):
+    first, second = stores(tmp_path)
+    session = first.create("You are Sofia.", [{"role": "human", "content": "Hola"}, {"role": "ai", "content": "¡Hola!"}])
+    loaded = first.get(session.session_id)  # before the model call
+
+    assert second.fold(session.session_id, "They said hello.", 2)
+    first.record_turn(loaded, "¿Qué tal?", "Muy bien.")
+
+    stored = second.get(session.session_id)
+    assert stored.summary == "They said hello."
+    assert stored.summarized_count == 2
+    assert [m["content"] for m in stored.history[2:]] == ["¿Qué tal?", "Muy bien."]
+    assert stored.prompt_prefix.startswith("Summary of earlier conversation: They said hello.\nUser: ¿Qué tal?")
+
+
+def test_concurrent_turns_are_both_kept(tmp_path):
+    first, second = stores(tmp_path)
+    session = first.create("You are Sofia.")
+    one, other = first.get(session.session_id), second.get(session.session_id)
+
+    first.record_turn(one, "Uno", "One")
+    second.record_turn(other, "Dos", "Two")
+
+    assert [m["content"] for m in first.get(session.session_id).history] == ["Uno", "One", "Dos", "Two"]
+
+
+def test_stale_fold_is_ignored(tmp_path):
+    first, second = stores(tmp_path)
+    session = first.create("You are Sofia.", [{"role": "human", "content": "Hola"}] * 4)
+    assert first.fold(session.session_id, "Newer summary.", 4)
+    assert not second.fold(session.session_id, "Older summary.", 2)
+    assert first.get(session.session_id).summary == "Newer summary."
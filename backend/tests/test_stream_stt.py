@@ -0,0 +1,87 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app import stream_stt
+
+RATE = 16000
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+
+async def transcribe(wav_bytes: bytes) -> str:
+    return "hola"
+
+
+def chunks(samples: np.ndarray, chunk_ms: int):
+    size = RATE * chunk_ms // 1000
+    for start in range(0, len(samples), size):
+        yield samples[start:start + size].astype("<i2").tobytes()
+
+
+def utterance() -> np.ndarray:
+    """0.2 s of silence, 0.5 s of tone, 1 s of silence."""
+    t = np.arange(RATE // 2) / RATE
+    tone = (np.sin(2 * np.pi * 220 * t) * 5000).astype(np.int16)
+    return np.concatenate([np.zeros(RATE // 5, np.int16), tone, np.zeros(RATE, np.int16)])
+
+
+async def stream(chunk_ms: int) -> list:
+    websocket = FakeWebSocket()
+    session = stream_stt.StreamingSession(websocket, transcribe, RATE)
+    for data in chunks(utterance(), chunk_ms):
+        await session.feed(data)
+    session.finalise()
+    await asyncio.gather(*session.tasks)
+    return websocket.sent
+
+
+def test_sub_frame_chunks_are_analysed():
+    # 10 ms chunks are shorter than a 20 ms VAD frame.
+    finals = [m for m in asyncio.run(stream(10)) if m["type"] == "final"]
+    assert [m["text"] for m in finals] == ["hola"]
+
+
+def test_chunk_size_does_not_change_the_result():
+    for chunk_ms in (5, 10, 30, 40):
+        finals = [m for m in asyncio.run(stream(chunk_ms)) if m["type"] == "final"]
+        assert len(finals) == 1, chunk_ms
+
+
+def test_ring_counts_samples_of_oversized_writes():
+    ring = stream_stt.PCMRingBuffer(100)
+    ring.write(np.arange(250, dtype=np.int16))
+    assert ring.total == 250
+    assert list(ring.read(240, 250)) == list(range(240, 250))
+    ring.write(np.arange(250, 260, dtype=np.int16))
+    assert ring.total == 260
+    assert list(ring.read(255, 260)) == list(range(255, 260))
+
+
+class ClosingWebSocket(FakeWebSocket):
+    def __init__(self):
+        super().__init__()
+        self.closed = None
+
+    async def accept(self):
+        pass
+
+    async def receive(self):
+        raise AssertionError("audio read from a connection that should have been refused")
+
+    async def close(self, code=1000, reason=None):
+        self.closed = code
+
+
+@pytest.mark.parametrize("sample_rate", [0, -16000, 7999, 48001, 10**9])
+def test_out_of_range_sample_rate_is_refused(sample_rate):
+    websocket = ClosingWebSocket()
+    asyncio.run(stream_stt.run_session(websocket, transcribe, sample_rate))
+    assert websocket.closed == 1008
@@ -0,0 +1,50 @@
+import asyncio
+
+from app.topic_openers import OpenerCache
+
+
+class SlowOpeners(OpenerCache):
+    """Prefetches that wait until released, so discards land mid-prefetch."""
+
+    def __init__(self):
+        super().__init__(enabled=True)
+        self.release = asyncio.Event()
+
+    async def _generate(self, system_prompt, topic, priority):
+        await self.release.wait()
+        return f"¡Hola! Let's talk about {topic}."
+
+
+def test_discard_only_cancels_once_every_holder_is_gone():
+    async def scenario():
+        cache = SlowOpeners()
+        mine = cache.prefetch("You are Sofia.", ["Ordering coffee"])
+        theirs = cache.prefetch("You are Sofia.", ["Ordering coffee"])
+        assert mine != theirs
+        await asyncio.sleep(0)
+
+        assert cache.discard(mine)
+        assert not cache.discard(mine)  # repeating it is harmless
+        cache.release.set()
+        text, prefetched = await cache.opener("You are Sofia.", "Ordering coffee")
+        assert prefetched and "Ordering coffee" in text
+        assert cache.stats()["cancelled"] == 0
+
+        assert cache.discard(theirs)
+        assert cache.stats()["tracks"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_last_discard_cancels_the_prefetch():
+    async def scenario():
+        cache = SlowOpeners()
+        handle = cache.prefetch("You are Sofia.", ["Ordering coffee", "Paying"])
+        await asyncio.sleep(0)
+        assert cache.discard(handle)
+        await asyncio.sleep(0)
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["cancelled"] == 2
+    assert stats["tracks"] == 0
@@ -21,13 +21,14 @@ export default function Conversation() {
 
   const handleJoin = useCallback(async () => {
     try {
-      const { token, uid, channel_name } = await getToken();
+      const { token, uid, rtcUid, channel_name } = await getToken();
 
       const micTrack = await AgoraRTC.createMicrophoneAudioTrack();
       const camTrack = await AgoraRTC.createCameraVideoTrack();
       setTracks([micTrack, camTrack]);
 
-      await client.join(APP_ID, channel_name, token, uid);
+      // The RTC token is minted for the numeric rtcUid.
+      await client.join(APP_ID, channel_name, token, rtcUid ?? uid);
       await client.publish([micTrack, camTrack]);
 
       console.log("Joined", channel_name);
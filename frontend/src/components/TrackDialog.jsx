@@ -59,6 +59,7 @@ export default function TrackDialog() {
                 desiredFluency: form.desiredFluency || "",
                 systemPrompt: data.system_prompt || "",
                 initialTopics: data.initial_topics || [],
+                openerTrackId: data.track_id || null,
             };
 
             addTrack(newTrack);
@@ -1,11 +1,13 @@
 import React, { useState, useRef, useEffect } from "react";
 import MessageBubble from "./MessageBubble";
 import MicBlob from "../MicBlob";
-import { startSession, stopSession } from "../../lib/api";
+import { heartbeatSession, startSession, stopSession } from "../../lib/api";
 import useChatStore from "../../store/chatStore";
 import AgoraRTC from "agora-rtc-sdk-ng";
 
 const APP_ID = import.meta.env.VITE_AGORA_APP_ID || "";
+// The backend reaps bots that have not heard from their client for a while.
+const HEARTBEAT_MS = 60000;
 
 export default function ChatInterface({ selectedTrack }) {
   const messages = useChatStore((state) => state.messages);
@@ -21,6 +23,16 @@ export default function ChatInterface({ selectedTrack }) {
     if (boxRef.current) boxRef.current.scrollTop = boxRef.current.scrollHeight;
   }, [messages]);
 
+  useEffect(() => {
+    if (!session?.channel) return undefined;
+    const timer = setInterval(() => {
+      heartbeatSession({ channel: session.channel }).catch((e) =>
+        console.error("Session heartbeat failed:", e)
+      );
+    }, HEARTBEAT_MS);
+    return () => clearInterval(timer);
+  }, [session?.channel]);
+
   const handleMicClick = async () => {
     try {
       if (!listening) {
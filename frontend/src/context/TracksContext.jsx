@@ -1,4 +1,5 @@
 import React, { createContext, useEffect, useState } from "react";
+import { discardTrackOpeners } from "../lib/api";
 
 export const TracksContext = createContext({
   tracks: [],
@@ -30,6 +31,11 @@ export function TracksProvider({ children }) {
   };
 
   const removeTrack = (id) => {
+    const track = tracks.find((t) => t.id === id);
+    if (track?.openerTrackId) {
+      // Stop the server prefetching openers for a track nobody will open.
+      discardTrackOpeners({ trackId: track.openerTrackId }).catch(() => {});
+    }
     setTracks((s) => s.filter((t) => t.id !== id));
   };
 
@@ -26,9 +26,21 @@ export async function stopSession({ channel }) {
     });
 }
 
+export async function heartbeatSession({ channel }) {
+    return http(`/session/${encodeURIComponent(channel)}/heartbeat`, {
+        method: "POST",
+    });
+}
+
 export async function generateTrack({ language, goal }) {
     return http("/onboarding/generate-track", {
         method: "POST",
         body: JSON.stringify({ language, goal }),
     });
 }
+
+export async function discardTrackOpeners({ trackId }) {
+    return http(`/chat/openers/${encodeURIComponent(trackId)}`, {
+        method: "DELETE",
+    });
+}